@@ -0,0 +1,233 @@
+"""Load test of the AI move service: cache hit ratio and request latency.
+
+A pool of ``--positions`` random mid-game positions is drawn first; each
+request then picks one of them, skewed towards the first ones like real
+openings, in a random one of its eight symmetric orientations.
+``--clients`` concurrent clients send ``--requests`` requests in total,
+each waiting for its answer before sending the next one:
+
+    python -m benchmarks.ai_service [--requests 2000] [--clients 32] [--depth 4]
+    python -m benchmarks.ai_service --tcp            # through engine.service on localhost
+    python -m benchmarks.ai_service --port 8766      # a service already running
+
+By default the service runs in this process.  The same requests are also
+answered one by one by calling the strategy directly, without batching or
+cache (``--direct`` of them), to compare against.  Everything runs on
+this machine; no external service is involved.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import time
+
+from engine.ai import STRATEGIES
+from engine.game import DIFFICULTIES, Game
+from engine.metrics import percentile
+from engine.protocol import AI_MOVE, AI_REQUEST, NO_MOVE, decode, encode, pack_board, payload_size
+from engine.service import AIService
+from engine.transposition import symmetries
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_positions(count, grid_size, win_length, rng, min_plies=2, max_plies=6):
+    # Distinct ongoing positions (cell lists) reached by random play
+    positions, seen = [], set()
+    while len(positions) < count:
+        game = Game(vs_ai=False, rng=rng, levels=((grid_size, win_length),))
+        for _ in range(rng.randint(min_plies, max_plies)):
+            game.make_move(*rng.choice(game.board.empty_cells()))
+            if game.game_over:
+                break
+        cells = tuple(game.tracker.cells)
+        if not game.game_over and cells not in seen:
+            seen.add(cells)
+            positions.append(list(cells))
+    return positions
+
+
+def workload(positions, requests, grid_size, rng):
+    # Requests skewed towards the first positions, randomly rotated/reflected
+    weights = [1 / (rank + 1) for rank in range(len(positions))]
+    perms = symmetries(grid_size)
+    stream = []
+    for cells in rng.choices(positions, weights, k=requests):
+        perm = rng.choice(perms)
+        oriented = [''] * len(cells)
+        for cell, mark in enumerate(cells):
+            oriented[perm[cell]] = mark
+        stream.append(oriented)
+    return stream
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'requests_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else 0.0,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+    }
+
+
+def run_direct(stream, grid_size, win_length, difficulty, depth, rng):
+    # Every request searched on its own, as the front-ends do
+    latencies = []
+    start = time.perf_counter()
+    for cells in stream:
+        started = time.perf_counter()
+        game = Game(vs_ai=False, rng=rng, levels=((grid_size, win_length),))
+        game.search_depth = depth
+        for cell, mark in enumerate(cells):
+            if mark:
+                game.position.play(cell, mark)
+        game.current_player = 'O' if len(game.tracker.history) % 2 else 'X'
+        STRATEGIES[difficulty](game, rng)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def run_local(stream, clients, grid_size, win_length, difficulty, service):
+    latencies, illegal = [], 0
+
+    async def client(requests):
+        nonlocal illegal
+        for cells in requests:
+            started = time.perf_counter()
+            row, col = await service.best_move(cells, grid_size, win_length, difficulty)
+            latencies.append(time.perf_counter() - started)
+            if cells[row * grid_size + col]:
+                illegal += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(stream[index::clients]) for index in range(clients)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result['illegal'] = illegal
+    return result
+
+
+async def run_remote(stream, clients, grid_size, win_length, difficulty, host, port):
+    latencies, illegal, failed = [], 0, 0
+    ids = itertools.count(1)
+    level = DIFFICULTIES.index(difficulty)
+
+    async def client(requests):
+        nonlocal illegal, failed
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for cells in requests:
+                x = sum(1 << cell for cell, mark in enumerate(cells) if mark == 'X')
+                o = sum(1 << cell for cell, mark in enumerate(cells) if mark == 'O')
+                started = time.perf_counter()
+                writer.write(encode(AI_REQUEST, next(ids), grid_size, win_length, level,
+                                    pack_board(x), pack_board(o)))
+                head = await reader.readexactly(1)
+                kind, (_, cell) = decode(head + await reader.readexactly(payload_size(head[0])))
+                latencies.append(time.perf_counter() - started)
+                if kind != AI_MOVE or cell == NO_MOVE:
+                    failed += 1
+                elif cells[cell]:
+                    illegal += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(stream[index::clients]) for index in range(clients)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result.update(illegal=illegal, failed=failed)
+    return result
+
+
+def start_service(depth, jobs=1):
+    # (process, port) of a service on a free port of localhost
+    command = [sys.executable, '-m', 'engine.service', '--host', '127.0.0.1', '--port', '0',
+               '--jobs', str(jobs)]
+    if depth is not None:
+        command += ['--depth', str(depth)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise RuntimeError(f"service did not start: {line!r}")
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def report(name, result, log):
+    log(f"{name:<8} {result['requests']:>6} requests  {result['requests_per_s']:>8.0f}/s  "
+        f"p50 {result['p50_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the AI move service")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=32, help="concurrent clients")
+    parser.add_argument('--positions', type=int, default=200, help="distinct positions")
+    parser.add_argument('--grid', type=int, default=4)
+    parser.add_argument('--win', type=int, default=4)
+    parser.add_argument('--difficulty', default="Hard", choices=("Hard", "MCTS"))
+    parser.add_argument('--depth', type=int, default=4,
+                        help="fixed Hard search depth (0: the clock of the front-ends)")
+    parser.add_argument('--jobs', type=int, default=1, help="searches the service runs at once")
+    parser.add_argument('--direct', type=int, default=200,
+                        help="requests to also answer without the service (0: skip)")
+    parser.add_argument('--tcp', action='store_true', help="start engine.service and use TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="service to test over TCP")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    depth = args.depth or None
+    positions = random_positions(args.positions, args.grid, args.win, rng)
+    stream = workload(positions, args.requests, args.grid, rng)
+    print(f"{args.requests} requests over {len(positions)} positions of "
+          f"{args.grid}x{args.grid}, {args.win} in a row, {args.difficulty}")
+
+    if args.direct:
+        report('direct', run_direct(stream[:args.direct], args.grid, args.win, args.difficulty,
+                                    depth, rng), print)
+
+    if args.tcp or args.port is not None:
+        process = None
+        port = args.port
+        if port is None:
+            process, port = start_service(depth, args.jobs)
+        try:
+            result = asyncio.run(run_remote(stream, args.clients, args.grid, args.win,
+                                            args.difficulty, args.host, port))
+        except OSError as error:
+            print(f"Load test failed: {error}")
+            return 1
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        report('service', result, print)
+        print(f"{result['failed']} failed, {result['illegal']} illegal moves")
+        return 0
+
+    service = AIService(search_depth=depth, rng=random.Random(args.seed), jobs=args.jobs)
+
+    async def run():
+        try:
+            return await run_local(stream, args.clients, args.grid, args.win, args.difficulty,
+                                   service)
+        finally:
+            await service.close()
+
+    result = asyncio.run(run())
+    report('service', result, print)
+    stats = service.stats()
+    print(f"hit ratio {stats['hit_ratio']:.1%} ({stats['hits']} hits, {stats['coalesced']} "
+          f"coalesced, {stats['misses']} searched) in {stats['batches']} batches, "
+          f"{result['illegal']} illegal moves")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Level transition and reset times of the Tk board.
+
+Compares the old path, which destroyed and rebuilt every cell widget on
+each level change and reconfigured every cell on reset, with the pooled
+button board that resizes in place and only clears the played cells, and
+with the single-canvas board:
+
+    python -m benchmarks.board_widgets [--cycles 20]
+
+Results can be saved and later runs compared against them, like
+``benchmarks.startup``:
+
+    xvfb-run python -m benchmarks.board_widgets --save board_widgets.json
+    xvfb-run python -m benchmarks.board_widgets --compare board_widgets.json
+
+Needs a display (or Xvfb, e.g. ``xvfb-run python -m
+benchmarks.board_widgets``).  The app keeps its game log and progress in
+a temporary directory, so the games played here never reach
+``~/.tictactoe``.  Kivy has no comparable headless mode; its board draws
+every cell on one canvas, and ``TicTacToeGame`` records the last
+transition in ``last_transition_ms`` for on-device checks.
+"""
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from benchmarks.startup import compare
+from engine import BOARD_PRESETS
+from engine.metrics import percentile
+from tictactoe import LARGE_BOARD, RENDERERS, ButtonBoard, TicTacToe
+
+
+def rebuild_board(app):
+    # The board construction before widget pooling
+    view = app.board_view
+    for widget in view.frame.winfo_children():
+        widget.destroy()
+    view.buttons = []
+    large = app.game.grid_size > LARGE_BOARD
+    for i in range(app.game.grid_size):
+        row = []
+        for j in range(app.game.grid_size):
+            if large:
+                button = tk.Label(view.frame, text='', font=('Arial', 11, 'bold'),
+                                  width=2, relief='ridge', bd=1)
+                button.bind("<Button-1>", lambda event, row=i, col=j: app.on_cell_click(row, col))
+                button.grid(row=i, column=j)
+            else:
+                button = tk.Button(view.frame, text='', font=('Arial', 24, 'bold'),
+                                   width=5, height=2,
+                                   command=lambda row=i, col=j: app.on_cell_click(row, col))
+                button.grid(row=i, column=j, padx=5, pady=5)
+            row.append(button)
+        view.buttons.append(row)
+
+
+def reset_every_cell(app):
+    # The reset before dirty-cell tracking
+    for row in app.board_view.buttons:
+        for button in row:
+            button.config(text='', fg='black')
+
+
+def play_some(app, rng, moves):
+    # Fill a few cells so resets have something to clear
+    for row, col in rng.sample(app.game.board.empty_cells(), moves):
+        if app.game.game_over:
+            break
+        app.game.make_move(row, col)
+        app.render_cell(row, col)
+
+
+def timed(root, func):
+    # Milliseconds until the change is laid out and drawn
+    start = time.perf_counter()
+    func()
+    root.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(cycles=20, seed=0, log=print):
+    root = tk.Tk()
+    data_dir = tempfile.mkdtemp(prefix='board_widgets')
+    app = TicTacToe(root, data_dir)
+    app.game.vs_ai = False
+    rng = random.Random(seed)
+    results = {}
+    try:
+        for preset, levels in BOARD_PRESETS.items():
+            app.game.set_levels(levels)
+            for name, renderer, transition, reset in (
+                    ('rebuild', RENDERERS[0], lambda: rebuild_board(app),
+                     lambda: reset_every_cell(app)),
+                    ('pooled', RENDERERS[0], app.create_game_board, lambda: app.board_view.clear()),
+                    ('canvas', RENDERERS[1], app.create_game_board, lambda: app.board_view.clear())):
+                # Warm the pool so steady-state transitions are measured
+                app.select_renderer(renderer)
+                app.create_game_board()
+                level_times, reset_times = [], []
+                for _ in range(cycles):
+                    app.game.advance_level()
+                    level_times.append(timed(root, transition))
+                    app.game.reset()
+                    play_some(app, rng, min(6, app.game.grid_size))
+                    app.game.reset()
+                    reset_times.append(timed(root, reset))
+                for kind, times in (('level', level_times), ('reset', reset_times)):
+                    times.sort()
+                    key = f"{preset}/{kind}/{name}"
+                    results[key] = {'p50_ms': percentile(times, 0.5),
+                                    'p90_ms': percentile(times, 0.9)}
+                    log(f"{key:<40} p50 {results[key]['p50_ms']:>8.2f}ms"
+                        f"   p90 {results[key]['p90_ms']:>8.2f}ms")
+                if name == 'rebuild':
+                    # The rebuild destroyed the pooled widgets; start over
+                    app.board_view.frame.destroy()
+                    app.board_view = None
+                    app.board_views[renderer] = ButtonBoard(app.game_frame, app.on_cell_click)
+    finally:
+        app.store.close()
+        root.destroy()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time board transitions of the Tk front-end")
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', help="JSON baseline to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+    try:
+        results = run(args.cycles, args.seed)
+    except tk.TclError as error:
+        print(f"Needs a display: {error}")
+        return 1
+
+    if args.save:
+        document = {
+            'meta': {
+                'python': sys.version.split()[0],
+                'tk': tk.TkVersion,
+                'platform': platform.platform(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as baseline_file:
+            json.dump(document, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after, change in regressions:
+            print(f"REGRESSION {key}: {before:.2f} -> {after:.2f}ms ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
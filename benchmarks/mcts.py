@@ -0,0 +1,34 @@
+"""Playouts per second of the MCTS difficulty, single and root-parallel.
+
+    python -m benchmarks.mcts [--budget-ms 1000] [--jobs 1 --jobs 4]
+"""
+
+import argparse
+import os
+import random
+
+from engine.mcts import MCTS, parallel_search, shutdown_pool
+
+SIZES = ((3, 3), (4, 4), (5, 5), (7, 5))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure MCTS playouts per second")
+    parser.add_argument('--budget-ms', type=int, default=1000, help="search time per measurement")
+    parser.add_argument('--jobs', type=int, action='append',
+                        help=f"processes to search with (repeatable, this machine has {os.cpu_count()})")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for jobs in args.jobs or [1]:
+        for grid_size, win_length in SIZES:
+            result = parallel_search(MCTS(time_budget_ms=args.budget_ms), grid_size, win_length,
+                                     0, 0, 'X', jobs, random.Random(args.seed))
+            print(f"{grid_size}x{grid_size}k{win_length} jobs={jobs}: {result.playouts:>8} playouts"
+                  f" in {result.elapsed_ms:.0f}ms, {result.playouts_per_s:>9.0f} playouts/s,"
+                  f" move {result.move}")
+    shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Nodes searched by Hard with each move ordering heuristic added in turn.
+
+Searches the same random positions of the 4x4 and 5x5 levels to a fixed
+depth, each with a fresh transposition table and without the opening book,
+starting from the transposition table's move alone and adding the
+heuristics of ``engine.search.ORDERING`` one at a time, then dead-cell
+pruning:
+
+    python -m benchmarks.ordering [--positions 30] [--depth 4x4:6 --depth 5x5:4]
+
+``same score`` counts the positions whose root score matches the first
+row; with pruning of dead cells the leaves differ, so a few may not.
+"""
+
+import argparse
+import random
+import time
+
+from engine.game import Game
+from engine.search import Searcher
+from engine.transposition import TranspositionTable
+
+LEVELS = ((4, 4), (5, 5))
+
+DEPTHS = {4: 6, 5: 4}
+
+# (name, ordering heuristics, prune dead cells), each adding to the previous
+STEPS = (
+    ('hash move', ('hash',), False),
+    ('+ wins/blocks', ('hash', 'tactics'), False),
+    ('+ killers', ('hash', 'tactics', 'killers'), False),
+    ('+ history', ('hash', 'tactics', 'killers', 'history'), False),
+    ('+ proximity', ('hash', 'tactics', 'killers', 'history', 'proximity'), False),
+    ('+ dead cells', ('hash', 'tactics', 'killers', 'history', 'proximity'), True),
+)
+
+
+def random_positions(grid_size, win_length, count, rng, max_plies=8):
+    # Trackers of ongoing games after 0..max_plies random moves
+    positions = []
+    while len(positions) < count:
+        game = Game(vs_ai=False, rng=rng, levels=((grid_size, win_length),))
+        for _ in range(rng.randint(0, max_plies)):
+            game.make_move(*rng.choice(game.board.empty_cells()))
+            if game.game_over:
+                break
+        if not game.game_over:
+            positions.append((game.tracker, game.current_player))
+    return positions
+
+
+def run(levels=LEVELS, depths=DEPTHS, count=30, seed=0, log=print):
+    results = {}
+    for grid_size, win_length in levels:
+        positions = random_positions(grid_size, win_length, count, random.Random(seed))
+        depth = depths.get(grid_size, 4)
+        log(f"{grid_size}x{grid_size}, {win_length} in a row: {len(positions)} positions, depth {depth}")
+        baseline = None
+        for name, ordering, prune in STEPS:
+            nodes, scores = 0, []
+            start = time.perf_counter()
+            for tracker, player in positions:
+                searcher = Searcher(time_budget_ms=None, max_depth=depth, table=TranspositionTable(),
+                                    ordering=ordering, prune_dead_cells=prune)
+                result = searcher.search(tracker, player)
+                nodes += result.nodes
+                scores.append(result.score)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = (nodes, scores)
+            same = sum(a == b for a, b in zip(scores, baseline[1]))
+            reduction = 1 - nodes / baseline[0] if baseline[0] else 0.0
+            results[f"{grid_size}x{grid_size}k{win_length}/{name}"] = {
+                'nodes': nodes, 'reduction': reduction, 'seconds': elapsed, 'same_score': same}
+            log(f"  {name:<16} {nodes:>10} nodes  {reduction:>6.1%} fewer  {elapsed:>7.2f}s  "
+                f"same score {same}/{len(positions)}")
+    return results
+
+
+def parse_depth(text):
+    # "5x5:4" -> (5, 4)
+    board, _, depth = text.partition(':')
+    return int(board.split('x')[0]), int(depth)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the node savings of move ordering")
+    parser.add_argument('--positions', type=int, default=30, help="positions per level")
+    parser.add_argument('--depth', type=parse_depth, action='append',
+                        help="search depth per board, e.g. 5x5:4 (repeatable)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    depths = dict(DEPTHS)
+    depths.update(args.depth or [])
+    run(depths=depths, count=args.positions, seed=args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+"""Load test of the multiplayer server: moves per second and move latency.
+
+Opens ``--matches`` pairs of TCP clients, each pair in its own room, and
+lets every client play a random legal move as soon as it is its turn
+until ``--duration`` seconds have passed.  A move's latency is the time
+from sending it to receiving the server's ``MOVED`` for it:
+
+    python -m benchmarks.server_load [--matches 1000] [--duration 10]
+    python -m benchmarks.server_load --port 8765     # a server already running
+
+Without ``--port`` a server is started in a subprocess on a free port of
+localhost.  Each match needs two sockets on both sides, so the open file
+limit is raised to its hard limit where the platform allows it.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from engine.metrics import percentile
+from engine.protocol import (EVICTED, JOIN, MOVE, MOVED, ONGOING, OPPONENT_LEFT, REJECTED, START,
+                             decode, encode, payload_size)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Connections opened at once while setting up the matches
+CONNECT_BATCH = 200
+
+
+def raise_file_limit():
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def start_server():
+    # (process, port) of a server on a free port of localhost
+    process = subprocess.Popen([sys.executable, '-m', 'engine.server', '--host', '127.0.0.1',
+                                '--port', '0'], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise RuntimeError(f"server did not start: {line!r}")
+    return process, int(line.rsplit(':', 1)[1])
+
+
+async def read_message(reader):
+    head = await reader.readexactly(1)
+    return decode(head + await reader.readexactly(payload_size(head[0])))
+
+
+async def play(reader, writer, stop_at, latencies, counters, rng):
+    # One client: answer every turn with a random empty cell
+    empty, mark, turn, sent_at = [], None, None, None
+    try:
+        while True:
+            kind, fields = await read_message(reader)
+            if kind == START:
+                _, _, grid_size, _, mark = fields
+                empty = list(range(grid_size * grid_size))
+                turn = 0
+            elif kind == MOVED:
+                cell, mover, status = fields
+                empty.remove(cell)
+                if mover == mark and sent_at is not None:
+                    latencies.append(time.perf_counter() - sent_at)
+                    sent_at = None
+                turn = mover ^ 1 if status == ONGOING else None
+            elif kind == REJECTED:
+                counters['rejected'] += 1
+                sent_at = None
+            elif kind in (OPPONENT_LEFT, EVICTED):
+                return
+            if time.perf_counter() >= stop_at:
+                return
+            if mark is not None and turn == mark and sent_at is None:
+                sent_at = time.perf_counter()
+                writer.write(encode(MOVE, rng.choice(empty)))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        counters['disconnected'] += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, matches, duration, preset=0, seed=0, log=print):
+    rng = random.Random(seed)
+    clients = []
+    started = time.perf_counter()
+    for first in range(0, matches * 2, CONNECT_BATCH):
+        batch = range(first, min(first + CONNECT_BATCH, matches * 2))
+        clients += await asyncio.gather(*(asyncio.open_connection(host, port) for _ in batch))
+    for index, (_, writer) in enumerate(clients):
+        # Both clients of a pair join the same room
+        writer.write(encode(JOIN, preset, index // 2 + 1))
+    log(f"{len(clients)} connections in {time.perf_counter() - started:.2f}s")
+
+    latencies = []
+    counters = {'rejected': 0, 'disconnected': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(play(reader, writer, start + duration, latencies, counters, rng)
+                           for reader, writer in clients))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        'matches': matches,
+        'moves': len(latencies),
+        'moves_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else 0.0,
+        'p90_ms': percentile(latencies, 0.9) * 1000 if latencies else 0.0,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        **counters,
+    }
+    log(f"{result['moves']} moves in {elapsed:.1f}s: {result['moves_per_s']:.0f} moves/s, "
+        f"latency p50 {result['p50_ms']:.2f}ms  p90 {result['p90_ms']:.2f}ms  "
+        f"p99 {result['p99_ms']:.2f}ms  max {result['max_ms']:.2f}ms, "
+        f"{result['rejected']} rejected, {result['disconnected']} disconnected")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the multiplayer server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="server to test (default: start one)")
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of play")
+    parser.add_argument('--preset', type=int, default=0, help="board preset index")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    raise_file_limit()
+    process = None
+    port = args.port
+    if port is None:
+        process, port = start_server()
+    try:
+        asyncio.run(run(args.host, port, args.matches, args.duration, args.preset, args.seed))
+    except OSError as error:
+        print(f"Load test failed: {error}")
+        return 1
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
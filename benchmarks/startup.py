@@ -0,0 +1,165 @@
+"""Cold start times of the engine and the two front-ends.
+
+Every sample runs in a fresh interpreter, so nothing is cached in
+``sys.modules`` between runs.  Reported per probe:
+
+- ``import/<module>``: importing the engine, ``tictactoe`` or ``main``
+  (skipped when Kivy is not installed);
+- ``first_frame/tictactoe``: from the start of the ``tictactoe`` imports
+  until its window is mapped (needs a display or Xvfb);
+- ``process/<probe>``: wall time of the whole process, interpreter
+  start-up included.
+
+Results can be saved per release and later runs compared against them,
+like ``benchmarks.suite``:
+
+    python -m benchmarks.startup --save startup.json
+    python -m benchmarks.startup --compare startup.json --threshold 0.25
+
+On a device, ``TICTACTOE_METRICS=1`` records the same ``startup_imports``
+and ``first_frame`` timers in ``metrics.json`` for either front-end.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from engine.metrics import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+try:
+    import {module}
+except ImportError as error:
+    print(json.dumps({{'skip': str(error)}}))
+else:
+    print(json.dumps({{'ms': (time.perf_counter() - start) * 1000}}))
+"""
+
+# Runs on a fresh data directory, so the player's saved progress and
+# positions neither change what is timed nor get touched
+FIRST_FRAME_PROBE = """
+import json, shutil, tempfile
+import tictactoe
+try:
+    root = tictactoe.tk.Tk()
+except tictactoe.tk.TclError as error:
+    print(json.dumps({'skip': str(error)}))
+else:
+    data_dir = tempfile.mkdtemp(prefix='startup')
+    try:
+        app = tictactoe.TicTacToe(root, data_dir)
+        while app.first_frame_ms is None:
+            root.update()
+        app.store.close()
+        root.destroy()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(json.dumps({'ms': app.first_frame_ms}))
+"""
+
+PROBES = (
+    ('import/engine', IMPORT_PROBE.format(module='engine.game, engine.records, engine.worker')),
+    ('import/tictactoe', IMPORT_PROBE.format(module='tictactoe')),
+    ('import/main', IMPORT_PROBE.format(module='main')),
+    ('first_frame/tictactoe', FIRST_FRAME_PROBE),
+)
+
+
+def run_probe(code):
+    # (result dict, process wall time in ms) of one fresh interpreter
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                               text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        return {'skip': completed.stderr.strip().splitlines()[-1]}, elapsed
+    return json.loads(completed.stdout.strip().splitlines()[-1]), elapsed
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'p50_ms': percentile(values, 0.5), 'p90_ms': percentile(values, 0.9),
+            'samples': len(values)}
+
+
+def run(runs=10, probes=PROBES, log=print):
+    results = {}
+    for name, code in probes:
+        times, process_times = [], []
+        skipped = None
+        for _ in range(runs):
+            result, elapsed = run_probe(code)
+            if 'skip' in result:
+                skipped = result['skip']
+                break
+            times.append(result['ms'])
+            process_times.append(elapsed)
+        if skipped is not None:
+            log(f"{name:<28} skipped: {skipped}")
+            continue
+        for key, values in ((name, times), (f"process/{name}", process_times)):
+            results[key] = summarize(values)
+            log(f"{key:<36} p50 {results[key]['p50_ms']:>8.1f}ms"
+                f"   p90 {results[key]['p90_ms']:>8.1f}ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Probes whose median got slower by more than threshold
+    regressions = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        change = result['p50_ms'] / previous['p50_ms'] - 1
+        if change > threshold:
+            regressions.append((key, previous['p50_ms'], result['p50_ms'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start times")
+    parser.add_argument('--runs', type=int, default=10, help="fresh interpreters per probe")
+    parser.add_argument('--save', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', help="JSON baseline to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run(args.runs)
+
+    if args.save:
+        document = {
+            'meta': {
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as baseline_file:
+            json.dump(document, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after, change in regressions:
+            print(f"REGRESSION {key}: {before:.1f} -> {after:.1f}ms ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
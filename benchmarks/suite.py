@@ -0,0 +1,157 @@
+"""Timing suite for the engine hot paths with regression tracking.
+
+Times check_winner, is_board_full, get_easy_ai_move and get_hard_ai_move
+on empty, mid-game and nearly full positions of several board sizes and
+reports ops/sec with per-call percentiles.  Results can be saved as a JSON
+baseline and later runs compared against it:
+
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --compare benchmarks/baseline.json --threshold 0.25
+
+The comparison exits with status 1 when any benchmark got slower than the
+threshold, so it can gate CI.  Nothing here needs a display.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from engine import Game, get_easy_ai_move, get_hard_ai_move
+from engine.ai import configure_transposition_table
+from engine.metrics import percentile
+
+SIZES = ((3, 3), (4, 4), (5, 5), (7, 5), (9, 5), (15, 5))
+
+# Share of the cells filled in each benchmarked position
+PHASES = (('empty', 0.0), ('mid', 0.5), ('full', 0.9))
+
+# (calls per sample, samples) for the cheap and the expensive operations
+FAST = (200, 30)
+SLOW = (1, 10)
+
+
+def build_position(grid_size, win_length, fill, rng):
+    # A game with about fill of the cells taken and no winner yet
+    game = Game(rng=rng)
+    game.set_board(grid_size, win_length)
+    target = int(grid_size * grid_size * fill)
+    cells = game.board.empty_cells()
+    rng.shuffle(cells)
+    for row, col in cells:
+        if game.board.move_count() >= target:
+            break
+        if not game.tracker.is_winning_move(row, col, game.current_player):
+            game.make_move(row, col)
+    return game
+
+
+def measure(func, calls, samples, setup=None):
+    # Per-call times in seconds, one value per sample
+    timings = []
+    for _ in range(samples):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        timings.append((time.perf_counter() - start) / calls)
+    timings.sort()
+    return {
+        'ops_per_s': 1 / percentile(timings, 0.5),
+        'p50_us': percentile(timings, 0.5) * 1e6,
+        'p90_us': percentile(timings, 0.9) * 1e6,
+        'p99_us': percentile(timings, 0.99) * 1e6,
+        'samples': samples,
+    }
+
+
+def run_suite(sizes=SIZES, hard_depth=2, quick=False, seed=0, log=print):
+    results = {}
+    fast = (FAST[0] // 4, FAST[1] // 3) if quick else FAST
+    slow = (SLOW[0], max(3, SLOW[1] // 3)) if quick else SLOW
+    for grid_size, win_length in sizes:
+        for phase, fill in PHASES:
+            rng = random.Random(seed)
+            game = build_position(grid_size, win_length, fill, rng)
+            game.search_depth = hard_depth
+            label = f"{grid_size}x{grid_size}k{win_length}/{phase}"
+            benchmarks = (
+                ('check_winner', game.check_winner, fast, None),
+                ('is_board_full', game.is_board_full, fast, None),
+                ('get_easy_ai_move', lambda: get_easy_ai_move(game, rng), fast, None),
+                # A fresh transposition table so every sample does the full search
+                ('get_hard_ai_move', lambda: get_hard_ai_move(game, rng), slow,
+                 configure_transposition_table),
+            )
+            for name, func, (calls, samples), setup in benchmarks:
+                key = f"{name}/{label}"
+                results[key] = measure(func, calls, samples, setup)
+                log(format_result(key, results[key]))
+    configure_transposition_table()
+    return results
+
+
+def format_result(key, result):
+    return (f"{key:<40} {result['ops_per_s']:>12.0f} ops/s   p50 {result['p50_us']:>10.1f}us"
+            f"   p90 {result['p90_us']:>10.1f}us   p99 {result['p99_us']:>10.1f}us")
+
+
+def compare(results, baseline, threshold):
+    # Benchmarks whose throughput dropped by more than threshold
+    regressions = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        change = result['ops_per_s'] / previous['ops_per_s'] - 1
+        if change < -threshold:
+            regressions.append((key, previous['ops_per_s'], result['ops_per_s'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine hot paths")
+    parser.add_argument('--save', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', help="JSON baseline to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default: 0.25)")
+    parser.add_argument('--hard-depth', type=int, default=2)
+    parser.add_argument('--max-grid', type=int, default=15, help="skip larger boards")
+    parser.add_argument('--quick', action='store_true', help="fewer samples")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sizes = [size for size in SIZES if size[0] <= args.max_grid]
+    results = run_suite(sizes, args.hard_depth, args.quick, args.seed)
+
+    if args.save:
+        document = {
+            'meta': {
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'hard_depth': args.hard_depth,
+            },
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as baseline_file:
+            json.dump(document, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after, change in regressions:
+            print(f"REGRESSION {key}: {before:.0f} -> {after:.0f} ops/s ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Compare full-board win scans with the WinTracker and BitBoard checks.
+
+Run from the repository root:
+
+    python -m benchmarks.wincheck [--games N] [--seed S]
+"""
+
+import argparse
+import random
+import time
+
+from engine import BitBoard, WinTracker
+
+SIZES = ((3, 3), (4, 4), (5, 5), (7, 5), (9, 5), (15, 5))
+
+
+def full_scan_winner(board, grid_size, win_length):
+    # The original check_winner: rescan every row, column and diagonal
+    for i in range(grid_size):
+        for j in range(grid_size - win_length + 1):
+            if board[i][j] != '' and all(board[i][j+k] == board[i][j] for k in range(win_length)):
+                return board[i][j]
+    for i in range(grid_size - win_length + 1):
+        for j in range(grid_size):
+            if board[i][j] != '' and all(board[i+k][j] == board[i][j] for k in range(win_length)):
+                return board[i][j]
+    for i in range(grid_size - win_length + 1):
+        for j in range(grid_size - win_length + 1):
+            if board[i][j] != '' and all(board[i+k][j+k] == board[i][j] for k in range(win_length)):
+                return board[i][j]
+    for i in range(grid_size - win_length + 1):
+        for j in range(win_length - 1, grid_size):
+            if board[i][j] != '' and all(board[i+k][j-k] == board[i][j] for k in range(win_length)):
+                return board[i][j]
+    return None
+
+
+def random_games(grid_size, games, rng):
+    cells = [(i, j) for i in range(grid_size) for j in range(grid_size)]
+    sequences = []
+    for _ in range(games):
+        order = cells[:]
+        rng.shuffle(order)
+        sequences.append(order)
+    return sequences
+
+
+def play_full_scan(sequences, grid_size, win_length):
+    for order in sequences:
+        board = [[''] * grid_size for _ in range(grid_size)]
+        player = 'X'
+        for row, col in order:
+            board[row][col] = player
+            if full_scan_winner(board, grid_size, win_length):
+                break
+            player = 'O' if player == 'X' else 'X'
+
+
+def play_tracker(sequences, grid_size, win_length):
+    for order in sequences:
+        tracker = WinTracker(grid_size, win_length)
+        player = 'X'
+        for row, col in order:
+            if tracker.place(row, col, player):
+                break
+            player = 'O' if player == 'X' else 'X'
+
+
+def play_bitboard(sequences, grid_size, win_length):
+    # Full win check after every move, but against the precomputed masks
+    for order in sequences:
+        board = BitBoard(grid_size, win_length)
+        player = 'X'
+        for row, col in order:
+            board.place(row, col, player)
+            if board.winner():
+                break
+            player = 'O' if player == 'X' else 'X'
+
+
+def probe_full_scan(positions, grid_size, win_length):
+    # One-ply probing as done by the old get_hard_ai_move
+    for board in positions:
+        for player in ('O', 'X'):
+            for i in range(grid_size):
+                for j in range(grid_size):
+                    if board[i][j] == '':
+                        board[i][j] = player
+                        full_scan_winner(board, grid_size, win_length)
+                        board[i][j] = ''
+
+
+def probe_tracker(trackers, grid_size, win_length):
+    for tracker in trackers:
+        for player in ('O', 'X'):
+            for i in range(grid_size):
+                for j in range(grid_size):
+                    tracker.is_winning_move(i, j, player)
+
+
+def probe_bitboard(bitboards, grid_size, win_length):
+    for board in bitboards:
+        for player in ('O', 'X'):
+            for row, col in board.empty_cells():
+                board.is_winning_move(row, col, player)
+
+
+def mid_game_positions(sequences, grid_size, win_length):
+    # Stop each game halfway (or right before a win) for probing
+    boards, trackers, bitboards = [], [], []
+    for order in sequences:
+        board = [[''] * grid_size for _ in range(grid_size)]
+        tracker = WinTracker(grid_size, win_length)
+        bitboard = BitBoard(grid_size, win_length)
+        player = 'X'
+        for row, col in order[:len(order) // 2]:
+            if tracker.is_winning_move(row, col, player):
+                break
+            tracker.place(row, col, player)
+            bitboard.place(row, col, player)
+            board[row][col] = player
+            player = 'O' if player == 'X' else 'X'
+        boards.append(board)
+        trackers.append(tracker)
+        bitboards.append(bitboard)
+    return boards, trackers, bitboards
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def report(label, scenario, old, new, bits):
+    # Speedup is the full scan against the faster of the two new checks
+    print(f"{label:>10} {scenario:>10} {old * 1000:10.1f}ms {new * 1000:10.1f}ms "
+          f"{bits * 1000:10.1f}ms {old / min(new, bits):8.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'board':>10} {'scenario':>10} {'full scan':>12} {'tracker':>12} {'bitboard':>12} {'speedup':>9}")
+    for grid_size, win_length in SIZES:
+        rng = random.Random(args.seed)
+        sequences = random_games(grid_size, args.games, rng)
+        label = f"{grid_size}x{grid_size} k={win_length}"
+
+        old = timed(play_full_scan, sequences, grid_size, win_length)
+        new = timed(play_tracker, sequences, grid_size, win_length)
+        bits = timed(play_bitboard, sequences, grid_size, win_length)
+        report(label, 'game', old, new, bits)
+
+        boards, trackers, bitboards = mid_game_positions(sequences, grid_size, win_length)
+        old = timed(probe_full_scan, boards, grid_size, win_length)
+        new = timed(probe_tracker, trackers, grid_size, win_length)
+        bits = timed(probe_bitboard, bitboards, grid_size, win_length)
+        report(label, 'hard probe', old, new, bits)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""GUI-free game logic shared by the Tkinter and Kivy front-ends.
+
+The names below are loaded from their modules on first access, so
+``import engine`` (or ``from engine import Game``) does not pull the
+search, MCTS and book modules into the front-ends' startup.
+"""
+
+import importlib
+
+# Public name -> module that defines it
+_EXPORTS = {
+    'get_easy_ai_move': 'engine.ai', 'get_hard_ai_move': 'engine.ai',
+    'get_mcts_ai_move': 'engine.ai', 'get_medium_ai_move': 'engine.ai',
+    'BitBoard': 'engine.bitboard', 'win_masks': 'engine.bitboard',
+    'BOARD_PRESETS': 'engine.game', 'DIFFICULTIES': 'engine.game', 'LEVELS': 'engine.game',
+    'Game': 'engine.game',
+    'MCTS': 'engine.mcts', 'MCTSResult': 'engine.mcts',
+    'PatternEvaluator': 'engine.patterns', 'Position': 'engine.position',
+    'SearchResult': 'engine.search', 'Searcher': 'engine.search', 'Store': 'engine.store',
+    'TranspositionTable': 'engine.transposition', 'ZobristHash': 'engine.transposition',
+    'WinTracker': 'engine.wincheck', 'line_windows': 'engine.wincheck',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'engine' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,169 @@
+"""AI move selection for the difficulty levels.
+
+Every strategy takes the game being played (anything exposing ``board``,
+``tracker`` and ``current_player``) and returns a ``(row, col)`` tuple for
+the player to move.
+"""
+
+import random
+
+from engine.book import get_opening_book
+from engine.mcts import MCTS, parallel_search
+from engine.metrics import METRICS
+from engine.search import Searcher
+from engine.store import MIN_DEPTH, OPENING_MARKS
+from engine.transposition import (DEFAULT_MEMORY_MB, TranspositionTable, set_shared_memory,
+                                  shared_memory)
+
+# Wall-clock budget of one Hard search by grid size, so the UI never stalls
+HARD_TIME_BUDGET_MS = {3: 150, 4: 250, 5: 350}
+DEFAULT_TIME_BUDGET_MS = 350
+
+# Wall-clock budget of one MCTS move by grid size
+MCTS_TIME_BUDGET_MS = {3: 150, 4: 300, 5: 400}
+
+# Shared by all Hard searches so later moves reuse earlier work; created
+# by the first search with the cap of engine.transposition.shared_memory()
+_transposition_table = None
+
+# Shared MCTS tree (reused between consecutive moves) and its settings
+_mcts = MCTS(time_budget_ms=None)
+_mcts_settings = {'iterations': None, 'time_budget_ms': None, 'jobs': 1}
+
+
+def configure_transposition_table(memory_mb=DEFAULT_MEMORY_MB):
+    # Replace the shared table, e.g. with a smaller cap on low-RAM devices
+    global _transposition_table
+    _transposition_table = TranspositionTable(memory_mb)
+    return _transposition_table
+
+
+def set_transposition_memory(memory_mb):
+    # Cap the shared table without allocating it before the first search
+    global _transposition_table
+    set_shared_memory(memory_mb)
+    _transposition_table = None
+
+
+def get_transposition_table():
+    if _transposition_table is None:
+        return configure_transposition_table(shared_memory())
+    return _transposition_table
+
+
+def configure_mcts(iterations=None, time_budget_ms=None, jobs=1):
+    # A fixed number of playouts per move (reproducible) or a time budget
+    # (None: by grid size), and how many processes search in parallel
+    global _mcts
+    _mcts = MCTS(time_budget_ms=None)
+    _mcts_settings.update(iterations=iterations, time_budget_ms=time_budget_ms, jobs=jobs)
+
+
+def other(player):
+    return 'O' if player == 'X' else 'X'
+
+
+def get_easy_ai_move(game, rng=random):
+    # Random move
+    empty_cells = game.board.empty_cells()
+    return rng.choice(empty_cells) if empty_cells else (0, 0)
+
+
+def get_medium_ai_move(game, rng=random):
+    # 50% chance for smart move, 50% for random
+    if rng.random() < 0.5:
+        return get_easy_ai_move(game, rng)
+    return get_hard_ai_move(game, rng)
+
+
+def get_hard_ai_move(game, rng=random):
+    # Book positions (all of 3x3, openings of 4x4/5x5) are a table lookup
+    board = game.board
+    book = get_opening_book()
+    if book is not None:
+        move = book.lookup(game.tracker.cells, board.grid_size, board.win_length)
+        if move is not None:
+            game.last_search = None
+            return move
+
+    # Then the answers learned in earlier games (engine.store), unless a
+    # fixed depth asks for reproducible searches
+    depth = getattr(game, 'search_depth', None)
+    store = getattr(game, 'store', None) if depth is None else None
+    if store is not None:
+        move = store.lookup(game.tracker.cells, board.grid_size, board.win_length, MIN_DEPTH)
+        if move is not None:
+            game.last_search = None
+            return move
+
+    # Otherwise iterative-deepening alpha-beta search; the result (nodes
+    # searched, depth reached) is kept on the game for tuning the budgets.
+    # A fixed search_depth replaces the clock so results are reproducible.
+    if depth is None:
+        budget = HARD_TIME_BUDGET_MS.get(board.grid_size, DEFAULT_TIME_BUDGET_MS)
+    else:
+        budget = None
+    searcher = Searcher(time_budget_ms=budget, max_depth=depth, table=get_transposition_table(),
+                        cancel_event=getattr(game, 'cancel_event', None))
+    result = searcher.search(game.tracker, game.current_player, rng)
+    game.last_search = result
+    if result.move is None:
+        return (0, 0)
+    # Solved positions are worth keeping, and openings searched deep
+    # enough; the move of a cancelled search is never played, so it is not
+    # kept
+    cancelled = searcher.cancel_event is not None and searcher.cancel_event.is_set()
+    if store is not None and not cancelled:
+        if result.completed:
+            stored_depth = board.grid_size * board.grid_size - len(game.tracker.history)
+        elif len(game.tracker.history) <= OPENING_MARKS and result.depth >= MIN_DEPTH:
+            stored_depth = result.depth
+        else:
+            stored_depth = None
+        if stored_depth is not None:
+            store.save(game.tracker.cells, board.grid_size, board.win_length, result.move,
+                       result.score, stored_depth)
+    return result.move
+
+
+def get_mcts_ai_move(game, rng=random):
+    # Immediate wins and blocks first; random playouts are slow to find them
+    board = game.board
+    player = game.current_player
+    empty_cells = board.empty_cells()
+    probes = 0
+    for target in (player, other(player)):
+        for row, col in empty_cells:
+            probes += 1
+            if game.tracker.is_winning_move(row, col, target):
+                if METRICS.enabled:
+                    METRICS.count('win_probes', probes)
+                game.last_search = None
+                return (row, col)
+    if METRICS.enabled:
+        METRICS.count('win_probes', probes)
+
+    # UCT search; the result (playouts, playouts per second) is kept on
+    # the game like Hard's search statistics
+    iterations = _mcts_settings['iterations']
+    budget = _mcts_settings['time_budget_ms']
+    if iterations is None and budget is None:
+        budget = MCTS_TIME_BUDGET_MS.get(board.grid_size, DEFAULT_TIME_BUDGET_MS)
+    # The limits go with this search only: a cancelled search may still be
+    # finishing on the shared tree
+    result = parallel_search(_mcts, board.grid_size, board.win_length, board.x, board.o, player,
+                             _mcts_settings['jobs'], rng, iterations,
+                             None if iterations is not None else budget,
+                             getattr(game, 'cancel_event', None))
+    game.last_search = result
+    if result.move is None:
+        return get_easy_ai_move(game, rng)
+    return result.move
+
+
+STRATEGIES = {
+    "Easy": get_easy_ai_move,
+    "Medium": get_medium_ai_move,
+    "Hard": get_hard_ai_move,
+    "MCTS": get_mcts_ai_move,
+}
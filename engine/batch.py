@@ -0,0 +1,195 @@
+"""Vectorised evaluation of many boards at once for analysis jobs.
+
+Boards are an ``(N, size, size)`` int8 array with ``X`` = 1, ``O`` = -1 and
+0 for an empty cell.  Every winning window is a row of cell indices, so
+gathering the flattened boards by the window table and summing gives the
+marks per window for all boards in one call: a sum of ``+k`` or ``-k``
+is a completed line.  ``pattern_scores`` and ``evaluate`` give the run
+pattern scores of ``engine.patterns`` the same way, line by line.
+
+NumPy is optional for the project and only this module needs it; the
+games and the APK build never import it.
+"""
+
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("engine.batch needs NumPy (pip install numpy)") from error
+
+from engine.patterns import THREAT_SCORE, board_lines, run_weights
+from engine.wincheck import line_windows
+
+EMPTY, X, O = 0, 1, -1
+
+# Value of the cells around the board in line_table()
+WALL = 2
+
+# Status codes returned by status(); X and O mean that side has won
+ONGOING, DRAW = 0, 2
+
+# Kinds of move returned by win_or_block()
+NONE, WIN, BLOCK = 0, 1, 2
+
+
+@lru_cache(maxsize=None)
+def window_table(grid_size, win_length):
+    # (windows, win_length) array of flat cell indices
+    table = np.array(line_windows(grid_size, win_length), dtype=np.intp)
+    table.setflags(write=False)
+    return table
+
+
+def _flatten(boards):
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim == 2:
+        boards = boards[np.newaxis]
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError(f"expected an (N, size, size) array, got shape {boards.shape}")
+    return boards.reshape(len(boards), -1), boards.shape[1]
+
+
+def window_sums(boards, win_length):
+    # (N, windows) sum of the marks in every window
+    flat, grid_size = _flatten(boards)
+    return flat[:, window_table(grid_size, win_length)].sum(axis=2, dtype=np.int16)
+
+
+def status(boards, win_length):
+    # (N,) int8: X or O for a won board, DRAW once no window is left
+    # without marks of both players (as Game declares it), else ONGOING
+    flat, grid_size = _flatten(boards)
+    lines = flat[:, window_table(grid_size, win_length)]
+    sums = lines.sum(axis=2, dtype=np.int16)
+    live = ~((lines == X).any(axis=2) & (lines == O).any(axis=2))
+    result = np.full(len(flat), ONGOING, dtype=np.int8)
+    result[~live.any(axis=1)] = DRAW
+    result[(sums == -win_length).any(axis=1)] = O
+    # Like Game.check_winner, X is reported if both sides have a line
+    result[(sums == win_length).any(axis=1)] = X
+    return result
+
+
+def legal_moves(boards, win_length):
+    # (N, size, size) bool: empty cells of the boards still being played
+    boards = np.asarray(boards, dtype=np.int8)
+    ongoing = status(boards, win_length) == ONGOING
+    return (boards == EMPTY) & ongoing.reshape((-1,) + (1,) * (boards.ndim - 1))
+
+
+def players_to_move(boards):
+    # (N,) int8: X when both sides have as many marks, else O
+    flat, _ = _flatten(boards)
+    balance = flat.sum(axis=1, dtype=np.int32)
+    return np.where(balance == 0, X, O).astype(np.int8)
+
+
+def completing_cells(flat, table, win_length, player):
+    # (N, cells) bool: empty cells that complete a line for player
+    lines = flat[:, table]
+    own = (lines == player).sum(axis=2)
+    empty = lines == EMPTY
+    open_windows = (own == win_length - 1) & (empty.sum(axis=2) == 1)
+    boards, windows = np.nonzero(open_windows)
+    cells = table[windows, empty[boards, windows].argmax(axis=1)]
+    found = np.zeros(flat.shape, dtype=bool)
+    found[boards, cells] = True
+    return found
+
+
+def win_or_block(boards, win_length, players=None):
+    # The first two stages of the Hard AI for every board: take a winning
+    # cell, else block the opponent's.  Returns (moves, kinds) where moves
+    # is (N, 2) of (row, col), -1 where there is neither, and kinds holds
+    # WIN, BLOCK or NONE.  Ties go to the first cell in row-major order.
+    flat, grid_size = _flatten(boards)
+    if players is None:
+        players = players_to_move(boards)
+    players = np.broadcast_to(np.asarray(players, dtype=np.int8), (len(flat),))
+    table = window_table(grid_size, win_length)
+    ongoing = status(boards, win_length) == ONGOING
+
+    moves = np.full((len(flat), 2), -1, dtype=np.intp)
+    kinds = np.full(len(flat), NONE, dtype=np.int8)
+    for kind, sign in ((BLOCK, -1), (WIN, 1)):
+        # Blocks first so a win found afterwards overrides them
+        found = np.zeros(flat.shape, dtype=bool)
+        for player in (X, O):
+            rows = np.nonzero(ongoing & (players * sign == player))[0]
+            if len(rows):
+                found[rows] = completing_cells(flat[rows], table, win_length, player)
+        hit = found.any(axis=1)
+        cells = found.argmax(axis=1)[hit]
+        moves[hit, 0], moves[hit, 1] = np.divmod(cells, grid_size)
+        kinds[hit] = kind
+    return moves, kinds
+
+
+@lru_cache(maxsize=None)
+def line_table(grid_size, win_length):
+    # (lines, grid_size + 2) array of flat cell indices of every line of
+    # engine.patterns.board_lines, padded with the index grid_size ** 2
+    # (a WALL cell appended to the board) at both ends and past its end
+    wall = grid_size * grid_size
+    table = np.full((len(board_lines(grid_size, win_length)), grid_size + 2), wall, dtype=np.intp)
+    for index, line in enumerate(board_lines(grid_size, win_length)):
+        table[index, 1:len(line) + 1] = line
+    table.setflags(write=False)
+    return table
+
+
+def pattern_scores(boards, win_length):
+    # (N, 2) int64: run pattern scores of X and of O, summed over the lines
+    # as engine.patterns.PatternEvaluator.totals
+    flat, grid_size = _flatten(boards)
+    walled = np.concatenate([flat, np.full((len(flat), 1), WALL, dtype=np.int8)], axis=1)
+    lines = walled[:, line_table(grid_size, win_length)]
+    width = lines.shape[2]
+    weights = np.array(run_weights(win_length), dtype=np.int64)
+    positions = np.arange(width)
+    result = np.zeros((len(flat), 2), dtype=np.int64)
+    for column, player in enumerate((X, O)):
+        own = lines == player
+        blocked = ~own & (lines != EMPTY)
+        # Room of each cell: length of the stretch between the blocked
+        # cells on either side of it
+        before = np.maximum.accumulate(np.where(blocked, positions, 0), axis=2)
+        after = np.minimum.accumulate(np.where(blocked, positions, width)[:, :, ::-1], axis=2)[:, :, ::-1]
+        room = after - before - 1
+        run = np.zeros(lines.shape[:2], dtype=np.int64)
+        start_open = np.zeros(lines.shape[:2], dtype=np.int64)
+        total = np.zeros(lines.shape[:2], dtype=np.int64)
+        # The first and last columns are always walls
+        for index in range(1, width - 1):
+            mark = own[:, :, index]
+            starts = mark & ~own[:, :, index - 1]
+            start_open = np.where(starts, lines[:, :, index - 1] == EMPTY, start_open)
+            run = np.where(mark, run + 1, 0)
+            ends = mark & ~own[:, :, index + 1]
+            ends &= room[:, :, index] >= win_length
+            open_ends = start_open + (lines[:, :, index + 1] == EMPTY)
+            total += np.where(ends, weights[np.minimum(run, win_length), open_ends], 0)
+        result[:, column] = total.sum(axis=1)
+    return result
+
+
+def evaluate(boards, win_length, players=None):
+    # (N,) int64: engine.patterns.PatternEvaluator.evaluate for the player
+    # to move on every ongoing board
+    flat, grid_size = _flatten(boards)
+    if players is None:
+        players = players_to_move(boards)
+    players = np.broadcast_to(np.asarray(players, dtype=np.int8), (len(flat),))
+    scores = pattern_scores(boards, win_length)
+    own = np.where(players == X, scores[:, 0], scores[:, 1])
+    result = np.clip(own - (scores[:, 0] + scores[:, 1] - own), 1 - THREAT_SCORE, THREAT_SCORE - 1)
+    table = window_table(grid_size, win_length)
+    wins = {player: completing_cells(flat, table, win_length, player).sum(axis=1)
+            for player in (X, O)}
+    # A winning cell of the side to move outranks two of the opponent's
+    for player in (X, O):
+        result[(players == -player) & (wins[player] > 1)] = -THREAT_SCORE
+    for player in (X, O):
+        result[(players == player) & (wins[player] > 0)] = THREAT_SCORE
+    return result
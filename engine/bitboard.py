@@ -0,0 +1,114 @@
+"""Compact board storage: one integer bitmask per player.
+
+Cell (row, col) maps to bit ``row * grid_size + col``.  Winning lines are
+precomputed once per ``(grid_size, win_length)`` pair as masks, so checking
+for a win is a handful of AND/compare operations and copying a board is
+just copying two integers.
+"""
+
+from functools import lru_cache
+
+from engine.wincheck import cell_windows, line_windows
+
+
+@lru_cache(maxsize=None)
+def win_masks(grid_size, win_length):
+    # One mask per winning window
+    masks = []
+    for window in line_windows(grid_size, win_length):
+        mask = 0
+        for cell in window:
+            mask |= 1 << cell
+        masks.append(mask)
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def cell_masks(grid_size, win_length):
+    # For each cell, the masks of the winning windows passing through it
+    masks = win_masks(grid_size, win_length)
+    return tuple(tuple(masks[index] for index in indices)
+                 for indices in cell_windows(grid_size, win_length))
+
+
+def iter_bits(bits):
+    # Yield the indices of the set bits, lowest first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class BitBoard:
+    __slots__ = ('grid_size', 'win_length', 'x', 'o', 'masks', 'cell_masks', 'full')
+
+    def __init__(self, grid_size, win_length, x=0, o=0):
+        self.grid_size = grid_size
+        self.win_length = win_length
+        self.x = x
+        self.o = o
+        self.masks = win_masks(grid_size, win_length)
+        self.cell_masks = cell_masks(grid_size, win_length)
+        self.full = (1 << (grid_size * grid_size)) - 1
+
+    def copy(self):
+        return BitBoard(self.grid_size, self.win_length, self.x, self.o)
+
+    def bits(self, player):
+        return self.x if player == 'X' else self.o
+
+    def get(self, row, col):
+        bit = 1 << (row * self.grid_size + col)
+        if self.x & bit:
+            return 'X'
+        if self.o & bit:
+            return 'O'
+        return ''
+
+    def is_empty(self, row, col):
+        return not (self.x | self.o) >> (row * self.grid_size + col) & 1
+
+    def place(self, row, col, player):
+        bit = 1 << (row * self.grid_size + col)
+        if player == 'X':
+            self.x |= bit
+        else:
+            self.o |= bit
+
+    def clear(self, row, col):
+        mask = ~(1 << (row * self.grid_size + col))
+        self.x &= mask
+        self.o &= mask
+
+    def winner(self):
+        x, o = self.x, self.o
+        for mask in self.masks:
+            if x & mask == mask:
+                return 'X'
+            if o & mask == mask:
+                return 'O'
+        return None
+
+    def is_winning_move(self, row, col, player):
+        # Only the windows through the played cell can have been completed
+        cell = row * self.grid_size + col
+        bits = self.bits(player) | 1 << cell
+        for mask in self.cell_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def is_full(self):
+        return self.x | self.o == self.full
+
+    def empty_cells(self):
+        free = self.full & ~(self.x | self.o)
+        return [divmod(cell, self.grid_size) for cell in iter_bits(free)]
+
+    def move_count(self):
+        return bin(self.x | self.o).count('1')
+
+    def rows(self):
+        # List-of-lists view in the format the front-ends used to keep
+        return [[self.get(i, j) for j in range(self.grid_size)]
+                for i in range(self.grid_size)]
@@ -0,0 +1,224 @@
+"""Opening book: precomputed moves keyed by canonical position.
+
+Level 1 (3x3) is solved completely, so every reachable position maps to a
+perfect-play move.  For the larger levels the first few plies are searched
+offline with a generous time budget.  The book is written as a compact
+binary file and loaded lazily on the first Hard move.
+
+Build (or rebuild) it from the repository root with:
+
+    python -m engine.book [--plies 2] [--budget-ms 2000]
+
+File layout (little endian): the magic ``b'TTTB'``, a format version byte
+and a section count byte, then per section ``grid_size``, ``win_length``
+(one byte each) and a ``uint32`` record count followed by that many
+``(uint64 key, uint8 move, int8 outcome)`` records sorted by key.  Keys are
+the smallest base-3 encoding of the position over the eight board
+symmetries and moves are stored in that canonical orientation.  Outcomes
+are +1/0/-1 for the side to move when known exactly, 0 otherwise.
+"""
+
+import os
+import struct
+from functools import lru_cache
+
+from engine.search import WIN_SCORE, Searcher, center_order, other
+from engine.transposition import TranspositionTable, inverse_symmetries, symmetries
+from engine.wincheck import WinTracker
+
+MAGIC = b'TTTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBB')
+SECTION = struct.Struct('<BBI')
+RECORD = struct.Struct('<QBb')
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+CELL_VALUES = {'': 0, 'X': 1, 'O': 2}
+
+
+@lru_cache(maxsize=None)
+def _weights(grid_size):
+    # weights[symmetry][cell] = 3 ** (where cell lands under the symmetry)
+    return tuple(tuple(3 ** image for image in perm) for perm in symmetries(grid_size))
+
+
+def canonical_key(cells, grid_size):
+    # (key, symmetry index) of the smallest encoding over all symmetries
+    occupied = [(cell, CELL_VALUES[mark]) for cell, mark in enumerate(cells) if mark]
+    best_key, best_symmetry = None, 0
+    for symmetry, weights in enumerate(_weights(grid_size)):
+        key = 0
+        for cell, value in occupied:
+            key += value * weights[cell]
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+class OpeningBook:
+    def __init__(self, sections=None):
+        # {(grid_size, win_length): {key: (canonical_move, outcome)}}
+        self.sections = sections or {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.sections.values())
+
+    @classmethod
+    def load(cls, path=BOOK_PATH):
+        with open(path, 'rb') as book_file:
+            data = book_file.read()
+        magic, version, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        offset = HEADER.size
+        sections = {}
+        for _ in range(count):
+            grid_size, win_length, records = SECTION.unpack_from(data, offset)
+            offset += SECTION.size
+            end = offset + records * RECORD.size
+            sections[(grid_size, win_length)] = {
+                key: (move, outcome) for key, move, outcome in RECORD.iter_unpack(data[offset:end])
+            }
+            offset = end
+        return cls(sections)
+
+    def save(self, path=BOOK_PATH):
+        with open(path, 'wb') as book_file:
+            book_file.write(HEADER.pack(MAGIC, VERSION, len(self.sections)))
+            for (grid_size, win_length), entries in sorted(self.sections.items()):
+                book_file.write(SECTION.pack(grid_size, win_length, len(entries)))
+                for key in sorted(entries):
+                    move, outcome = entries[key]
+                    book_file.write(RECORD.pack(key, move, outcome))
+
+    def add(self, cells, grid_size, win_length, move, outcome=0):
+        key, symmetry = canonical_key(cells, grid_size)
+        section = self.sections.setdefault((grid_size, win_length), {})
+        section[key] = (symmetries(grid_size)[symmetry][move], outcome)
+
+    def probe(self, cells, grid_size, win_length):
+        # (flat move index, outcome) for the position, or None if not covered
+        section = self.sections.get((grid_size, win_length))
+        if not section:
+            return None
+        key, symmetry = canonical_key(cells, grid_size)
+        entry = section.get(key)
+        if entry is None:
+            return None
+        move, outcome = entry
+        return inverse_symmetries(grid_size)[symmetry][move], outcome
+
+    def lookup(self, cells, grid_size, win_length):
+        # (row, col) to play, or None if the position is not in the book
+        entry = self.probe(cells, grid_size, win_length)
+        if entry is None:
+            return None
+        return divmod(entry[0], grid_size)
+
+
+_book = None
+_book_loaded = False
+
+
+def get_opening_book():
+    # Loaded on first use; None when the book file is not shipped
+    global _book, _book_loaded
+    if not _book_loaded:
+        _book_loaded = True
+        try:
+            _book = OpeningBook.load()
+        except (OSError, ValueError, struct.error):
+            _book = None
+    return _book
+
+
+def solve(grid_size, win_length, book):
+    # Exhaustive negamax over every reachable position; fills book with the
+    # fastest win (or slowest loss) for each non-terminal position.  Scores
+    # are relative to the node: WIN_SCORE - n means a win n plies ahead.
+    tracker = WinTracker(grid_size, win_length)
+    cells = tracker.cells
+    order = center_order(grid_size)
+    memo = {}
+
+    def value(player):
+        key, _ = canonical_key(cells, grid_size)
+        if key in memo:
+            return memo[key]
+        best_score, best_move = -WIN_SCORE - 1, None
+        # Central cells first so ties go to the most natural move
+        for cell in order:
+            if cells[cell]:
+                continue
+            row, col = divmod(cell, grid_size)
+            if tracker.place(row, col, player):
+                score = WIN_SCORE - 1
+            elif tracker.is_full():
+                score = 0
+            else:
+                score = -value(other(player))
+                # One ply further away from the result
+                score -= (score > 0) - (score < 0)
+            tracker.undo()
+            if score > best_score:
+                best_score, best_move = score, cell
+        book.add(cells, grid_size, win_length, best_move, (best_score > 0) - (best_score < 0))
+        memo[key] = best_score
+        return best_score
+
+    value('X')
+
+
+def openings(grid_size, win_length, plies, book, budget_ms, log=print):
+    # Search every distinct position of the first plies with a long budget
+    table = TranspositionTable()
+    tracker = WinTracker(grid_size, win_length)
+    cells = tracker.cells
+    seen = set()
+
+    def visit(player, depth):
+        key, _ = canonical_key(cells, grid_size)
+        if key in seen:
+            return
+        seen.add(key)
+        result = Searcher(time_budget_ms=budget_ms, table=table).search(tracker, player)
+        move = result.move[0] * grid_size + result.move[1]
+        outcome = (result.score > 0) - (result.score < 0) if result.completed else 0
+        book.add(cells, grid_size, win_length, move, outcome)
+        log(f"{grid_size}x{grid_size} ply {depth}: {len(seen)} positions, depth {result.depth}")
+        if depth == plies:
+            return
+        for cell in range(len(cells)):
+            if cells[cell]:
+                continue
+            row, col = divmod(cell, grid_size)
+            if not tracker.place(row, col, player):
+                visit(other(player), depth + 1)
+            tracker.undo()
+
+    visit('X', 0)
+
+
+def main(argv=None):
+    # Loaded here: the games import this module and never need argparse
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the opening book")
+    parser.add_argument('--output', default=BOOK_PATH)
+    parser.add_argument('--plies', type=int, default=2,
+                        help="opening plies covered on the 4x4 and 5x5 levels")
+    parser.add_argument('--budget-ms', type=int, default=2000,
+                        help="search time per opening position")
+    args = parser.parse_args(argv)
+
+    book = OpeningBook()
+    solve(3, 3, book)
+    print(f"3x3 solved: {len(book)} positions")
+    for grid_size, win_length in ((4, 4), (5, 5)):
+        openings(grid_size, win_length, args.plies, book, args.budget_ms)
+    book.save(args.output)
+    print(f"{len(book)} positions, {os.path.getsize(args.output)} bytes written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
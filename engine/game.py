@@ -0,0 +1,253 @@
+"""Game rules and level progression without any GUI toolkit."""
+
+import copy
+import random
+import time
+
+from engine.metrics import METRICS
+from engine.position import Position
+
+# (grid_size, win_length) for each level, starting at level 1
+LEVELS = ((3, 3), (4, 4), (5, 5))
+
+DIFFICULTIES = ("Easy", "Medium", "Hard", "MCTS")
+
+# Level tables offered by the settings menus of the front-ends
+BOARD_PRESETS = {
+    "3x3 → 5x5": LEVELS,
+    "10x10, 5 в ряд": ((10, 5),),
+    "15x15, 5 в ряд": ((15, 5),),
+    "19x19, 5 в ряд": ((19, 5),),
+}
+
+
+def check_board(grid_size, win_length):
+    if not 2 <= win_length <= grid_size:
+        raise ValueError(f"cannot play {win_length} in a row on a {grid_size}x{grid_size} board")
+
+
+class Game:
+    def __init__(self, vs_ai=True, ai_difficulty="Medium", rng=None, levels=LEVELS, seed=None):
+        self.vs_ai = vs_ai
+        self.ai_difficulty = ai_difficulty
+        # Every game gets its own seed, kept for its record, and the rng is
+        # reseeded with it on reset: the first game plays seed itself, the
+        # later ones seeds drawn from it, so Game(seed=record.seed) replays
+        # any recorded game.  An rng passed in is used as is and the games
+        # record no seed.
+        if rng is None:
+            if seed is None:
+                seed = random.getrandbits(63)
+            self.seeds = random.Random(seed)
+            rng = random.Random()
+        else:
+            self.seeds = None
+            seed = None
+        self.seed = seed
+        self.rng = rng
+        # Gets record(game) calls for finished and abandoned games
+        # (engine.records.GameLog)
+        self.recorder = None
+        # Answers of earlier Hard searches to reuse and extend
+        # (engine.store.Store, shared with snapshots)
+        self.store = None
+        # Statistics of the most recent Hard search (engine.search.SearchResult)
+        self.last_search = None
+        # Fixed Hard search depth instead of the per-move time budget
+        self.search_depth = None
+        # Set by engine.worker to stop a search running on a snapshot
+        self.cancel_event = None
+        # Bumped by every reset so results computed for an older game are dropped
+        self.generation = 0
+        self.levels = ()
+        self.set_levels(levels)
+
+    def reset(self):
+        # Start a new game on the current level
+        self.save_record()
+        self.generation += 1
+        if self.seeds is not None:
+            if self.generation > 1:
+                self.seed = self.seeds.getrandbits(63)
+            self.rng.seed(self.seed)
+        self.current_player = 'X'
+        self.game_over = False
+        self.winner = None
+        self.set_position(Position(self.grid_size, self.win_length))
+        # Moves taken back by undo(), most recent last
+        self.redo_stack = []
+        # Seconds since the previous move (or the start) for every move
+        self.started = time.time()
+        self.move_times = []
+        self.last_move_at = time.perf_counter()
+        self.recorded = False
+
+    def set_position(self, position):
+        # board and tracker are views of the position, kept for callers
+        self.position = position
+        self.board = position.board
+        self.tracker = position.tracker
+
+    def save_record(self):
+        # Hand the game to the recorder once, if any move was played
+        if self.recorder is None or self.recorded or not self.tracker.history:
+            return
+        self.recorded = True
+        self.recorder.record(self)
+
+    def set_levels(self, levels):
+        # Replace the level table, e.g. ((15, 5),) for gomoku, and restart
+        levels = tuple(levels)
+        if not levels:
+            raise ValueError("at least one level is required")
+        for grid_size, win_length in levels:
+            check_board(grid_size, win_length)
+        self.levels = levels
+        self.set_level(1)
+
+    def configure_level(self, level, grid_size, win_length):
+        # Change the board of one level (1-based); new levels may be appended.
+        # The game restarts if it is on that level
+        check_board(grid_size, win_length)
+        levels = list(self.levels)
+        if not 1 <= level <= len(levels) + 1:
+            raise ValueError(f"level {level} is not in 1..{len(levels) + 1}")
+        if level == len(levels) + 1:
+            levels.append((grid_size, win_length))
+        else:
+            levels[level - 1] = (grid_size, win_length)
+        self.levels = tuple(levels)
+        if level == self.current_level:
+            self.set_level(level)
+
+    def set_level(self, level):
+        self.current_level = level
+        self.grid_size, self.win_length = self.levels[level - 1]
+        self.reset()
+
+    def set_board(self, grid_size, win_length):
+        # Play on a custom board without changing the level number
+        check_board(grid_size, win_length)
+        self.grid_size, self.win_length = grid_size, win_length
+        self.reset()
+
+    def reset_level(self):
+        # Back to level 1
+        self.set_level(1)
+
+    def advance_level(self):
+        level = self.current_level + 1
+        if level > len(self.levels):
+            # Max level reached, restart at level 1 but keep the difficulty
+            level = 1
+        elif self.ai_difficulty == "MCTS":
+            pass  # A separate mode rather than a step of the progression
+        elif level == 2:
+            self.ai_difficulty = "Medium" if self.ai_difficulty == "Easy" else "Hard"
+        elif level == 3:
+            self.ai_difficulty = "Hard"  # Force hard difficulty
+        self.set_level(level)
+
+    @property
+    def is_draw(self):
+        return self.game_over and self.winner is None
+
+    def make_move(self, row, col):
+        # Place the current player's mark; False if the move is not allowed
+        if self.game_over or not self.board.is_empty(row, col):
+            return False
+        self.redo_stack.clear()
+        self.play(row * self.grid_size + col)
+        return True
+
+    def play(self, cell):
+        player = self.current_player
+        now = time.perf_counter()
+        self.move_times.append(now - self.last_move_at)
+        self.last_move_at = now
+        if METRICS.enabled:
+            METRICS.count('win_updates')
+            with METRICS.timer('win_check'):
+                self.winner = self.position.play(cell, player)
+        else:
+            self.winner = self.position.play(cell, player)
+        # A draw is declared as soon as nobody can complete a line
+        if self.winner or self.tracker.is_drawn():
+            self.game_over = True
+            self.save_record()
+        else:
+            self.current_player = 'O' if player == 'X' else 'X'
+
+    def can_undo(self):
+        return bool(self.tracker.history)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        # Take back the last move; returns its (row, col), or None.  Only
+        # that cell's bits, counters and hashes change.
+        if not self.tracker.history:
+            return None
+        cell, player = self.position.unplay()
+        self.redo_stack.append(cell)
+        if self.move_times:
+            self.move_times.pop()
+        self.current_player = player
+        self.game_over = False
+        self.winner = None
+        # A finished game that is played on is recorded again when it ends
+        self.recorded = False
+        return divmod(cell, self.grid_size)
+
+    def redo(self):
+        # Replay the last undone move; returns its (row, col), or None
+        if not self.redo_stack:
+            return None
+        cell = self.redo_stack.pop()
+        self.play(cell)
+        return divmod(cell, self.grid_size)
+
+    def snapshot(self):
+        # Independent copy for computing a move off the UI thread
+        clone = copy.copy(self)
+        # Its own generator, seeded from ours, so the worker thread never
+        # draws from the UI's; the store is shared and locks itself
+        clone.rng = random.Random(self.rng.getrandbits(64))
+        clone.recorder = None
+        clone.set_position(self.position.copy())
+        clone.redo_stack = []
+        return clone
+
+    def check_winner(self):
+        # Full rescan of the board; play() reads the win tracker instead
+        return self.board.winner()
+
+    def winning_line(self):
+        # [(row, col), ...] of the line that won the game, or [] without one
+        cells = self.tracker.winning_line() or ()
+        return [divmod(cell, self.grid_size) for cell in cells]
+
+    def is_board_full(self):
+        return self.board.is_full()
+
+    def is_ai_turn(self):
+        return self.vs_ai and self.current_player == 'O' and not self.game_over
+
+    def ai_move(self):
+        # Choose a move for the current player based on difficulty.  The AI
+        # modules (search, MCTS, opening book) load on the first AI move,
+        # not at startup
+        from engine.ai import STRATEGIES
+        if not METRICS.enabled:
+            return STRATEGIES[self.ai_difficulty](self, self.rng)
+        with METRICS.timer('ai_move'), METRICS.profile():
+            move = STRATEGIES[self.ai_difficulty](self, self.rng)
+        # Work done by the search (SearchResult) or MCTS (MCTSResult)
+        result = self.last_search
+        if result is not None:
+            if hasattr(result, 'nodes'):
+                METRICS.count('nodes', result.nodes)
+            else:
+                METRICS.count('playouts', result.playouts)
+        return move
@@ -0,0 +1,284 @@
+"""Monte Carlo Tree Search for the MCTS difficulty.
+
+Plain UCT: selection by the UCB1 formula, one node expanded per
+iteration, a uniformly random rollout to the end of the game on two
+integer bitboards, and the result backed up the path.  The search stops
+after a fixed number of iterations or when its time budget runs out.
+
+The tree survives between calls: if the next position is the old root
+plus the moves played since (the AI's own move and the reply), the
+matching subtree becomes the new root and its statistics are kept.
+With ``jobs > 1`` independent trees are grown from the root in worker
+processes (root parallelism) and their root visit counts are summed.
+``python -m benchmarks.mcts`` reports the playout rate.
+"""
+
+import atexit
+import math
+import random
+import threading
+import time
+from collections import namedtuple
+
+from engine.bitboard import cell_masks, iter_bits
+
+# UCB1 exploration constant (sqrt(2) for results in [0, 1])
+EXPLORATION = math.sqrt(2)
+
+# How many iterations run between clock and cancel checks
+CLOCK_INTERVAL = 32
+
+# Game results as seen by the tree: the index of the winner or a draw
+X, O, DRAW = 0, 1, 2
+
+MCTSResult = namedtuple('MCTSResult', 'move playouts elapsed_ms playouts_per_s win_rate reused')
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits', 'wins', 'result')
+
+    def __init__(self, move, parent, player, untried, result):
+        self.move = move          # Cell played to reach this node
+        self.parent = parent
+        self.player = player      # Who played move; wins are counted for them
+        self.children = []
+        self.untried = untried    # Moves not expanded yet, in random order
+        self.visits = 0
+        self.wins = 0.0
+        self.result = result      # X, O or DRAW if the game ended here, else None
+
+
+def rollout(stones, player, empty, masks, rng):
+    # Random playout from the position; returns X, O or DRAW
+    cells = list(iter_bits(empty))
+    rng.shuffle(cells)
+    stones = stones[:]
+    for cell in cells:
+        mine = stones[player] | 1 << cell
+        stones[player] = mine
+        for mask in masks[cell]:
+            if mine & mask == mask:
+                return player
+        player ^= 1
+    return DRAW
+
+
+class MCTS:
+    def __init__(self, iterations=None, time_budget_ms=250, exploration=EXPLORATION,
+                 cancel_event=None):
+        self.iterations = iterations
+        self.time_budget_ms = time_budget_ms
+        self.exploration = exploration
+        self.cancel_event = cancel_event
+        self.root = None
+        self.root_key = None
+        # Held by a search for its whole run: a search that was cancelled
+        # but has not reached its next cancel check yet still owns the
+        # tree, and the next search waits for it rather than growing the
+        # same nodes at once
+        self.lock = threading.RLock()
+
+    def new_root(self, grid_size, stones, player, rng):
+        empty = ((1 << grid_size * grid_size) - 1) & ~(stones[0] | stones[1])
+        untried = list(iter_bits(empty))
+        rng.shuffle(untried)
+        # The root "was played" by the opponent of the side to move
+        return Node(None, None, player ^ 1, untried, None)
+
+    def reuse_root(self, grid_size, win_length, stones, player):
+        # The stored subtree for this position, if the tree can be reused
+        if self.root is None or self.root_key[:2] != (grid_size, win_length):
+            return None
+        _, _, old = self.root_key
+        if old[0] & ~stones[0] or old[1] & ~stones[1]:
+            return None
+        node = self.root
+        added = [stones[0] & ~old[0], stones[1] & ~old[1]]
+        mover = node.player ^ 1
+        while added[0] | added[1]:
+            bits = added[mover]
+            # Each side adds at most one stone between two calls
+            if not bits or bits & (bits - 1):
+                return None
+            cell = bits.bit_length() - 1
+            node = next((child for child in node.children if child.move == cell), None)
+            if node is None:
+                return None
+            added[mover] = 0
+            mover ^= 1
+        if node.player ^ 1 != player or node.result is not None:
+            return None
+        node.parent = None
+        return node
+
+    def search(self, grid_size, win_length, x, o, player, rng=random, iterations=None,
+               time_budget_ms=None, cancel_event=None):
+        # player is 'X' or 'O'; returns an MCTSResult.  Limits and a cancel
+        # event given here replace the instance's for this search only
+        with self.lock:
+            return self.run(grid_size, win_length, x, o, player, rng,
+                            self.iterations if iterations is None else iterations,
+                            self.time_budget_ms if time_budget_ms is None else time_budget_ms,
+                            self.cancel_event if cancel_event is None else cancel_event)
+
+    def run(self, grid_size, win_length, x, o, player, rng, iterations, time_budget_ms,
+            cancel_event):
+        start = time.perf_counter()
+        stones = [x, o]
+        to_move = X if player == 'X' else O
+        root = self.reuse_root(grid_size, win_length, stones, to_move)
+        reused = root.visits if root is not None else 0
+        if root is None:
+            root = self.new_root(grid_size, stones, to_move, rng)
+        self.root = root
+        self.root_key = (grid_size, win_length, (x, o))
+
+        masks = cell_masks(grid_size, win_length)
+        full = (1 << grid_size * grid_size) - 1
+        deadline = None
+        if time_budget_ms is not None:
+            deadline = start + time_budget_ms / 1000
+        exploration = self.exploration
+        log, sqrt = math.log, math.sqrt
+        playouts = 0
+
+        while True:
+            if iterations is not None and playouts >= iterations:
+                break
+            if playouts % CLOCK_INTERVAL == 0 and playouts:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+
+            # Selection
+            node = root
+            position = stones[:]
+            while node.result is None and not node.untried and node.children:
+                scale = exploration * sqrt(log(node.visits))
+                best, best_value = None, -1.0
+                for child in node.children:
+                    value = child.wins / child.visits + scale / sqrt(child.visits)
+                    if value > best_value:
+                        best, best_value = child, value
+                node = best
+                position[node.player] |= 1 << node.move
+
+            # Expansion
+            if node.result is None and node.untried:
+                move = node.untried.pop()
+                mover = node.player ^ 1
+                mine = position[mover] | 1 << move
+                position[mover] = mine
+                result = None
+                for mask in masks[move]:
+                    if mine & mask == mask:
+                        result = mover
+                        break
+                empty = full & ~(position[0] | position[1])
+                if result is None and not empty:
+                    result = DRAW
+                untried = list(iter_bits(empty)) if result is None else []
+                rng.shuffle(untried)
+                child = Node(move, node, mover, untried, result)
+                node.children.append(child)
+                node = child
+
+            # Simulation
+            result = node.result
+            if result is None:
+                result = rollout(position, node.player ^ 1, full & ~(position[0] | position[1]),
+                                 masks, rng)
+            playouts += 1
+
+            # Backpropagation
+            while node is not None:
+                node.visits += 1
+                if result == node.player:
+                    node.wins += 1
+                elif result == DRAW:
+                    node.wins += 0.5
+                node = node.parent
+
+        elapsed = time.perf_counter() - start
+        best = max(root.children, key=lambda child: child.visits, default=None)
+        move = divmod(best.move, grid_size) if best is not None else None
+        return MCTSResult(move, playouts, elapsed * 1000, playouts / elapsed if elapsed else 0.0,
+                          best.wins / best.visits if best is not None else 0.0, reused)
+
+    def root_statistics(self):
+        # {cell: (visits, wins)} of the root's children
+        if self.root is None:
+            return {}
+        return {child.move: (child.visits, child.wins) for child in self.root.children}
+
+
+def search_worker(grid_size, win_length, x, o, player, iterations, time_budget_ms, seed):
+    # Process pool entry point: one independent tree from the root
+    mcts = MCTS(iterations, time_budget_ms)
+    result = mcts.search(grid_size, win_length, x, o, player, random.Random(seed))
+    return result.playouts, mcts.root_statistics()
+
+
+_pool = None
+_pool_jobs = 0
+
+
+def get_pool(jobs):
+    # Worker processes are started once and kept for later moves.
+    # concurrent.futures (and multiprocessing) is imported here, not at
+    # startup, as single-process searches never need it
+    from concurrent.futures import ProcessPoolExecutor
+    global _pool, _pool_jobs
+    if _pool is None or _pool_jobs != jobs:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=jobs)
+        _pool_jobs = jobs
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def parallel_search(mcts, grid_size, win_length, x, o, player, jobs, rng=random,
+                    iterations=None, time_budget_ms=None, cancel_event=None):
+    # Root parallelism: this process grows mcts' (possibly reused) tree
+    # while jobs - 1 workers grow fresh ones; the most visited move of the
+    # summed root statistics is played.  Limits as for MCTS.search
+    start = time.perf_counter()
+    if iterations is None:
+        iterations = mcts.iterations
+    if time_budget_ms is None:
+        time_budget_ms = mcts.time_budget_ms
+    futures = []
+    if jobs > 1:
+        pool = get_pool(jobs - 1)
+        futures = [pool.submit(search_worker, grid_size, win_length, x, o, player,
+                               iterations, time_budget_ms, rng.getrandbits(64))
+                   for _ in range(jobs - 1)]
+    # The root statistics are read before another search can move the root
+    with mcts.lock:
+        result = mcts.search(grid_size, win_length, x, o, player, rng, iterations,
+                             time_budget_ms, cancel_event)
+        totals = mcts.root_statistics()
+    playouts = result.playouts
+    for future in futures:
+        worker_playouts, statistics = future.result()
+        playouts += worker_playouts
+        for cell, (visits, wins) in statistics.items():
+            old_visits, old_wins = totals.get(cell, (0, 0.0))
+            totals[cell] = (old_visits + visits, old_wins + wins)
+    if not totals:
+        return result
+    cell = max(totals, key=lambda cell: totals[cell][0])
+    visits, wins = totals[cell]
+    elapsed = time.perf_counter() - start
+    return MCTSResult(divmod(cell, grid_size), playouts, elapsed * 1000,
+                      playouts / elapsed if elapsed else 0.0, wins / visits, result.reused)
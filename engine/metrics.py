@@ -0,0 +1,228 @@
+"""Opt-in latency timers, counters and profiling hooks.
+
+The engine and both front-ends report into the shared ``METRICS``:
+
+- timers: ``ai_move`` (the strategy itself, on the worker thread),
+  ``ai_latency`` (from the request to the move reaching the UI thread),
+  ``win_check`` (updating the win tracker in ``make_move``), ``render``
+  (drawing a cell), ``board_build`` (level transitions), and
+  ``startup_imports`` and ``first_frame`` (from the start of the
+  front-end's imports);
+- counters: ``win_updates`` (moves played onto the game's win tracker),
+  ``win_probes`` (``is_winning_move`` calls of MCTS's win/block check),
+  ``nodes`` searched by Hard (each one a win tracker update and check)
+  and ``playouts`` run by MCTS.
+
+Everything is off unless ``TICTACTOE_METRICS=1`` is set or ``enable()``
+is called; disabled timers are a shared no-op context manager and
+counters a single attribute test.  ``TICTACTOE_PROFILE=cprofile`` (AI
+moves only) or ``=sampling`` (every thread) adds a profiler.  Summaries
+are written as JSON and CSV by ``dump()``, which the front-ends call on
+exit.  The profilers and the CSV writer are imported only when used, as
+both front-ends import this module at startup.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+# Interval between two samples of the sampling profiler
+SAMPLING_INTERVAL_MS = 5
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+
+
+class SamplingProfiler:
+    # Counts the innermost frame of every thread at a fixed interval; cheap
+    # enough to leave running on a device
+    def __init__(self, interval_ms=SAMPLING_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = {}
+        self.total = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='sampling-profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        own = threading.get_ident()
+        while self.running:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                key = (code.co_filename, code.co_name, frame.f_lineno)
+                self.samples[key] = self.samples.get(key, 0) + 1
+                self.total += 1
+            time.sleep(self.interval)
+
+    def report(self, top=30):
+        if not self.total:
+            return "no samples"
+        lines = [f"{self.total} samples every {self.interval * 1000:g}ms"]
+        for (filename, name, line), count in sorted(self.samples.items(),
+                                                     key=lambda item: -item[1])[:top]:
+            lines.append(f"{count / self.total:7.1%}  {name} ({os.path.basename(filename)}:{line})")
+        return '\n'.join(lines)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+        self.profiler = None
+        self.sampler = None
+        self.profile_lock = threading.Lock()
+        self.null_timer = contextlib.nullcontext()
+
+    def enable(self, profile=None):
+        # profile: None, 'cprofile' or 'sampling'
+        self.enabled = True
+        if profile == 'cprofile' and self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        elif profile == 'sampling' and self.sampler is None:
+            self.sampler = SamplingProfiler()
+            self.sampler.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def configure_from_env(self, environ=os.environ):
+        if environ.get('TICTACTOE_METRICS', '') not in ('', '0'):
+            self.enable(environ.get('TICTACTOE_PROFILE') or None)
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def timer(self, name):
+        # Context manager timing its block; a no-op while disabled
+        if not self.enabled:
+            return self.null_timer
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds * 1000)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def profile(self):
+        # cProfile the block (on the calling thread) when that hook is on
+        # (one block at a time; overlapping ones run unprofiled)
+        profiler = self.profiler
+        if profiler is None or not self.profile_lock.acquire(blocking=False):
+            yield
+            return
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.profile_lock.release()
+
+    def summary(self):
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            counters = dict(self.counters)
+        result = {'timers': {}, 'counters': counters}
+        for name, values in timings.items():
+            result['timers'][name] = {
+                'count': len(values),
+                'total_ms': sum(values),
+                'mean_ms': sum(values) / len(values),
+                'p50_ms': percentile(values, 0.5),
+                'p90_ms': percentile(values, 0.9),
+                'p99_ms': percentile(values, 0.99),
+                'max_ms': values[-1],
+            }
+        return result
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump(self.summary(), json_file, indent=2, sort_keys=True)
+
+    def export_csv(self, path):
+        # One row per timer and per counter
+        import csv
+        summary = self.summary()
+        fields = ('name', 'kind', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms',
+                  'max_ms')
+        with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fields)
+            writer.writeheader()
+            for name, stats in sorted(summary['timers'].items()):
+                writer.writerow(dict(stats, name=name, kind='timer'))
+            for name, count in sorted(summary['counters'].items()):
+                writer.writerow({'name': name, 'kind': 'counter', 'count': count})
+
+    def profile_report(self, top=30):
+        if self.profiler is not None:
+            import pstats
+            stream = io.StringIO()
+            try:
+                pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+            except TypeError:
+                return "no profile data"  # No AI move was profiled
+            return stream.getvalue()
+        if self.sampler is not None:
+            return self.sampler.report(top)
+        return None
+
+    def dump(self, directory):
+        # Write metrics.json, metrics.csv and profile.txt; nothing if disabled
+        if not self.enabled and not self.timings and not self.counters:
+            return []
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, 'metrics.json'), os.path.join(directory, 'metrics.csv')]
+        self.export_json(paths[0])
+        self.export_csv(paths[1])
+        report = self.profile_report()
+        if report is not None:
+            paths.append(os.path.join(directory, 'profile.txt'))
+            with open(paths[-1], 'w', encoding='utf-8') as report_file:
+                report_file.write(report)
+        return paths
+
+
+METRICS = Metrics()
@@ -0,0 +1,216 @@
+"""Pattern evaluation and threat detection for large boards.
+
+Every line of the board (a row, column or diagonal with room for
+``win_length`` marks) is scored for both players from its runs.  A
+maximal run of one player's marks is worth more the longer it is and the
+more of its two ends are open (empty); a run boxed in by the opponent's
+marks and the edges with less than ``win_length`` cells of room scores
+nothing.  Scores are kept per line, so a move only rescans the (up to
+four) lines through it.
+
+Threats come from the winning windows of the ``WinTracker``: a window
+holding ``win_length - 1`` marks of one player and none of the other is a
+four, whose empty cell wins; with ``win_length - 2`` marks it is a three,
+either of whose empty cells makes a four.  Fours are forcing: the
+opponent has to block them or lose.
+
+The search keeps an evaluator on its position from 5x5 on (see
+``Position.track_patterns``); ``engine.batch.pattern_scores`` and
+``engine.batch.evaluate`` compute the same scores for many boards at once.
+"""
+
+from functools import lru_cache
+
+from engine.wincheck import DIRECTIONS, PLAYERS
+
+# Score of a position whose side to move wins with its next mark, or
+# whose opponent has two winning cells; kept below search.MATE_BOUND so
+# that real wins still come first
+THREAT_SCORE = 500000
+
+
+@lru_cache(maxsize=None)
+def board_lines(grid_size, win_length):
+    # Every full row, column and diagonal at least win_length long, as a
+    # tuple of flat cell indices
+    lines = []
+    for dr, dc in DIRECTIONS:
+        for row in range(grid_size):
+            for col in range(grid_size):
+                if 0 <= row - dr < grid_size and 0 <= col - dc < grid_size:
+                    continue  # Not the first cell of its line
+                line = []
+                r, c = row, col
+                while 0 <= r < grid_size and 0 <= c < grid_size:
+                    line.append(r * grid_size + c)
+                    r, c = r + dr, c + dc
+                if len(line) >= win_length:
+                    lines.append(tuple(line))
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def cell_lines(grid_size, win_length):
+    # For each flat cell index, the indices of the lines passing through it
+    through = [[] for _ in range(grid_size * grid_size)]
+    for index, line in enumerate(board_lines(grid_size, win_length)):
+        for cell in line:
+            through[cell].append(index)
+    return tuple(tuple(indices) for indices in through)
+
+
+@lru_cache(maxsize=None)
+def run_weights(win_length):
+    # weights[length][open ends] of a run with room for a line.  Open runs
+    # grow geometrically up to 4096 for win_length - 1 marks; a run with
+    # one end blocked is worth an eighth of the open one.
+    steps = max(1, win_length - 1)
+    weights = [(0, 0, 0)]
+    for length in range(1, win_length + 1):
+        value = 1 << (12 * min(length, steps) // steps)
+        weights.append((0, value >> 3, value))
+    return tuple(weights)
+
+
+def line_scores(cells, line, win_length, weights):
+    # (X score, O score): the run weights of each player on one line.
+    # Runs are scored per segment between the opponent's marks and counted
+    # once the segment turns out to be long enough for a line.
+    x_total = x_pending = x_length = x_run = 0
+    o_total = o_pending = o_length = o_run = 0
+    for cell in line:
+        mark = cells[cell]
+        if not mark:
+            # Runs ending here are open at this end, and at the other
+            # unless they started their segment
+            if x_run:
+                x_pending += weights[min(x_run, win_length)][(x_run < x_length) + 1]
+                x_run = 0
+            if o_run:
+                o_pending += weights[min(o_run, win_length)][(o_run < o_length) + 1]
+                o_run = 0
+            x_length += 1
+            o_length += 1
+        elif mark == 'X':
+            x_run += 1
+            x_length += 1
+            if o_run:
+                o_pending += weights[min(o_run, win_length)][o_run < o_length]
+                o_run = 0
+            if o_length >= win_length:
+                o_total += o_pending
+            o_pending = o_length = 0
+        else:
+            o_run += 1
+            o_length += 1
+            if x_run:
+                x_pending += weights[min(x_run, win_length)][x_run < x_length]
+                x_run = 0
+            if x_length >= win_length:
+                x_total += x_pending
+            x_pending = x_length = 0
+    if x_run:
+        x_pending += weights[min(x_run, win_length)][x_run < x_length]
+    if x_length >= win_length:
+        x_total += x_pending
+    if o_run:
+        o_pending += weights[min(o_run, win_length)][o_run < o_length]
+    if o_length >= win_length:
+        o_total += o_pending
+    return x_total, o_total
+
+
+class PatternEvaluator:
+    def __init__(self, tracker):
+        # Shares the tracker's cells and window counts; update() must see
+        # every mark placed on or taken back from the tracker
+        self.tracker = tracker
+        self.grid_size = grid_size = tracker.grid_size
+        self.win_length = win_length = tracker.win_length
+        self.lines = board_lines(grid_size, win_length)
+        self.cell_lines = cell_lines(grid_size, win_length)
+        self.weights = run_weights(win_length)
+        # (X score, O score) of every line and the sums per player
+        self.scores = [line_scores(tracker.cells, line, win_length, self.weights)
+                       for line in self.lines]
+        self.totals = {'X': sum(score[0] for score in self.scores),
+                       'O': sum(score[1] for score in self.scores)}
+        # Indices of each player's four and three windows
+        self.fours = {player: set() for player in PLAYERS}
+        self.threes = {player: set() for player in PLAYERS}
+        for player, opponent in (('X', 'O'), ('O', 'X')):
+            own, theirs = tracker.counts[player], tracker.counts[opponent]
+            for index, count in enumerate(own):
+                if count and not theirs[index]:
+                    self.add(player, index, count)
+        # Previous scores of the lines rescanned by each update, for undo
+        self.saved = []
+
+    def add(self, player, index, count):
+        if count == self.win_length - 1:
+            self.fours[player].add(index)
+        elif count == self.win_length - 2 and count:
+            self.threes[player].add(index)
+
+    def discard(self, player, index, count):
+        if count == self.win_length - 1:
+            self.fours[player].discard(index)
+        elif count == self.win_length - 2 and count:
+            self.threes[player].discard(index)
+
+    def update(self, cell, player, placed):
+        # Called after the tracker placed (or took back) player's mark on cell
+        tracker = self.tracker
+        opponent = 'O' if player == 'X' else 'X'
+        own, theirs = tracker.counts[player], tracker.counts[opponent]
+        for index in tracker.cell_windows[cell]:
+            count, other_count = own[index], theirs[index]
+            if not other_count:
+                # One mark closer to (or further from) a line
+                before = count - 1 if placed else count + 1
+                self.discard(player, index, before)
+                self.add(player, index, count)
+            elif placed and count == 1:
+                # The window is now dead for the opponent...
+                self.discard(opponent, index, other_count)
+            elif not placed and not count:
+                # ...or alive again
+                self.add(opponent, index, other_count)
+
+        scores, totals = self.scores, self.totals
+        if placed:
+            cells, weights, win_length = tracker.cells, self.weights, self.win_length
+            saved = []
+            for index in self.cell_lines[cell]:
+                before = scores[index]
+                after = scores[index] = line_scores(cells, self.lines[index], win_length, weights)
+                totals['X'] += after[0] - before[0]
+                totals['O'] += after[1] - before[1]
+                saved.append((index, before))
+            self.saved.append(saved)
+        else:
+            for index, before in self.saved.pop():
+                after = scores[index]
+                scores[index] = before
+                totals['X'] += before[0] - after[0]
+                totals['O'] += before[1] - after[1]
+
+    def winning_cells(self, player):
+        # Empty cells that complete a line for player
+        cells, windows = self.tracker.cells, self.tracker.windows
+        return {cell for index in self.fours[player] for cell in windows[index] if not cells[cell]}
+
+    def four_cells(self, player):
+        # Empty cells that give player a four
+        cells, windows = self.tracker.cells, self.tracker.windows
+        return {cell for index in self.threes[player] for cell in windows[index] if not cells[cell]}
+
+    def evaluate(self, player):
+        # Score for player, who is to move
+        opponent = 'O' if player == 'X' else 'X'
+        if self.fours[player]:
+            return THREAT_SCORE
+        if len(self.winning_cells(opponent)) > 1:
+            return -THREAT_SCORE
+        score = self.totals[player] - self.totals[opponent]
+        return max(1 - THREAT_SCORE, min(THREAT_SCORE - 1, score))
@@ -0,0 +1,87 @@
+"""One game position with constant-time make/unmake.
+
+A ``Position`` bundles the three views of the board that the engine keeps
+in step: the ``BitBoard`` bits, the ``WinTracker`` window counters (whose
+``history`` doubles as the move stack) and the ``ZobristHash``.  ``play``
+and ``unplay`` update all three in place, touching only the windows and
+hashes of the one cell, so undoing any number of moves never copies the
+board.  ``Game`` keeps its position this way and the search plays and
+takes back its moves on a single copy of it.  On large boards the search
+also has ``play``/``unplay`` keep an ``engine.patterns.PatternEvaluator``
+up to date (``track_patterns``).
+"""
+
+from engine.bitboard import BitBoard
+from engine.patterns import PatternEvaluator
+from engine.transposition import ZobristHash
+from engine.wincheck import WinTracker
+
+
+class Position:
+    __slots__ = ('grid_size', 'win_length', 'board', 'tracker', 'zobrist', 'patterns')
+
+    def __init__(self, grid_size, win_length):
+        self.grid_size = grid_size
+        self.win_length = win_length
+        self.board = BitBoard(grid_size, win_length)
+        self.tracker = WinTracker(grid_size, win_length)
+        self.zobrist = ZobristHash(grid_size, win_length)
+        self.patterns = None
+
+    @classmethod
+    def from_tracker(cls, tracker):
+        # Position with the tracker's marks, replayed in their move order
+        position = cls(tracker.grid_size, tracker.win_length)
+        for cell in tracker.history:
+            position.play(cell, tracker.cells[cell])
+        return position
+
+    def copy(self):
+        clone = Position.__new__(Position)
+        clone.grid_size = self.grid_size
+        clone.win_length = self.win_length
+        clone.board = self.board.copy()
+        clone.tracker = self.tracker.copy()
+        clone.zobrist = self.zobrist.copy()
+        # Evaluators are not copied; call track_patterns on the clone
+        clone.patterns = None
+        return clone
+
+    def track_patterns(self):
+        # Evaluate run patterns and threats incrementally from now on
+        self.patterns = PatternEvaluator(self.tracker)
+        return self.patterns
+
+    @property
+    def history(self):
+        # Flat cell indices of the moves played, oldest first
+        return self.tracker.history
+
+    def play(self, cell, player):
+        # Make a move on an empty cell; returns the winner, if any
+        bit = 1 << cell
+        board = self.board
+        if player == 'X':
+            board.x |= bit
+        else:
+            board.o |= bit
+        self.zobrist.toggle(cell, player)
+        winner = self.tracker.place(cell // self.grid_size, cell % self.grid_size, player)
+        if self.patterns is not None:
+            self.patterns.update(cell, player, True)
+        return winner
+
+    def unplay(self):
+        # Take back the last move; returns (cell, player)
+        tracker = self.tracker
+        cell = tracker.history[-1]
+        player = tracker.cells[cell]
+        tracker.undo()
+        mask = ~(1 << cell)
+        board = self.board
+        board.x &= mask
+        board.o &= mask
+        self.zobrist.toggle(cell, player)
+        if self.patterns is not None:
+            self.patterns.update(cell, player, False)
+        return cell, player
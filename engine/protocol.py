@@ -0,0 +1,102 @@
+"""Binary messages between the game server and its clients.
+
+Every message is one type byte followed by a fixed-size little-endian
+payload, so a reader knows from the first byte how many more to read; a
+move is 3 bytes up and 4 bytes down.  Over WebSocket each binary frame
+carries exactly one message.  See ``engine.server`` for the match rules
+and ``engine.service`` for the AI move requests.
+"""
+
+import struct
+
+# Client to server
+JOIN = 1            # preset index, room code (0 pairs with anyone waiting)
+MOVE = 2            # flat cell index
+LEAVE = 3
+PING = 4            # token, echoed by PONG
+AI_REQUEST = 5      # request id, grid size, win length, difficulty index, X bits, O bits
+
+# Server to client
+WAITING = 16        # match id; an opponent is being looked for
+START = 17          # match id, level, grid size, win length, your mark
+MOVED = 18          # cell, mark of the player, status after the move
+REJECTED = 19       # reason
+OPPONENT_LEFT = 20
+PONG = 21           # token
+EVICTED = 22        # the match was idle for too long
+AI_MOVE = 23        # request id, cell to play (NO_MOVE if the request was invalid)
+
+# Not sent: reported by engine.remote when the connection ends
+CLOSED = 0
+
+# Boards of AI_REQUEST are sent as one bitmask per player, wide enough for
+# the largest preset (19x19); bit row * grid_size + col as in BitBoard
+MAX_GRID_SIZE = 19
+BOARD_BYTES = (MAX_GRID_SIZE * MAX_GRID_SIZE + 7) // 8
+
+# Cell of AI_MOVE for a request that could not be answered
+NO_MOVE = 0xFFFF
+
+PAYLOADS = {
+    JOIN: struct.Struct('<BI'),
+    MOVE: struct.Struct('<H'),
+    LEAVE: struct.Struct('<'),
+    PING: struct.Struct('<I'),
+    WAITING: struct.Struct('<I'),
+    START: struct.Struct('<IBBBB'),
+    MOVED: struct.Struct('<HBB'),
+    REJECTED: struct.Struct('<B'),
+    OPPONENT_LEFT: struct.Struct('<'),
+    PONG: struct.Struct('<I'),
+    EVICTED: struct.Struct('<'),
+    AI_REQUEST: struct.Struct(f'<IBBB{BOARD_BYTES}s{BOARD_BYTES}s'),
+    AI_MOVE: struct.Struct('<IH'),
+}
+
+# Marks are sent as their index
+MARKS = ('X', 'O')
+
+# Status of the game in MOVED
+ONGOING, X_WINS, O_WINS, DRAW = 0, 1, 2, 3
+
+# Reasons of REJECTED
+NOT_IN_MATCH, NOT_YOUR_TURN, ILLEGAL_MOVE, BAD_MESSAGE, BAD_PRESET = 1, 2, 3, 4, 5
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def payload_size(kind):
+    payload = PAYLOADS.get(kind)
+    if payload is None:
+        raise ProtocolError(f"unknown message type {kind}")
+    return payload.size
+
+
+def encode(kind, *fields):
+    return bytes((kind,)) + PAYLOADS[kind].pack(*fields)
+
+
+def decode(message):
+    # (kind, fields) of one complete message
+    if not message:
+        raise ProtocolError("empty message")
+    kind = message[0]
+    if len(message) != 1 + payload_size(kind):
+        raise ProtocolError(f"message type {kind} has {len(message) - 1} payload bytes")
+    return kind, PAYLOADS[kind].unpack_from(message, 1)
+
+
+def pack_board(bits):
+    return bits.to_bytes(BOARD_BYTES, 'little')
+
+
+def unpack_board(data):
+    return int.from_bytes(data, 'little')
+
+
+def game_status(game):
+    if game.winner:
+        return X_WINS if game.winner == 'X' else O_WINS
+    return DRAW if game.game_over else ONGOING
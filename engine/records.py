@@ -0,0 +1,231 @@
+"""Game records: an append-only binary log of finished games.
+
+Every game played through ``Game`` can be appended to a log by giving the
+game a ``GameLog`` as its recorder.  The log is read back lazily, one
+record at a time, so files with millions of games can be scanned without
+loading them, exported to JSON or replayed to any position:
+
+    python -m engine.records stats games.log
+    python -m engine.records export games.log games.json
+    python -m engine.records replay games.log --index 12 --ply 5
+
+File layout (little endian): the magic ``b'TTTR'`` and a format version
+byte, then records back to back.  A record is a ``uint32`` byte length
+followed by a fixed header (level, grid size, win length, difficulty,
+flags, result, move count, seed, game number, start time) and one
+``(uint16 cell, uint32 microseconds)`` pair per move, where the time is
+measured since the previous move (or the start of the game).  X always
+moves first, so the player of each move is implicit.  A game that is
+undone after it ended and played on is recorded again when it ends.
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from engine.game import DIFFICULTIES, Game
+
+MAGIC = b'TTTR'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+LENGTH = struct.Struct('<I')
+RECORD = struct.Struct('<BBBBBBHQId')
+MOVE = struct.Struct('<HI')
+
+# Flags of a record
+VS_AI = 1
+
+# Result codes
+RESULTS = {None: 0, 'X': 1, 'O': 2, 'draw': 3}
+RESULT_NAMES = {code: name for name, code in RESULTS.items()}
+
+# Difficulty code for two-player games
+NO_DIFFICULTY = 255
+
+MAX_MICROSECONDS = 2 ** 32 - 1
+
+GameRecord = namedtuple('GameRecord', 'level grid_size win_length difficulty vs_ai result '
+                                      'seed game started moves times_ms')
+
+
+def default_log_path(base_dir=None):
+    # Per-user log file; the Kivy app passes its user_data_dir
+    if base_dir is None:
+        base_dir = os.path.join(os.path.expanduser('~'), '.tictactoe')
+    return os.path.join(base_dir, 'games.log')
+
+
+def record_game(game):
+    # GameRecord of the game's moves so far
+    if game.winner:
+        result = game.winner
+    elif game.game_over:
+        result = 'draw'
+    else:
+        result = None
+    return GameRecord(game.current_level, game.grid_size, game.win_length,
+                      game.ai_difficulty if game.vs_ai else None, game.vs_ai, result,
+                      game.seed or 0, game.generation, game.started,
+                      list(game.tracker.history), [seconds * 1000 for seconds in game.move_times])
+
+
+def encode(record):
+    difficulty = NO_DIFFICULTY if record.difficulty is None else DIFFICULTIES.index(record.difficulty)
+    parts = [RECORD.pack(record.level, record.grid_size, record.win_length, difficulty,
+                         VS_AI if record.vs_ai else 0, RESULTS[record.result], len(record.moves),
+                         record.seed, record.game, record.started)]
+    for cell, elapsed_ms in zip(record.moves, record.times_ms):
+        parts.append(MOVE.pack(cell, min(MAX_MICROSECONDS, int(elapsed_ms * 1000))))
+    body = b''.join(parts)
+    return LENGTH.pack(len(body)) + body
+
+
+def decode(body):
+    (level, grid_size, win_length, difficulty, flags, result, count,
+     seed, game, started) = RECORD.unpack_from(body, 0)
+    moves, times_ms = [], []
+    for cell, microseconds in MOVE.iter_unpack(body[RECORD.size:RECORD.size + count * MOVE.size]):
+        moves.append(cell)
+        times_ms.append(microseconds / 1000)
+    return GameRecord(level, grid_size, win_length,
+                      None if difficulty == NO_DIFFICULTY else DIFFICULTIES[difficulty],
+                      bool(flags & VS_AI), RESULT_NAMES[result], seed, game, started,
+                      moves, times_ms)
+
+
+class GameLog:
+    def __init__(self, path):
+        self.path = path
+        # Set when the log cannot be written; the game goes on without it
+        self.error = None
+
+    def append(self, record):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as log_file:
+            if log_file.tell() == 0:
+                log_file.write(HEADER.pack(MAGIC, VERSION))
+            log_file.write(encode(record))
+
+    def record(self, game):
+        # Recorder hook called by Game when a game ends or is abandoned
+        if self.error is not None:
+            return
+        try:
+            self.append(record_game(game))
+        except OSError as error:
+            self.error = error
+
+
+def iter_records(path):
+    # Yield the GameRecords of a log one at a time
+    with open(path, 'rb') as log_file:
+        header = log_file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        magic, version = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game log")
+        while True:
+            prefix = log_file.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            (length,) = LENGTH.unpack(prefix)
+            body = log_file.read(length)
+            if len(body) < length:
+                return  # Truncated by a crash mid-write
+            yield decode(body)
+
+
+def replay(record, ply=None):
+    # A Game at the position after ply moves (all of them by default)
+    game = Game(vs_ai=False, levels=((record.grid_size, record.win_length),))
+    moves = record.moves if ply is None else record.moves[:ply]
+    for cell in moves:
+        row, col = divmod(cell, record.grid_size)
+        if game.is_draw and game.board.is_empty(row, col):
+            # Logs from before draws were declared early go on to a full board
+            game.game_over = False
+            game.current_player = 'O' if game.current_player == 'X' else 'X'
+        if not game.make_move(row, col):
+            raise ValueError(f"illegal move {cell} in record of game {record.game}")
+    return game
+
+
+def to_dict(record):
+    data = record._asdict()
+    data['moves'] = [divmod(cell, record.grid_size) for cell in record.moves]
+    return data
+
+
+def export_json(path, output):
+    # Stream the log into a JSON array without holding it in memory
+    count = 0
+    output.write('[')
+    for record in iter_records(path):
+        output.write(',\n' if count else '\n')
+        json.dump(to_dict(record), output)
+        count += 1
+    output.write('\n]\n')
+    return count
+
+
+def format_board(game):
+    return '\n'.join(' '.join(cell or '.' for cell in row) for row in game.board.rows())
+
+
+def main(argv=None):
+    # Loaded here: the games import this module and never need argparse
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect game record logs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help="count games and results")
+    stats.add_argument('log')
+    export = commands.add_parser('export', help="write the records as JSON")
+    export.add_argument('log')
+    export.add_argument('output', nargs='?', help="JSON file (default: stdout)")
+    show = commands.add_parser('replay', help="print the position of one game")
+    show.add_argument('log')
+    show.add_argument('--index', type=int, default=0, help="record number, from 0")
+    show.add_argument('--ply', type=int, help="moves to play (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'stats':
+        games = moves = 0
+        results = {}
+        started = time.perf_counter()
+        for record in iter_records(args.log):
+            games += 1
+            moves += len(record.moves)
+            results[record.result] = results.get(record.result, 0) + 1
+        elapsed = time.perf_counter() - started
+        print(f"{games} games, {moves} moves, read in {elapsed:.2f}s")
+        for result, count in sorted(results.items(), key=lambda item: str(item[0])):
+            print(f"  {result or 'unfinished'}: {count}")
+    elif args.command == 'export':
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output:
+                count = export_json(args.log, output)
+            print(f"{count} records written to {args.output}")
+        else:
+            export_json(args.log, sys.stdout)
+    else:
+        for index, record in enumerate(iter_records(args.log)):
+            if index == args.index:
+                game = replay(record, args.ply)
+                print(f"game {record.game}: level {record.level}, {record.grid_size}x{record.grid_size}"
+                      f" k={record.win_length}, {record.difficulty or '2 players'}, "
+                      f"result {record.result or 'unfinished'}")
+                print(format_board(game))
+                return 0
+        print(f"no record {args.index} in {args.log}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
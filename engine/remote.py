@@ -0,0 +1,121 @@
+"""Connection of a front-end to the game server (``engine.server``).
+
+The socket is read on a background thread.  Received messages are queued
+and delivered by ``poll()`` on the UI thread, like the moves of
+``engine.worker``: Tk polls it with ``after``, Kivy gets a ``notify``
+callback that schedules it on the Clock.  A failed or lost connection is
+delivered as a ``CLOSED`` message carrying the error, if any.
+"""
+
+import os
+import queue
+import socket
+import threading
+
+from engine.protocol import CLOSED, JOIN, LEAVE, MOVE, ProtocolError, decode, encode, payload_size
+
+DEFAULT_PORT = 8765
+
+# Seconds to wait for the server to accept the connection
+CONNECT_TIMEOUT_S = 5
+
+
+def default_address():
+    # host:port of the server; TICTACTOE_SERVER overrides it
+    return os.environ.get('TICTACTOE_SERVER', f'localhost:{DEFAULT_PORT}')
+
+
+def parse_address(address):
+    host, _, port = address.strip().rpartition(':')
+    if not host:
+        return port or 'localhost', DEFAULT_PORT
+    return host, int(port)
+
+
+class RemotePlayer:
+    def __init__(self, address, on_message, notify=None):
+        # on_message(kind, fields) runs in poll(); notify() is called from
+        # the reader thread when a message is queued
+        self.address = address
+        self.on_message = on_message
+        self.notify = notify
+        self.messages = queue.Queue()
+        self.lock = threading.Lock()
+        self.socket = None
+        self.closed = False
+
+    def connect(self, preset, room=0):
+        # Connect and join a match on a background thread
+        threading.Thread(target=self.run, args=(preset, room), name='remote-player',
+                         daemon=True).start()
+
+    def run(self, preset, room):
+        error = None
+        try:
+            connection = socket.create_connection(parse_address(self.address),
+                                                  timeout=CONNECT_TIMEOUT_S)
+            connection.settimeout(None)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                if self.closed:
+                    connection.close()
+                    return
+                self.socket = connection
+            connection.sendall(encode(JOIN, preset, room))
+            stream = connection.makefile('rb')
+            while True:
+                head = stream.read(1)
+                if not head:
+                    break
+                size = payload_size(head[0])
+                body = stream.read(size)
+                if len(body) < size:
+                    break
+                self.deliver(decode(head + body))
+        except (OSError, ValueError, ProtocolError) as exc:
+            error = exc
+        self.deliver((CLOSED, (error,)))
+
+    def deliver(self, message):
+        self.messages.put(message)
+        if self.notify is not None:
+            self.notify()
+
+    def send(self, message):
+        with self.lock:
+            connection = self.socket
+        if connection is not None:
+            try:
+                connection.sendall(message)
+            except OSError:
+                pass  # The reader thread reports the lost connection
+
+    def send_move(self, cell):
+        self.send(encode(MOVE, cell))
+
+    def join(self, preset, room=0):
+        # Leave the current match (if any) and look for a new one
+        self.send(encode(JOIN, preset, room))
+
+    def close(self):
+        # Nothing is delivered after this
+        with self.lock:
+            self.closed = True
+            connection, self.socket = self.socket, None
+        if connection is not None:
+            try:
+                connection.sendall(encode(LEAVE))
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+    def poll(self):
+        # Deliver received messages on the calling (UI) thread
+        while True:
+            try:
+                kind, fields = self.messages.get_nowait()
+            except queue.Empty:
+                return
+            if not self.closed:
+                self.on_message(kind, fields)
@@ -0,0 +1,380 @@
+"""Negamax search with alpha-beta pruning for the Hard AI.
+
+The search runs iterative deepening under a wall-clock budget so a single
+AI move never blocks the caller for longer than ``time_budget_ms``.  When
+time runs out it returns the best move of the deepest iteration reached.
+From 5x5 on, leaves are scored by run patterns and threats
+(``engine.patterns``).
+
+Alpha-beta prunes the most when the best move is searched first, so the
+moves of every node are ordered (see ``ORDERING``) and cells that can no
+longer be part of any line are not searched at all.
+``python -m benchmarks.ordering`` reports the nodes each heuristic saves.
+"""
+
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from engine.position import Position
+from engine.transposition import EXACT, LOWER, UPPER
+
+# Score of a won position; wins found sooner score higher
+WIN_SCORE = 1000000
+
+# Scores beyond this are wins/losses at a known distance from the root
+MATE_BOUND = WIN_SCORE - 10000
+
+# From this grid size on only cells near existing marks are searched
+LOCAL_SEARCH_MIN_GRID = 7
+CANDIDATE_RADIUS = 2
+
+# From this grid size on the pattern evaluator replaces the open-window count
+PATTERN_MIN_GRID = 5
+
+# Move ordering heuristics of Searcher, all used by default:
+# - 'hash': the best move stored in the transposition table first;
+# - 'tactics': a winning cell is searched alone, else only the cells
+#   blocking the opponent's wins are, else (from 5x5 on) moves making or
+#   stopping a four come first;
+# - 'killers': moves that caused a cutoff at the same ply of other nodes;
+# - 'history': moves that caused cutoffs anywhere, weighted by depth;
+# - 'proximity': cells next to more marks.
+# Remaining ties keep the centre-first order of candidate_moves().
+ORDERING = frozenset(('hash', 'tactics', 'killers', 'history', 'proximity'))
+
+# Killer moves remembered per ply
+KILLER_SLOTS = 2
+
+# How many nodes are searched between clock checks
+CLOCK_INTERVAL = 64
+
+SearchResult = namedtuple('SearchResult', 'move score depth nodes elapsed_ms completed')
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def other(player):
+    return 'O' if player == 'X' else 'X'
+
+
+def evaluate(tracker, player):
+    # Open windows for player minus open windows for the opponent, both
+    # maintained incrementally by the tracker
+    score = tracker.potential[player] - tracker.potential[other(player)]
+    return max(-MATE_BOUND, min(MATE_BOUND, score))
+
+
+@lru_cache(maxsize=None)
+def center_order(grid_size):
+    # Cells sorted by distance from the center, the usual strongest first
+    center = (grid_size - 1) / 2
+    cells = range(grid_size * grid_size)
+    return tuple(sorted(cells, key=lambda cell: abs(cell // grid_size - center) + abs(cell % grid_size - center)))
+
+
+@lru_cache(maxsize=None)
+def center_rank(grid_size):
+    rank = [0] * (grid_size * grid_size)
+    for position, cell in enumerate(center_order(grid_size)):
+        rank[cell] = position
+    return tuple(rank)
+
+
+@lru_cache(maxsize=None)
+def neighbourhoods(grid_size, radius):
+    # For each cell, the other cells at most radius steps away in any direction
+    result = []
+    for cell in range(grid_size * grid_size):
+        row, col = divmod(cell, grid_size)
+        result.append(tuple(
+            r * grid_size + c
+            for r in range(max(0, row - radius), min(grid_size, row + radius + 1))
+            for c in range(max(0, col - radius), min(grid_size, col + radius + 1))
+            if (r, c) != (row, col)))
+    return tuple(result)
+
+
+@lru_cache(maxsize=None)
+def neighbour_masks(grid_size):
+    # For each cell, a bitmask of the (up to eight) cells around it
+    return tuple(sum(1 << near for near in cells) for cells in neighbourhoods(grid_size, 1))
+
+
+def candidate_moves(tracker):
+    # Empty cells worth searching, most central first.  Large boards are
+    # searched locally: only cells within CANDIDATE_RADIUS of a mark.
+    grid_size = tracker.grid_size
+    cells = tracker.cells
+    if grid_size < LOCAL_SEARCH_MIN_GRID:
+        return [cell for cell in center_order(grid_size) if cells[cell] == '']
+    if not tracker.history:
+        return [center_order(grid_size)[0]]
+    near = neighbourhoods(grid_size, CANDIDATE_RADIUS)
+    candidates = set()
+    for stone in tracker.history:
+        candidates.update(near[stone])
+    rank = center_rank(grid_size)
+    return sorted((cell for cell in candidates if cells[cell] == ''), key=rank.__getitem__)
+
+
+def to_table_score(score, ply):
+    # Store win/loss scores relative to the node, not the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def from_table_score(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher:
+    def __init__(self, time_budget_ms=250, max_depth=None, table=None, cancel_event=None,
+                 ordering=ORDERING, prune_dead_cells=True):
+        # None searches without a clock, e.g. for reproducible self-play
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        # A threading.Event that stops the search early, like a timeout
+        self.cancel_event = cancel_event
+        # Optional engine.transposition.TranspositionTable shared across searches
+        self.table = table
+        # Heuristic names from ORDERING to order moves by
+        self.ordering = frozenset(ordering)
+        # Skip cells outside every window still open to either player
+        self.prune_dead_cells = prune_dead_cells
+        self.nodes = 0
+        self.deadline = None
+        # The searched copy of the position; moves are made and taken back
+        # on it in place
+        self.position = None
+        # Its engine.patterns.PatternEvaluator on large boards, else None
+        self.patterns = None
+        # Killer moves per ply and cutoff history per player and cell,
+        # both kept for the iterations of one search
+        self.killers = []
+        self.history = {}
+        self.root_best = None
+
+    def search(self, tracker, player, rng=None):
+        # Search a copy so the caller's tracker is never touched
+        start = time.perf_counter()
+        if self.time_budget_ms is None:
+            self.deadline = float('inf')
+        else:
+            self.deadline = start + self.time_budget_ms / 1000
+        self.nodes = 0
+        self.root_best = None
+        self.position = Position.from_tracker(tracker)
+        grid_size = tracker.grid_size
+        if grid_size >= PATTERN_MIN_GRID:
+            self.patterns = self.position.track_patterns()
+        else:
+            self.patterns = None
+        cells = self.position.tracker.cells
+        if self.table is not None:
+            self.table.new_search()
+        remaining = cells.count('')
+        self.killers = [[] for _ in range(remaining + 2)]
+        self.history = {'X': [0] * len(cells), 'O': [0] * len(cells)}
+
+        candidates = candidate_moves(self.position.tracker)
+        if rng is not None:
+            # Random tie-break between equally central cells
+            rng.shuffle(candidates)
+            candidates.sort(key=center_rank(grid_size).__getitem__)
+        # With every cell dead the game is drawn whatever is played
+        root_moves = self.order_moves(candidates, player, 0) or candidates[:1]
+        if not root_moves:
+            return SearchResult(None, 0, 0, 0, 0.0, True)
+
+        best_move, best_score, depth_reached = root_moves[0], 0, 0
+        max_depth = min(self.max_depth or remaining, remaining)
+        completed = False
+        for depth in range(1, max_depth + 1):
+            try:
+                move, score = self.search_root(root_moves, depth, player)
+            except SearchTimeout:
+                # The previous best is searched first, so any root move that
+                # finished in the interrupted iteration is at least as good
+                if self.root_best is not None:
+                    best_move, best_score = self.root_best
+                break
+            best_move, best_score, depth_reached = move, score, depth
+            # Search the previous best move first in the next iteration
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            # Solved once every empty cell was searched or a forced result
+            # was found; reaching a smaller max_depth is not a solution
+            if abs(score) >= WIN_SCORE - remaining or depth == remaining:
+                completed = True
+                break
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return SearchResult(divmod(best_move, grid_size), best_score, depth_reached,
+                            self.nodes, elapsed_ms, completed)
+
+    def search_root(self, root_moves, depth, player):
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move = root_moves[0]
+        self.root_best = None
+        for cell in root_moves:
+            score = self.score_move(cell, depth, alpha, beta, player, 1)
+            if score > alpha:
+                alpha, best_move = score, cell
+            self.root_best = (best_move, alpha)
+        return best_move, alpha
+
+    def score_move(self, cell, depth, alpha, beta, player, ply):
+        # Play cell for player and return the score from player's view
+        position = self.position
+        if position.play(cell, player):
+            score = WIN_SCORE - ply
+        elif position.tracker.is_drawn():
+            score = 0
+        else:
+            score = -self.negamax(depth - 1, -beta, -alpha, other(player), ply + 1)
+        position.unplay()
+        return score
+
+    def negamax(self, depth, alpha, beta, player, ply):
+        self.nodes += 1
+        if not self.nodes % CLOCK_INTERVAL and (
+                time.perf_counter() > self.deadline
+                or self.cancel_event is not None and self.cancel_event.is_set()):
+            raise SearchTimeout
+        tracker = self.position.tracker
+        if depth == 0:
+            if self.patterns is not None:
+                return self.patterns.evaluate(player)
+            return evaluate(tracker, player)
+
+        table = self.table
+        zobrist = self.position.zobrist
+        hash_move = None
+        if table is not None:
+            key, symmetry = zobrist.canonical(player)
+            entry = table.probe(key)
+            if entry is not None:
+                _, stored_depth, flag, value, move, _ = entry
+                if move is not None:
+                    hash_move = zobrist.from_canonical(move, symmetry)
+                if stored_depth >= depth:
+                    value = from_table_score(value, ply)
+                    if flag == EXACT:
+                        return value
+                    if flag == LOWER and value >= beta:
+                        return value
+                    if flag == UPPER and value <= alpha:
+                        return value
+
+        moves = self.order_moves(candidate_moves(tracker), player, ply, hash_move)
+        if not moves:
+            # Nobody can complete a line any more
+            return 0
+        alpha_start = alpha
+        best_score, best_move = -WIN_SCORE - 1, None
+        for cell in moves:
+            score = self.score_move(cell, depth, alpha, beta, player, ply)
+            if score > best_score:
+                best_score, best_move = score, cell
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.record_cutoff(cell, player, depth, ply)
+                        break
+
+        if table is not None:
+            if best_score <= alpha_start:
+                flag = UPPER
+            elif best_score >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table.store(key, depth, flag, to_table_score(best_score, ply),
+                        zobrist.to_canonical(best_move, symmetry))
+        return best_score
+
+    def order_moves(self, moves, player, ply, hash_move=None):
+        # The moves worth searching at a node, in search order
+        tracker = self.position.tracker
+        ordering = self.ordering
+        if self.prune_dead_cells:
+            cell_live = tracker.cell_live
+            moves = [cell for cell in moves if cell_live[cell]]
+
+        attacks = defences = ()
+        if 'tactics' in ordering:
+            forced = self.forced_moves(moves, player)
+            if forced is not None:
+                return forced
+            if self.patterns is not None:
+                attacks = self.patterns.four_cells(player)
+                defences = self.patterns.four_cells(other(player))
+        if 'hash' not in ordering:
+            hash_move = None
+        killers = self.killers[ply] if 'killers' in ordering else ()
+        history = self.history[player] if 'history' in ordering else None
+        near = neighbour_masks(tracker.grid_size) if 'proximity' in ordering else None
+        if (hash_move is None and not attacks and not defences and not killers
+                and history is None and near is None):
+            return moves
+
+        # One integer per move: the flags outrank the history score, which
+        # outranks the number of neighbouring marks (at most 8)
+        board = self.position.board
+        occupied = board.x | board.o
+
+        def key(cell):
+            score = ((cell == hash_move) << 63 | (cell in attacks) << 62
+                     | (cell in defences) << 61 | (cell in killers) << 60)
+            if history is not None:
+                score |= history[cell] << 4
+            if near is not None:
+                score |= bin(near[cell] & occupied).count('1')
+            return -score
+
+        # sorted() is stable, so equal keys stay centre first
+        return sorted(moves, key=key)
+
+    def forced_moves(self, moves, player):
+        # [a winning cell], the cells blocking the opponent's wins, or None
+        patterns = self.patterns
+        if patterns is not None:
+            wins = patterns.winning_cells(player)
+            if wins:
+                return [min(wins)]
+            blocks = patterns.winning_cells(other(player))
+            return sorted(blocks) if blocks else None
+        # An empty cell of a window with win_length - 1 marks of one player
+        # completes it; the window has no room for the other player's marks
+        tracker = self.position.tracker
+        own, theirs = tracker.counts[player], tracker.counts[other(player)]
+        through = tracker.cell_windows
+        needed = tracker.win_length - 1
+        blocks = []
+        for cell in moves:
+            blocking = False
+            for index in through[cell]:
+                if own[index] == needed:
+                    return [cell]
+                if theirs[index] == needed:
+                    blocking = True
+            if blocking:
+                blocks.append(cell)
+        return blocks or None
+
+    def record_cutoff(self, cell, player, depth, ply):
+        killers = self.killers[ply]
+        if cell not in killers:
+            killers.insert(0, cell)
+            del killers[KILLER_SLOTS:]
+        self.history[player][cell] += depth * depth
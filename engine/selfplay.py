@@ -0,0 +1,150 @@
+"""Bulk AI-vs-AI matches for tuning the difficulty levels.
+
+Games are split into chunks and played on a process pool.  Every chunk
+derives its own random generator from the run seed and its index and
+starts with a fresh transposition table, so the totals depend only on the
+seed and chunk size, never on how chunks were scheduled.  Hard plays at a
+fixed search depth and MCTS at a fixed playout count for the same reason.
+
+    python -m engine.selfplay --grid 4 --win 4 --pairing Hard:Easy --games 100000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.ai import STRATEGIES, configure_mcts, configure_transposition_table
+from engine.game import Game
+
+# z for a 95% confidence interval
+Z_95 = 1.959964
+
+
+def chunk_seed(seed, index):
+    return (seed << 32) ^ index
+
+
+def play_game(game, x_strategy, o_strategy):
+    # Play one game to the end and return the winner (None for a draw)
+    strategies = {'X': STRATEGIES[x_strategy], 'O': STRATEGIES[o_strategy]}
+    while not game.game_over:
+        row, col = strategies[game.current_player](game, game.rng)
+        game.make_move(row, col)
+    return game.winner
+
+
+def play_chunk(grid_size, win_length, x_strategy, o_strategy, games, seed, index, hard_depth,
+               mcts_iterations=1000):
+    # Worker entry point: returns (x wins, o wins, draws)
+    configure_transposition_table()
+    configure_mcts(iterations=mcts_iterations)
+    game = Game(rng=random.Random(chunk_seed(seed, index)))
+    game.search_depth = hard_depth
+    game.set_board(grid_size, win_length)
+    counts = {'X': 0, 'O': 0, None: 0}
+    for _ in range(games):
+        game.reset()
+        counts[play_game(game, x_strategy, o_strategy)] += 1
+    return counts['X'], counts['O'], counts[None]
+
+
+def wilson_interval(successes, total, z=Z_95):
+    # Confidence interval of a proportion that behaves at 0 and 1
+    if not total:
+        return 0.0, 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def run(grid_size, win_length, x_strategy, o_strategy, games, seed=0,
+        jobs=None, chunk_size=1000, hard_depth=2, mcts_iterations=1000):
+    # Play games and summarise them from X's point of view
+    chunks = []
+    for index, start in enumerate(range(0, games, chunk_size)):
+        chunks.append((grid_size, win_length, x_strategy, o_strategy,
+                       min(chunk_size, games - start), seed, index, hard_depth,
+                       mcts_iterations))
+
+    started = time.perf_counter()
+    wins = losses = draws = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for x_wins, o_wins, drawn in pool.map(play_chunk, *zip(*chunks)):
+            wins += x_wins
+            losses += o_wins
+            draws += drawn
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        'grid_size': grid_size,
+        'win_length': win_length,
+        'pairing': f"{x_strategy}:{o_strategy}",
+        'seed': seed,
+        'games': games,
+        'elapsed_s': elapsed,
+        'games_per_s': games / elapsed if elapsed else 0.0,
+    }
+    for name, count in (('win', wins), ('draw', draws), ('loss', losses)):
+        low, high = wilson_interval(count, games)
+        summary[name] = {'count': count, 'rate': count / games if games else 0.0,
+                         'ci95': [low, high]}
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"{summary['grid_size']}x{summary['grid_size']} k={summary['win_length']} "
+             f"{summary['pairing']} seed={summary['seed']}: {summary['games']} games, "
+             f"{summary['games_per_s']:.0f} games/s"]
+    for name in ('win', 'draw', 'loss'):
+        result = summary[name]
+        low, high = result['ci95']
+        lines.append(f"  {name:>4}: {result['rate']:7.2%}  (95% CI {low:.2%} - {high:.2%})")
+    return '\n'.join(lines)
+
+
+def parse_pairing(text):
+    x_strategy, _, o_strategy = text.partition(':')
+    for name in (x_strategy, o_strategy):
+        if name not in STRATEGIES:
+            raise argparse.ArgumentTypeError(
+                f"unknown strategy {name!r}, expected X:O from {', '.join(STRATEGIES)}")
+    return x_strategy, o_strategy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI games in bulk")
+    parser.add_argument('--grid', type=int, default=3, help="grid size")
+    parser.add_argument('--win', type=int, help="marks in a row to win (default: grid size)")
+    parser.add_argument('--pairing', type=parse_pairing, action='append',
+                        help="X:O strategies, e.g. Hard:Easy (repeatable)")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--hard-depth', type=int, default=2,
+                        help="fixed search depth of Hard (and Medium's smart moves)")
+    parser.add_argument('--mcts-iterations', type=int, default=1000,
+                        help="fixed playouts per MCTS move")
+    parser.add_argument('--json', help="also write the summaries to this file")
+    args = parser.parse_args(argv)
+
+    win_length = args.win or args.grid
+    summaries = []
+    for x_strategy, o_strategy in args.pairing or [("Hard", "Easy")]:
+        summary = run(args.grid, win_length, x_strategy, o_strategy, args.games, args.seed,
+                      args.jobs, args.chunk_size, args.hard_depth, args.mcts_iterations)
+        print(format_summary(summary))
+        summaries.append(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump(summaries, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
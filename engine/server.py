@@ -0,0 +1,336 @@
+"""Headless asyncio server for networked two-player games.
+
+Clients connect over plain TCP or WebSocket (on the same port: a request
+starting with ``GET`` is upgraded) and exchange the binary messages of
+``engine.protocol``.  ``JOIN`` pairs a client with the next one asking
+for the same board preset and room code; the first to join plays X.
+Every match runs on a ``Game``, so moves are validated and games scored
+and advanced exactly as in the front-ends: a win for X moves both players
+to the next level, any other result replays the level.
+
+Matches are kept in memory ordered by their last activity, so idle ones
+are evicted from the front of the table without scanning the rest.
+
+    python -m engine.server [--host 0.0.0.0] [--port 8765] [--idle-timeout 300]
+
+``python -m benchmarks.server_load`` measures moves per second and move
+latency against it.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from engine.game import BOARD_PRESETS, Game
+from engine.protocol import (BAD_MESSAGE, BAD_PRESET, EVICTED, ILLEGAL_MOVE, JOIN, LEAVE, MARKS,
+                             MOVE, MOVED, NOT_IN_MATCH, NOT_YOUR_TURN, OPPONENT_LEFT, PING, PONG,
+                             REJECTED, START, WAITING, ProtocolError, decode, encode, game_status,
+                             payload_size)
+
+DEFAULT_PORT = 8765
+
+# Seconds without a move before a match is dropped
+IDLE_TIMEOUT_S = 300
+
+# Preset indices of JOIN refer to this order
+PRESETS = tuple(BOARD_PRESETS.values())
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# WebSocket opcodes
+WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x2, 0x8, 0x9, 0xA
+
+
+class TCPConnection:
+    def __init__(self, reader, writer, first=b''):
+        self.reader = reader
+        self.writer = writer
+        self.first = first
+        self.match = None
+        self.mark = None
+
+    async def read(self):
+        # One message, or None at the end of the stream
+        try:
+            head = self.first or await self.reader.readexactly(1)
+            self.first = b''
+            return head + await self.reader.readexactly(payload_size(head[0]))
+        except asyncio.IncompleteReadError:
+            return None
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(message)
+
+    async def drain(self):
+        await self.writer.drain()
+
+    def close(self):
+        self.writer.close()
+
+
+class WebSocketConnection(TCPConnection):
+    # Just enough of RFC 6455 for binary messages from browsers: no
+    # fragmentation, no extensions, frames of up to 125 bytes
+    @classmethod
+    async def accept(cls, reader, writer, first):
+        request = first + await reader.readuntil(b'\r\n\r\n')
+        key = None
+        for line in request.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'sec-websocket-key':
+                key = value.strip()
+        if key is None:
+            writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return None
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                     b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        return cls(reader, writer)
+
+    async def read(self):
+        while True:
+            try:
+                head = await self.reader.readexactly(2)
+                length = head[1] & 0x7F
+                if not head[0] & 0x80 or length > 125:
+                    raise ProtocolError("fragmented or oversized WebSocket frame")
+                mask = await self.reader.readexactly(4) if head[1] & 0x80 else b'\0\0\0\0'
+                payload = bytes(byte ^ mask[index % 4] for index, byte in
+                                enumerate(await self.reader.readexactly(length)))
+            except asyncio.IncompleteReadError:
+                return None
+            opcode = head[0] & 0x0F
+            if opcode == WS_BINARY:
+                return payload
+            if opcode == WS_CLOSE:
+                self.send_frame(WS_CLOSE, payload[:2])
+                return None
+            if opcode == WS_PING:
+                self.send_frame(WS_PONG, payload)
+            elif opcode != WS_PONG:
+                raise ProtocolError(f"unsupported WebSocket opcode {opcode}")
+
+    def send_frame(self, opcode, payload):
+        if not self.writer.is_closing():
+            self.writer.write(bytes((0x80 | opcode, len(payload))) + payload)
+
+    def send(self, message):
+        self.send_frame(WS_BINARY, message)
+
+
+class Match:
+    __slots__ = ('id', 'preset', 'room', 'game', 'players')
+
+    def __init__(self, match_id, preset, room):
+        self.id = match_id
+        self.preset = preset
+        self.room = room
+        self.game = None          # Created when the second player joins
+        self.players = [None, None]
+
+
+class GameServer:
+    def __init__(self, idle_timeout=IDLE_TIMEOUT_S, presets=PRESETS):
+        self.idle_timeout = idle_timeout
+        self.presets = presets
+        # match id -> Match, least recently active first, and when each
+        # match was last active
+        self.matches = OrderedDict()
+        self.last_active = {}
+        # (preset, room) -> match waiting for its second player
+        self.waiting = {}
+        self.ids = itertools.count(1)
+        # Two-player games never draw from it; sharing one saves memory
+        self.rng = random.Random()
+        self.connections = 0
+        self.moves = 0
+        self.evicted = 0
+
+    def touch(self, match):
+        self.matches.move_to_end(match.id)
+        self.last_active[match.id] = time.monotonic()
+
+    def join(self, connection, preset, room):
+        self.leave(connection)
+        if not 0 <= preset < len(self.presets):
+            connection.send(encode(REJECTED, BAD_PRESET))
+            return
+        match = self.waiting.pop((preset, room), None)
+        if match is None:
+            match = Match(next(self.ids), preset, room)
+            self.matches[match.id] = match
+            self.waiting[(preset, room)] = match
+            mark = 0
+        else:
+            match.game = Game(vs_ai=False, rng=self.rng, levels=self.presets[preset])
+            mark = 1
+        match.players[mark] = connection
+        connection.match, connection.mark = match, mark
+        self.touch(match)
+        if match.game is None:
+            connection.send(encode(WAITING, match.id))
+        else:
+            self.start(match)
+
+    def start(self, match):
+        game = match.game
+        for mark, player in enumerate(match.players):
+            player.send(encode(START, match.id, game.current_level, game.grid_size,
+                               game.win_length, mark))
+
+    def move(self, connection, cell):
+        match = connection.match
+        if match is None or match.game is None:
+            connection.send(encode(REJECTED, NOT_IN_MATCH))
+            return
+        game = match.game
+        if game.current_player != MARKS[connection.mark]:
+            connection.send(encode(REJECTED, NOT_YOUR_TURN))
+            return
+        if cell >= game.grid_size * game.grid_size or not game.make_move(*divmod(cell, game.grid_size)):
+            connection.send(encode(REJECTED, ILLEGAL_MOVE))
+            return
+        self.moves += 1
+        self.touch(match)
+        message = encode(MOVED, cell, connection.mark, game_status(game))
+        for player in match.players:
+            player.send(message)
+        if game.game_over:
+            # Level progression of the front-ends, then the next game
+            if game.winner == 'X':
+                game.advance_level()
+            else:
+                game.reset()
+            self.start(match)
+
+    def remove(self, match):
+        del self.matches[match.id]
+        del self.last_active[match.id]
+        if self.waiting.get((match.preset, match.room)) is match:
+            del self.waiting[(match.preset, match.room)]
+        for player in match.players:
+            if player is not None:
+                player.match = None
+
+    def leave(self, connection):
+        match = connection.match
+        if match is None:
+            return
+        self.remove(match)
+        for player in match.players:
+            if player is not None and player is not connection:
+                player.send(encode(OPPONENT_LEFT))
+
+    def evict_idle(self, now=None):
+        # Drop matches idle for longer than idle_timeout; returns how many
+        deadline = (time.monotonic() if now is None else now) - self.idle_timeout
+        count = 0
+        while self.matches:
+            match_id, match = next(iter(self.matches.items()))
+            if self.last_active[match_id] > deadline:
+                break
+            self.remove(match)
+            for player in match.players:
+                if player is not None:
+                    player.send(encode(EVICTED))
+                    player.close()
+            count += 1
+        self.evicted += count
+        return count
+
+    async def handle(self, reader, writer):
+        try:
+            first = await reader.readexactly(1)
+            if first == b'G':
+                connection = await WebSocketConnection.accept(reader, writer, first)
+            else:
+                connection = TCPConnection(reader, writer, first)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            connection = None
+        if connection is None:
+            writer.close()
+            return
+        self.connections += 1
+        try:
+            while True:
+                message = await connection.read()
+                if message is None:
+                    break
+                kind, fields = decode(message)
+                if kind == MOVE:
+                    self.move(connection, *fields)
+                elif kind == JOIN:
+                    self.join(connection, *fields)
+                elif kind == LEAVE:
+                    self.leave(connection)
+                elif kind == PING:
+                    connection.send(encode(PONG, *fields))
+                else:
+                    raise ProtocolError(f"unexpected message type {kind}")
+                await connection.drain()
+        except ProtocolError:
+            # The stream cannot be resynchronised after a bad message
+            connection.send(encode(REJECTED, BAD_MESSAGE))
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(connection)
+            self.connections -= 1
+            connection.close()
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            self.evict_idle()
+
+    async def report(self, interval, log):
+        moves, last = self.moves, time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            log(f"{len(self.matches)} matches, {self.connections} connections, "
+                f"{(self.moves - moves) / (now - last):.0f} moves/s, {self.evicted} evicted")
+            moves, last = self.moves, now
+
+    async def serve(self, host='0.0.0.0', port=DEFAULT_PORT, stats_interval=None, log=print):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        tasks = [asyncio.create_task(self.sweep())]
+        if stats_interval:
+            tasks.append(asyncio.create_task(self.report(stats_interval, log)))
+        address = server.sockets[0].getsockname()
+        log(f"listening on {address[0]}:{address[1]}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the multiplayer game server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT_S,
+                        help="seconds before an idle match is dropped")
+    parser.add_argument('--stats-interval', type=float, help="print statistics every N seconds")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.idle_timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.stats_interval,
+                                 lambda line: print(line, flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""AI move service: batched requests answered from a shared position cache.
+
+Clients send whole positions and get back the move the AI would play.
+Requests arriving within ``max_delay_ms`` of each other are handled as
+one batch.  Each position is reduced to its canonical form over the eight
+board symmetries (``engine.book.canonical_key``), so identical and
+symmetric positions of a batch are searched once and share the answer.
+Answers are kept in an LRU cache keyed by canonical position, grid size,
+win length and difficulty, and mapped back to each requester's
+orientation.  Searches run off the event loop, one per distinct position,
+and each answers its requests as soon as it finishes, so cache hits and
+quick positions are not held up by slow ones; requests for a position
+already being searched wait for that search.  With ``jobs`` above one the
+searches run in that many worker processes at once, so a batch of many
+positions is searched in parallel instead of one after another.
+
+Easy is a random move and is answered directly.  Medium plays a random
+move half of the time, as in ``engine.ai``, and otherwise asks for the
+cached Hard move.  Only Hard is cached: MCTS is random, so each MCTS
+request gets a search of its own (identical requests arriving together
+still share one).
+
+The service runs in-process (``AIService``) or as a local endpoint that
+speaks the ``AI_REQUEST``/``AI_MOVE`` messages of ``engine.protocol``
+over TCP or WebSocket:
+
+    python -m engine.service [--host 127.0.0.1] [--port 8766] [--cache-size 100000] [--jobs 4]
+
+``python -m benchmarks.ai_service`` replays a synthetic workload against
+it and reports the cache hit ratio and p50/p99 latency.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from engine.book import canonical_key
+from engine.game import DIFFICULTIES, Game, check_board
+from engine.metrics import percentile
+from engine.protocol import (AI_MOVE, AI_REQUEST, MAX_GRID_SIZE, NO_MOVE, PING, PONG,
+                             ProtocolError, decode, encode, unpack_board)
+from engine.server import TCPConnection, WebSocketConnection
+from engine.transposition import inverse_symmetries, symmetries
+from engine.wincheck import PLAYERS, WinTracker
+
+DEFAULT_PORT = 8766
+
+# Positions kept in the cache
+DEFAULT_CACHE_SIZE = 100000
+
+# Requests are collected for this long after the first of a batch...
+MAX_DELAY_MS = 2.0
+# ...or until this many are waiting
+MAX_BATCH = 256
+
+# Latest request latencies kept for the percentiles
+LATENCY_SAMPLES = 10000
+
+# Strategies whose answers are kept in the cache
+CACHED = ("Hard",)
+
+
+def cells_from_bits(x, o, grid_size):
+    # Cell list ('', 'X' or 'O' per cell) of two BitBoard masks
+    return ['X' if x >> cell & 1 else 'O' if o >> cell & 1 else ''
+            for cell in range(grid_size * grid_size)]
+
+
+def check_position(cells, grid_size, win_length):
+    # Raise ValueError unless it is someone's turn in the position
+    check_board(grid_size, win_length)
+    if len(cells) != grid_size * grid_size:
+        raise ValueError(f"{len(cells)} cells for a {grid_size}x{grid_size} board")
+    tracker = WinTracker(grid_size, win_length)
+    for cell, mark in enumerate(cells):
+        if mark in PLAYERS:
+            tracker.place(cell // grid_size, cell % grid_size, mark)
+        elif mark:
+            raise ValueError(f"unknown mark {mark!r}")
+    if not 0 <= cells.count('X') - cells.count('O') <= 1:
+        raise ValueError("X and O move counts do not alternate")
+    if tracker.winner or tracker.is_drawn():
+        raise ValueError("the game is already over")
+
+
+def search_position(grid_size, win_length, difficulty, cells, search_depth, seed):
+    # Worker thread or process: canonical flat move of the strategy in cells
+    from engine.ai import STRATEGIES
+
+    rng = random.Random(seed)
+    game = Game(vs_ai=False, rng=rng, levels=((grid_size, win_length),))
+    game.search_depth = search_depth
+    for cell, mark in enumerate(cells):
+        if mark:
+            game.position.play(cell, mark)
+    game.current_player = 'O' if len(game.tracker.history) % 2 else 'X'
+    row, col = STRATEGIES[difficulty](game, rng)
+    return row * grid_size + col
+
+
+class AIService:
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, max_delay_ms=MAX_DELAY_MS,
+                 max_batch=MAX_BATCH, search_depth=None, rng=None, jobs=1):
+        self.cache_size = cache_size
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        # Fixed Hard search depth, as Game.search_depth; None uses the clock
+        self.search_depth = search_depth
+        self.rng = rng or random.Random()
+        # (grid size, win length, difficulty, canonical key) -> canonical
+        # move, least recently used first
+        self.cache = OrderedDict()
+        # Same keys -> [(future, symmetry, started)] waiting for a search
+        self.inflight = {}
+        self.queue = None
+        self.batcher = None
+        self.searches = set()
+        # One search thread keeps the transposition table warm between
+        # searches; more jobs search in separate processes, each with its own
+        if jobs > 1:
+            self.executor = ProcessPoolExecutor(max_workers=jobs)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-service')
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.searched = 0
+
+    def start(self):
+        # Called from the event loop the requests will come from
+        if self.batcher is None:
+            self.queue = asyncio.Queue()
+            self.batcher = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        if self.searches:
+            await asyncio.gather(*self.searches, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    async def best_move(self, cells, grid_size, win_length, difficulty="Hard"):
+        # (row, col) the AI plays in the position; ValueError if there is none
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"unknown difficulty {difficulty!r}")
+        check_position(cells, grid_size, win_length)
+        started = time.perf_counter()
+        self.requests += 1
+        if difficulty == "Medium":
+            difficulty = "Hard" if self.rng.random() >= 0.5 else "Easy"
+        if difficulty == "Easy":
+            move = self.rng.choice([cell for cell, mark in enumerate(cells) if not mark])
+            self.latencies.append(time.perf_counter() - started)
+            return divmod(move, grid_size)
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((cells, grid_size, win_length, difficulty, future, started))
+        return divmod(await future, grid_size)
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.max_delay and self.queue.qsize() < self.max_batch:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.dispatch(batch)
+
+    def dispatch(self, batch):
+        # Answer cache hits, attach requests to searches already running and
+        # start a search for each remaining distinct canonical position
+        self.batches += 1
+        jobs = {}
+        for cells, grid_size, win_length, difficulty, future, started in batch:
+            canonical, symmetry = canonical_key(cells, grid_size)
+            key = (grid_size, win_length, difficulty, canonical)
+            waiter = (future, symmetry, started)
+            move = self.cache.get(key) if difficulty in CACHED else None
+            if move is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                self.resolve(waiter, grid_size, move)
+            elif key in self.inflight:
+                self.coalesced += 1
+                self.inflight[key].append(waiter)
+            else:
+                self.misses += 1
+                self.inflight[key] = [waiter]
+                # The search runs on the canonical orientation of the board
+                perm = symmetries(grid_size)[symmetry]
+                oriented = [''] * len(cells)
+                for cell, mark in enumerate(cells):
+                    oriented[perm[cell]] = mark
+                jobs[key] = oriented
+        for key, cells in jobs.items():
+            task = asyncio.create_task(self.search(key, cells))
+            self.searches.add(task)
+            task.add_done_callback(self.searches.discard)
+
+    async def search(self, key, cells):
+        grid_size, win_length, difficulty, _ = key
+        # Each search gets its own generator, drawn here on the event loop
+        seed = self.rng.getrandbits(64)
+        loop = asyncio.get_running_loop()
+        try:
+            move = await loop.run_in_executor(self.executor, search_position, grid_size,
+                                              win_length, difficulty, cells,
+                                              self.search_depth, seed)
+        except Exception as error:
+            for future, _, _ in self.inflight.pop(key):
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.searched += 1
+        if difficulty in CACHED:
+            self.cache[key] = move
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        for waiter in self.inflight.pop(key):
+            self.resolve(waiter, grid_size, move)
+
+    def resolve(self, waiter, grid_size, move):
+        future, symmetry, started = waiter
+        self.latencies.append(time.perf_counter() - started)
+        if not future.done():
+            future.set_result(inverse_symmetries(grid_size)[symmetry][move])
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            # Requests answered without a search of their own
+            'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            'batches': self.batches,
+            'searched': self.searched,
+            'cached': len(self.cache),
+            'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else 0.0,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+        }
+
+    async def answer(self, connection, request_id, grid_size, win_length, difficulty, x, o):
+        try:
+            if not 2 <= grid_size <= MAX_GRID_SIZE or difficulty >= len(DIFFICULTIES):
+                raise ValueError("bad request")
+            cells = cells_from_bits(unpack_board(x), unpack_board(o), grid_size)
+            row, col = await self.best_move(cells, grid_size, win_length, DIFFICULTIES[difficulty])
+            cell = row * grid_size + col
+        except ValueError:
+            cell = NO_MOVE
+        except Exception:
+            # A failed search still gets its answer, or the client would wait
+            # for it forever
+            traceback.print_exc()
+            cell = NO_MOVE
+        connection.send(encode(AI_MOVE, request_id, cell))
+
+    async def handle(self, reader, writer):
+        try:
+            first = await reader.readexactly(1)
+            if first == b'G':
+                connection = await WebSocketConnection.accept(reader, writer, first)
+            else:
+                connection = TCPConnection(reader, writer, first)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            connection = None
+        if connection is None:
+            writer.close()
+            return
+        # Requests of one connection are answered as they complete, each
+        # AI_MOVE carrying the id of its request
+        pending = set()
+        try:
+            while True:
+                message = await connection.read()
+                if message is None:
+                    break
+                kind, fields = decode(message)
+                if kind == AI_REQUEST:
+                    task = asyncio.create_task(self.answer(connection, *fields))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                elif kind == PING:
+                    connection.send(encode(PONG, *fields))
+                else:
+                    raise ProtocolError(f"unexpected message type {kind}")
+                await connection.drain()
+        except (ProtocolError, ConnectionError):
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            connection.close()
+
+    async def report(self, interval, log):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.stats()
+            log(f"{stats['requests']} requests, hit ratio {stats['hit_ratio']:.1%}, "
+                f"{stats['cached']} cached, p50 {stats['p50_ms']:.2f}ms  "
+                f"p99 {stats['p99_ms']:.2f}ms")
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, stats_interval=None, log=print):
+        self.start()
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        tasks = []
+        if stats_interval:
+            tasks.append(asyncio.create_task(self.report(stats_interval, log)))
+        address = server.sockets[0].getsockname()
+        log(f"listening on {address[0]}:{address[1]}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AI move service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help="positions kept in the cache")
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY_MS,
+                        help="how long a batch collects requests")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--depth', type=int, help="fixed Hard search depth instead of the clock")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="positions searched at once, each in a worker process")
+    parser.add_argument('--stats-interval', type=float, help="print statistics every N seconds")
+    args = parser.parse_args(argv)
+
+    service = AIService(args.cache_size, args.max_delay_ms, args.max_batch, args.depth,
+                        jobs=args.jobs)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.stats_interval,
+                                  lambda line: print(line, flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""Persistent store of the AI's learned moves and the player's progress.
+
+Hard's answers worth keeping across runs -- positions its search solved
+to the end, and opening positions searched at least ``MIN_DEPTH`` plies
+deep -- are kept per board in a SQLite database, keyed like the opening
+book by canonical position (``engine.book.canonical_key``) so symmetric
+positions share an entry.  Every entry keeps the depth it was searched
+to (a solved one counts as deep as the empty cells); lookups can ask for
+a minimum depth, and an entry is only replaced by one at least as deep.
+At most ``max_entries`` positions are kept; the least recently used one
+makes room for a new one.  The table is read into memory on first use.
+
+The player's progress (level table, level and AI difficulty) is a small
+JSON file next to it, read by the front-ends before their first frame.
+
+Nothing is written on the caller's thread: writes are queued and a
+background thread commits them in batches, so saving never holds up a
+move or a frame.  ``flush()`` waits for the queued writes and
+``close()`` finishes them at exit.
+"""
+
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from engine.game import BOARD_PRESETS, DIFFICULTIES
+
+# Positions kept in the database
+DEFAULT_MAX_ENTRIES = 20000
+
+# Queued writes committed in one transaction
+WRITE_BATCH = 512
+
+# Hard's answers with at most this many marks on the board are kept even
+# when the search ran out of time, if it got MIN_DEPTH plies deep
+OPENING_MARKS = 4
+MIN_DEPTH = 5
+
+DATABASE_NAME = 'positions.db'
+PROGRESS_NAME = 'progress.json'
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS positions (grid_size INTEGER, win_length INTEGER, key BLOB, "
+    "move INTEGER, score INTEGER, depth INTEGER, used INTEGER, "
+    "PRIMARY KEY (grid_size, win_length, key))",
+    "CREATE INDEX IF NOT EXISTS positions_used ON positions (used)",
+)
+SAVE = ("INSERT OR REPLACE INTO positions (grid_size, win_length, key, move, score, depth, used) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)")
+TOUCH = "UPDATE positions SET used = ? WHERE grid_size = ? AND win_length = ? AND key = ?"
+EVICT = "DELETE FROM positions WHERE grid_size = ? AND win_length = ? AND key = ?"
+TRIM = "DELETE FROM positions WHERE used < ?"
+
+
+def key_bytes(key):
+    # Canonical keys outgrow SQLite's 64-bit integers from 7x7 on
+    return key.to_bytes((key.bit_length() + 7) // 8, 'little')
+
+
+def board_preset(levels):
+    # Name of the BOARD_PRESETS entry with these levels, or None
+    for name, preset in BOARD_PRESETS.items():
+        if tuple(preset) == tuple(levels):
+            return name
+    return None
+
+
+def game_progress(game):
+    # What the front-ends restore on the next start
+    return {'board': board_preset(game.levels), 'level': game.current_level,
+            'difficulty': game.ai_difficulty}
+
+
+def restore_progress(game, progress):
+    # Put game back on a saved level table, level and difficulty; values
+    # this version does not know are left as they are
+    board = progress.get('board')
+    levels = BOARD_PRESETS.get(board) if isinstance(board, str) else None
+    if levels is not None and tuple(levels) != game.levels:
+        game.set_levels(levels)
+    level = progress.get('level')
+    if isinstance(level, int) and 1 <= level <= len(game.levels) and level != game.current_level:
+        game.set_level(level)
+    if progress.get('difficulty') in DIFFICULTIES:
+        game.ai_difficulty = progress['difficulty']
+
+
+class Store:
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES):
+        # directory is where the game log lives (the Kivy app's user_data_dir)
+        self.database_path = os.path.join(directory, DATABASE_NAME)
+        self.progress_path = os.path.join(directory, PROGRESS_NAME)
+        self.max_entries = max_entries
+        # {(grid_size, win_length, canonical key): (canonical move, score, depth)},
+        # least recently used first; None until loaded
+        self.positions = None
+        # Last use stamp handed out, persisted as the rows' used column
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.writer_lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            self.load()
+            return len(self.positions)
+
+    def load(self):
+        # Called with the lock held: read the table on first use
+        if self.positions is not None:
+            return
+        self.positions = OrderedDict()
+        if not os.path.exists(self.database_path):
+            return
+        # Loaded here: the front-ends open the store at startup but only
+        # the AI reads positions
+        import sqlite3
+        try:
+            connection = sqlite3.connect(self.database_path, timeout=5)
+            try:
+                rows = connection.execute(
+                    "SELECT grid_size, win_length, key, move, score, depth, used FROM positions "
+                    "ORDER BY used DESC LIMIT ?", (self.max_entries,)).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return  # An unreadable store starts over as an empty one
+        for grid_size, win_length, key, move, score, depth, used in reversed(rows):
+            self.positions[grid_size, win_length, int.from_bytes(key, 'little')] = (move, score, depth)
+        if rows:
+            self.clock = rows[0][6]
+            if len(rows) == self.max_entries:
+                # Rows beyond a smaller max_entries than before
+                self.put(('sql', (TRIM, (rows[-1][6],))))
+
+    def probe(self, cells, grid_size, win_length, min_depth=0):
+        # (flat move, score, depth) for this orientation, or None if unknown
+        # or searched less than min_depth plies deep
+        from engine.book import canonical_key
+        from engine.transposition import inverse_symmetries
+
+        canonical, symmetry = canonical_key(cells, grid_size)
+        key = (grid_size, win_length, canonical)
+        with self.lock:
+            self.load()
+            entry = self.positions.get(key)
+            if entry is None or entry[2] < min_depth:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.positions.move_to_end(key)
+            self.clock += 1
+            self.put(('sql', (TOUCH, (self.clock, grid_size, win_length, key_bytes(canonical)))))
+        move, score, depth = entry
+        return inverse_symmetries(grid_size)[symmetry][move], score, depth
+
+    def lookup(self, cells, grid_size, win_length, min_depth=0):
+        # (row, col) to play, or None if the position is not stored that deep
+        entry = self.probe(cells, grid_size, win_length, min_depth)
+        if entry is None:
+            return None
+        return divmod(entry[0], grid_size)
+
+    def save(self, cells, grid_size, win_length, move, score, depth):
+        # Remember (row, col) as the answer to the position of cells, unless
+        # it is already stored from a deeper search; a solved position
+        # passes its number of empty cells as depth
+        from engine.book import canonical_key
+        from engine.transposition import symmetries
+
+        canonical, symmetry = canonical_key(cells, grid_size)
+        row, col = move
+        cell = symmetries(grid_size)[symmetry][row * grid_size + col]
+        key = (grid_size, win_length, canonical)
+        with self.lock:
+            self.load()
+            entry = self.positions.get(key)
+            if entry is not None and entry[2] > depth:
+                return False
+            self.positions[key] = (cell, score, depth)
+            self.positions.move_to_end(key)
+            self.clock += 1
+            self.put(('sql', (SAVE, (grid_size, win_length, key_bytes(canonical), cell, score,
+                                       depth, self.clock))))
+            while len(self.positions) > self.max_entries:
+                (old_grid, old_win, old_key), _ = self.positions.popitem(last=False)
+                self.put(('sql', (EVICT, (old_grid, old_win, key_bytes(old_key)))))
+        return True
+
+    def load_progress(self):
+        # {'board': preset name, 'level': n, 'difficulty': name}, or {}
+        # before the first save
+        try:
+            with open(self.progress_path, encoding='utf-8') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return progress if isinstance(progress, dict) else {}
+
+    def save_progress(self, progress):
+        self.put(('progress', dict(progress)))
+
+    def put(self, item):
+        # Hand a write to the writer thread, starting it on first use
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.run, name='store-writer', daemon=True)
+                self.writer.start()
+        self.writes.put(item)
+
+    def flush(self, timeout=None):
+        # Wait until everything queued so far is written
+        if self.writer is None:
+            return True
+        done = threading.Event()
+        self.writes.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        # Finish the queued writes and stop the writer thread
+        if self.writer is None:
+            return
+        with self.writer_lock:
+            writer, self.writer = self.writer, None
+        self.writes.put(('close', None))
+        writer.join(timeout)
+
+    def run(self):
+        # Writer thread: takes what is queued, up to WRITE_BATCH writes,
+        # and commits it together
+        connection = None
+        while True:
+            batch = [self.writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            statements, progress, done, stop = [], None, [], False
+            for kind, value in batch:
+                if kind == 'sql':
+                    statements.append(value)
+                elif kind == 'progress':
+                    progress = value  # Only the latest one matters
+                elif kind == 'flush':
+                    done.append(value)
+                else:
+                    stop = True
+            if statements:
+                connection = self.write_positions(connection, statements)
+            if progress is not None:
+                self.write_progress(progress)
+            for event in done:
+                event.set()
+            if stop:
+                break
+        if connection is not None:
+            connection.close()
+
+    def write_positions(self, connection, statements):
+        # Returns the connection to keep using (None after an error)
+        import sqlite3
+        try:
+            if connection is None:
+                os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+                connection = sqlite3.connect(self.database_path, timeout=5)
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            with connection:
+                for statement, params in statements:
+                    connection.execute(statement, params)
+        except (OSError, sqlite3.Error):
+            # Only costs searches later; the next batch reconnects
+            if connection is not None:
+                connection.close()
+            return None
+        return connection
+
+    def write_progress(self, progress):
+        # Written to a temporary file and renamed over the old one, so a
+        # crash mid-write keeps the previous progress
+        temporary = self.progress_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.progress_path), exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(progress, f, ensure_ascii=False)
+            os.replace(temporary, self.progress_path)
+        except OSError:
+            pass
@@ -0,0 +1,188 @@
+"""Transposition table for the AI search.
+
+Positions are hashed with Zobrist keys under all eight rotations and
+reflections of the board at once; the smallest of the eight hashes is the
+canonical key, so symmetric positions share one table entry.  The table
+has a fixed number of slots derived from a memory cap and replaces
+entries depth-first, always letting a newer search overwrite stale ones.
+"""
+
+import os
+import random
+from functools import lru_cache
+
+# Bound types of a stored score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Rough CPython size of one stored entry (slot tuple and its integers)
+ENTRY_BYTES = 160
+
+# Memory cap in megabytes; low-RAM devices can lower it through the
+# environment or with set_shared_memory()
+DEFAULT_MEMORY_MB = float(os.environ.get('TICTACTOE_TT_MB', 16))
+
+# Cap of the table shared by the AI's Hard searches (engine.ai), which is
+# created by the first search.  Kept here rather than in engine.ai so the
+# front-ends can lower it at startup without loading the AI modules.
+_shared_memory_mb = DEFAULT_MEMORY_MB
+
+
+def set_shared_memory(memory_mb):
+    global _shared_memory_mb
+    _shared_memory_mb = memory_mb
+
+
+def shared_memory():
+    return _shared_memory_mb
+
+
+@lru_cache(maxsize=None)
+def symmetries(grid_size):
+    # Eight cell permutations: perm[cell] is where cell lands
+    last = grid_size - 1
+    transforms = (
+        lambda r, c: (r, c),
+        lambda r, c: (c, last - r),
+        lambda r, c: (last - r, last - c),
+        lambda r, c: (last - c, r),
+        lambda r, c: (r, last - c),
+        lambda r, c: (last - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (last - c, last - r),
+    )
+    perms = []
+    for transform in transforms:
+        perm = []
+        for cell in range(grid_size * grid_size):
+            row, col = transform(*divmod(cell, grid_size))
+            perm.append(row * grid_size + col)
+        perms.append(tuple(perm))
+    return tuple(perms)
+
+
+@lru_cache(maxsize=None)
+def inverse_symmetries(grid_size):
+    inverses = []
+    for perm in symmetries(grid_size):
+        inverse = [0] * len(perm)
+        for cell, image in enumerate(perm):
+            inverse[image] = cell
+        inverses.append(tuple(inverse))
+    return tuple(inverses)
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(grid_size, win_length):
+    # Fixed seed so hashes are stable between runs (and usable on disk)
+    rng = random.Random(grid_size * 1000 + win_length)
+    cells = grid_size * grid_size
+    keys = {player: tuple(rng.getrandbits(64) for _ in range(cells)) for player in ('X', 'O')}
+    base = rng.getrandbits(64)
+    side = rng.getrandbits(64)
+    return keys, base, side
+
+
+class ZobristHash:
+    __slots__ = ('grid_size', 'perms', 'keys', 'side', 'hashes')
+
+    def __init__(self, grid_size, win_length):
+        self.grid_size = grid_size
+        self.perms = symmetries(grid_size)
+        self.keys, base, self.side = zobrist_keys(grid_size, win_length)
+        # One running hash per symmetry of the board
+        self.hashes = [base] * len(self.perms)
+
+    @classmethod
+    def from_cells(cls, grid_size, win_length, cells):
+        zobrist = cls(grid_size, win_length)
+        for cell, player in enumerate(cells):
+            if player:
+                zobrist.toggle(cell, player)
+        return zobrist
+
+    def copy(self):
+        clone = ZobristHash.__new__(ZobristHash)
+        clone.grid_size = self.grid_size
+        clone.perms = self.perms
+        clone.keys = self.keys
+        clone.side = self.side
+        clone.hashes = self.hashes[:]
+        return clone
+
+    def toggle(self, cell, player):
+        # Add or remove a mark; XOR is its own inverse
+        keys = self.keys[player]
+        hashes = self.hashes
+        for index, perm in enumerate(self.perms):
+            hashes[index] ^= keys[perm[cell]]
+
+    def canonical(self, player_to_move):
+        # (key, symmetry index) of the canonical orientation
+        key = min(self.hashes)
+        symmetry = self.hashes.index(key)
+        if player_to_move == 'O':
+            key ^= self.side
+        return key, symmetry
+
+    def to_canonical(self, cell, symmetry):
+        return self.perms[symmetry][cell]
+
+    def from_canonical(self, cell, symmetry):
+        return inverse_symmetries(self.grid_size)[symmetry][cell]
+
+
+class TranspositionTable:
+    def __init__(self, memory_mb=DEFAULT_MEMORY_MB, max_entries=None):
+        if max_entries is None:
+            max_entries = int(memory_mb * 1024 * 1024 // ENTRY_BYTES)
+        self.capacity = max(1024, max_entries)
+        self.slots = [None] * self.capacity
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def __len__(self):
+        return self.capacity - self.slots.count(None)
+
+    def new_search(self):
+        # Entries from earlier searches become replaceable
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.capacity
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    def probe(self, key):
+        # (key, depth, flag, value, move, generation) or None
+        entry = self.slots[key % self.capacity]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        index = key % self.capacity
+        old = self.slots[index]
+        if old is not None and old[0] != key:
+            # Keep deeper results from the current search
+            if old[5] == self.generation and old[1] > depth:
+                return
+            self.replacements += 1
+        self.slots[index] = (key, depth, flag, value, move, self.generation)
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'capacity': self.capacity,
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'miss_rate': self.misses / probes if probes else 0.0,
+            'stores': self.stores,
+            'replacements': self.replacements,
+        }
@@ -0,0 +1,199 @@
+"""Incremental win detection for an N x N board with K marks in a row.
+
+Instead of rescanning the whole board after each move, the tracker keeps a
+per-player counter for every winning window (a run of ``win_length`` cells
+along a row, column or diagonal).  Placing a mark only touches the windows
+that pass through that cell, i.e. the four lines through the last move.
+
+A window is live while it holds marks of at most one player.  The tracker
+counts the live windows, in total and through every cell, so it knows
+when nobody can complete a line any more (``is_drawn``), well before the
+board is full on 4x4 and 5x5, and which empty cells no longer matter.
+"""
+
+from functools import lru_cache
+
+# Row, column, main diagonal, anti-diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+PLAYERS = ('X', 'O')
+
+
+@lru_cache(maxsize=None)
+def line_windows(grid_size, win_length):
+    # Every run of win_length cells as a tuple of flat cell indices
+    windows = []
+    last = win_length - 1
+    for dr, dc in DIRECTIONS:
+        for r in range(grid_size):
+            for c in range(grid_size):
+                end_r, end_c = r + dr * last, c + dc * last
+                if 0 <= end_r < grid_size and 0 <= end_c < grid_size:
+                    windows.append(tuple((r + dr * k) * grid_size + c + dc * k
+                                         for k in range(win_length)))
+    return tuple(windows)
+
+
+@lru_cache(maxsize=None)
+def cell_windows(grid_size, win_length):
+    # For each flat cell index, the indices of the windows passing through it
+    through = [[] for _ in range(grid_size * grid_size)]
+    for index, window in enumerate(line_windows(grid_size, win_length)):
+        for cell in window:
+            through[cell].append(index)
+    return tuple(tuple(indices) for indices in through)
+
+
+@lru_cache(maxsize=None)
+def window_weights(win_length):
+    # Value of an open window by the number of marks in it, growing
+    # geometrically up to 4096 for win_length - 1 marks
+    steps = max(1, win_length - 1)
+    return (0,) + tuple(1 << (12 * count // steps) for count in range(1, win_length + 1))
+
+
+class WinTracker:
+    def __init__(self, grid_size, win_length):
+        self.grid_size = grid_size
+        self.win_length = win_length
+        self.windows = line_windows(grid_size, win_length)
+        self.cell_windows = cell_windows(grid_size, win_length)
+        self.cells = [''] * (grid_size * grid_size)
+        # Marks of each player inside every window
+        self.counts = {player: [0] * len(self.windows) for player in PLAYERS}
+        # Number of fully occupied windows per player
+        self.completed = {player: 0 for player in PLAYERS}
+        # Sum of window_weights over each player's open windows (windows
+        # without opponent marks), kept up to date for the evaluation
+        self.weights = window_weights(win_length)
+        self.potential = {player: 0 for player in PLAYERS}
+        # Windows without marks of both players, in total and per cell
+        self.live_windows = len(self.windows)
+        self.cell_live = [len(indices) for indices in self.cell_windows]
+        self.history = []
+
+    def copy(self):
+        # Independent tracker for searching; the window tables are shared
+        clone = WinTracker.__new__(WinTracker)
+        clone.grid_size = self.grid_size
+        clone.win_length = self.win_length
+        clone.windows = self.windows
+        clone.cell_windows = self.cell_windows
+        clone.cells = self.cells[:]
+        clone.counts = {player: counts[:] for player, counts in self.counts.items()}
+        clone.completed = dict(self.completed)
+        clone.weights = self.weights
+        clone.potential = dict(self.potential)
+        clone.live_windows = self.live_windows
+        clone.cell_live = self.cell_live[:]
+        clone.history = self.history[:]
+        return clone
+
+    @property
+    def winner(self):
+        if self.completed['X']:
+            return 'X'
+        if self.completed['O']:
+            return 'O'
+        return None
+
+    def winning_line(self):
+        # Flat cell indices of a completed window, or None without a winner
+        player = self.winner
+        if player is None:
+            return None
+        counts = self.counts[player]
+        for index, count in enumerate(counts):
+            if count == self.win_length:
+                return self.windows[index]
+        return None
+
+    @property
+    def move_count(self):
+        return len(self.history)
+
+    def is_full(self):
+        return len(self.history) == len(self.cells)
+
+    def is_drawn(self):
+        # True once no window can be completed by either player; a full
+        # board without a winner is the latest case
+        return not self.live_windows
+
+    def is_live_cell(self, cell):
+        # True if the cell is in a window either player can still complete
+        return self.cell_live[cell] > 0
+
+    def place(self, row, col, player):
+        # Record a mark and return the winner (if the move completed a line)
+        cell = row * self.grid_size + col
+        self.cells[cell] = player
+        self.history.append(cell)
+        opponent = 'O' if player == 'X' else 'X'
+        counts, opposing = self.counts[player], self.counts[opponent]
+        weights = self.weights
+        target = self.win_length
+        gained = lost = 0
+        for index in self.cell_windows[cell]:
+            count = counts[index] + 1
+            counts[index] = count
+            theirs = opposing[index]
+            if theirs:
+                # The window is now dead for the opponent, and for both
+                if count == 1:
+                    lost += weights[theirs]
+                    self.change_live(index, -1)
+            else:
+                gained += weights[count] - weights[count - 1]
+                if count == target:
+                    self.completed[player] += 1
+        self.potential[player] += gained
+        self.potential[opponent] -= lost
+        return self.winner
+
+    def change_live(self, index, change):
+        # A window died (change -1) or came back to life on undo (+1)
+        self.live_windows += change
+        cell_live = self.cell_live
+        for cell in self.windows[index]:
+            cell_live[cell] += change
+
+    def undo(self):
+        # Take back the last mark
+        cell = self.history.pop()
+        player = self.cells[cell]
+        self.cells[cell] = ''
+        opponent = 'O' if player == 'X' else 'X'
+        counts, opposing = self.counts[player], self.counts[opponent]
+        weights = self.weights
+        target = self.win_length
+        gained = lost = 0
+        for index in self.cell_windows[cell]:
+            count = counts[index]
+            counts[index] = count - 1
+            theirs = opposing[index]
+            if theirs:
+                if count == 1:
+                    lost += weights[theirs]
+                    self.change_live(index, 1)
+            else:
+                gained += weights[count] - weights[count - 1]
+                if count == target:
+                    self.completed[player] -= 1
+        self.potential[player] -= gained
+        self.potential[opponent] += lost
+        return divmod(cell, self.grid_size)
+
+    def is_winning_move(self, row, col, player):
+        # True if placing player's mark on the empty cell completes a line.
+        # A window with win_length - 1 of player's marks and this empty
+        # cell in it can only be missing exactly this cell.
+        cell = row * self.grid_size + col
+        if self.cells[cell] != '':
+            return False
+        counts = self.counts[player]
+        needed = self.win_length - 1
+        for index in self.cell_windows[cell]:
+            if counts[index] == needed:
+                return True
+        return False
@@ -0,0 +1,83 @@
+"""Compute AI moves on a background thread.
+
+The front-ends hand the worker their ``Game``; the move is computed on a
+snapshot so the UI thread keeps rendering and handling input.  Finished
+moves are queued and delivered by ``poll()`` on the UI thread (Tk polls it
+with ``after``, Kivy gets a ``notify`` callback that schedules it on the
+Clock).  Cancelling sets the running search's event so it stops at its
+next clock check, and a result for an older game generation is dropped
+even if it was already queued.
+"""
+
+import queue
+import threading
+import time
+import traceback
+
+from engine.metrics import METRICS
+
+
+class AIWorker:
+    def __init__(self, notify=None):
+        # notify() is called from the worker thread when a move is ready
+        self.notify = notify
+        self.results = queue.Queue()
+        self.cancel_event = None
+        self.pending = None
+
+    @property
+    def busy(self):
+        return self.pending is not None
+
+    def request(self, game, on_move):
+        # Start computing a move for game; on_move(row, col) runs in poll()
+        self.cancel()
+        event = threading.Event()
+        snapshot = game.snapshot()
+        snapshot.cancel_event = event
+        ticket = (game, game.generation, event, on_move, time.perf_counter())
+        self.cancel_event = event
+        self.pending = ticket
+
+        def run():
+            try:
+                move = snapshot.ai_move()
+            except Exception:
+                # A failing strategy must not leave the UI waiting on the
+                # AI's turn for good: report it and play a random move
+                traceback.print_exc()
+                snapshot.last_search = None
+                empty_cells = snapshot.board.empty_cells()
+                move = snapshot.rng.choice(empty_cells) if empty_cells else None
+            if event.is_set():
+                return
+            self.results.put((ticket, move, snapshot.last_search))
+            if self.notify is not None:
+                self.notify()
+
+        threading.Thread(target=run, name='ai-move', daemon=True).start()
+
+    def cancel(self):
+        # Stop the running search; its result will never be applied
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.cancel_event = None
+        self.pending = None
+
+    def poll(self):
+        # Deliver finished moves on the calling (UI) thread
+        while True:
+            try:
+                ticket, move, last_search = self.results.get_nowait()
+            except queue.Empty:
+                return
+            game, generation, event, on_move, requested = ticket
+            if ticket is not self.pending or event.is_set() or game.generation != generation:
+                continue  # Stale: the game was reset or the request cancelled
+            self.pending = None
+            self.cancel_event = None
+            game.last_search = last_search
+            if METRICS.enabled:
+                METRICS.add_time('ai_latency', time.perf_counter() - requested)
+            if move is not None:
+                on_move(*move)
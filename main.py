@@ -1,140 +1,399 @@
+import time
+# Start of the app's imports, for the startup timers
+STARTED = time.perf_counter()
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.popup import Popup
+from kivy.uix.widget import Widget
 from kivy.clock import Clock
-import random
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, InstructionGroup, Line, Rectangle
+from kivy.utils import platform
+from engine import BOARD_PRESETS, DIFFICULTIES, Game
+from engine.metrics import METRICS
+from engine.protocol import CLOSED, EVICTED, MARKS, MOVED, OPPONENT_LEFT, START, WAITING
+from engine.records import GameLog, default_log_path
+from engine.store import Store, board_preset, game_progress, restore_progress
+from engine.transposition import set_shared_memory
+from engine.worker import AIWorker
+IMPORTED = time.perf_counter()
+
+# Cap of the AI's transposition table on phones, in megabytes
+ANDROID_TT_MEMORY_MB = 4
+
+# Game modes cycled by the mode button; the last one plays through
+# engine.server at TICTACTOE_SERVER (default localhost:8765)
+MODES = ["1 Игрок (против ИИ)", "2 Игрока", "По сети"]
+
+# Colours of the marks, the grid and the winning line
+MARK_COLORS = {'X': (0, 0, 1, 1), 'O': (1, 0, 0, 1)}
+GRID_COLOR = (0.5, 0.5, 0.5, 1)
+WIN_LINE_COLOR = (0.26, 0.63, 0.28, 1)
+
+# Rendered X/O textures by (player, font size); shared by every board
+_mark_textures = {}
+
+def mark_texture(player, font_size):
+    texture = _mark_textures.get((player, font_size))
+    if texture is None:
+        label = CoreLabel(text=player, font_size=font_size, bold=True, color=MARK_COLORS[player])
+        label.refresh()
+        texture = label.texture
+        _mark_textures[(player, font_size)] = texture
+    return texture
+
+class BoardWidget(Widget):
+    # The whole board as canvas instructions: grid lines, one textured
+    # Rectangle per mark and the winning line.  Taps are mapped to cells
+    # by arithmetic, and a move only adds the instruction of its cell.
+    def __init__(self, on_tap=None, **kwargs):
+        super(BoardWidget, self).__init__(**kwargs)
+        self.on_tap = on_tap
+        self.grid_size = 3
+        # (row, col) -> (player, Rectangle) of the marks on the board
+        self.marks = {}
+        self.win_cells = []
+        self.grid_group = InstructionGroup()
+        self.mark_group = InstructionGroup()
+        self.win_group = InstructionGroup()
+        self.canvas.add(self.grid_group)
+        self.canvas.add(self.mark_group)
+        self.canvas.add(self.win_group)
+        self.draw_grid()
+        self.bind(pos=self.relayout, size=self.relayout)
+    
+    def geometry(self):
+        # (left, bottom, cell size) of the square board inside the widget
+        side = min(self.width, self.height)
+        cell = side / self.grid_size
+        return self.x + (self.width - side) / 2, self.y + (self.height - side) / 2, cell
+    
+    def build(self, grid_size):
+        # Start an empty board; the grid is redrawn only when the size changes
+        if grid_size != self.grid_size:
+            self.grid_size = grid_size
+            self.clear()
+            self.draw_grid()
+        else:
+            self.clear()
+    
+    def draw_grid(self):
+        left, bottom, cell = self.geometry()
+        side = cell * self.grid_size
+        self.grid_group.clear()
+        self.grid_group.add(Color(*GRID_COLOR))
+        for k in range(self.grid_size + 1):
+            offset = k * cell
+            self.grid_group.add(Line(points=[left + offset, bottom, left + offset, bottom + side]))
+            self.grid_group.add(Line(points=[left, bottom + offset, left + side, bottom + offset]))
+    
+    def mark_rectangle(self, row, col, player):
+        left, bottom, cell = self.geometry()
+        texture = mark_texture(player, max(8, int(cell * 0.6)))
+        width, height = texture.size
+        x = left + col * cell + (cell - width) / 2
+        y = bottom + (self.grid_size - 1 - row) * cell + (cell - height) / 2
+        return Rectangle(texture=texture, pos=(x, y), size=(width, height))
+    
+    def draw_cell(self, row, col, player):
+        old = self.marks.pop((row, col), None)
+        if old is not None:
+            self.mark_group.remove(old[1])
+        if player:
+            rectangle = self.mark_rectangle(row, col, player)
+            self.mark_group.add(rectangle)
+            self.marks[(row, col)] = (player, rectangle)
+    
+    def highlight(self, cells):
+        # A line through the centres of the first and last winning cells
+        self.win_cells = list(cells)
+        self.win_group.clear()
+        if not cells:
+            return
+        left, bottom, cell = self.geometry()
+        points = []
+        for row, col in (cells[0], cells[-1]):
+            points += [left + (col + 0.5) * cell, bottom + (self.grid_size - 0.5 - row) * cell]
+        self.win_group.add(Color(*WIN_LINE_COLOR))
+        self.win_group.add(Line(points=points, width=max(2, cell / 12), cap='round'))
+    
+    def clear(self):
+        self.mark_group.clear()
+        self.win_group.clear()
+        self.marks = {}
+        self.win_cells = []
+    
+    def relayout(self, *args):
+        # Resizing moves every instruction; the textures are reused
+        self.draw_grid()
+        marks = self.marks
+        self.mark_group.clear()
+        self.marks = {}
+        for (row, col), (player, _) in marks.items():
+            self.draw_cell(row, col, player)
+        self.highlight(self.win_cells)
+    
+    def on_touch_down(self, touch):
+        left, bottom, cell = self.geometry()
+        col = int((touch.x - left) // cell) if cell else -1
+        row = self.grid_size - 1 - int((touch.y - bottom) // cell) if cell else -1
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            if self.on_tap is not None:
+                self.on_tap(row, col)
+            return True
+        return super(BoardWidget, self).on_touch_down(touch)
 
 class TicTacToeGame(BoxLayout):
-    def __init__(self, **kwargs):
+    def __init__(self, store=None, **kwargs):
         super(TicTacToeGame, self).__init__(**kwargs)
         self.orientation = 'vertical'
         self.padding = 10
         self.spacing = 10
         
-        # Game state variables
-        self.current_player = 'X'
-        self.grid_size = 3
-        self.win_length = 3
-        self.current_level = 1
-        self.vs_ai = True
-        self.ai_difficulty = "Medium"
-        self.game_over = False
-        
-        # Create the settings area
+        # Game state lives in the headless engine (vs AI, Medium, level 1)
+        self.game = Game(vs_ai=True, ai_difficulty="Medium")
+        # Back to the saved level table, level and difficulty; the store
+        # also keeps the AI's learned moves
+        self.store = store
+        if store is not None:
+            restore_progress(self.game, store.load_progress())
+            self.game.store = store
+        # Finished AI moves are handed back to the Kivy Clock
+        self.ai_worker = AIWorker(notify=lambda: Clock.schedule_once(self.poll_ai_move))
+        # Connection to the game server in network mode, and our mark
+        self.remote = None
+        self.remote_mark = None
+        # Messages held back while a finished network game stays on screen
+        self.remote_backlog = None
+        
+        # Create the settings area; only the board and the status are built
+        # before the first frame, build_controls() adds the rest after it
         self.settings_layout = BoxLayout(orientation='vertical', size_hint=(1, 0.2))
+        self.add_widget(self.settings_layout)
+        
+        # Create game board: a single widget drawing every cell
+        self.game_layout = BoxLayout(orientation='vertical', size_hint=(1, 0.6))
+        self.add_widget(self.game_layout)
+        self.board_widget = BoardWidget(on_tap=self.on_cell_click)
+        self.game_layout.add_widget(self.board_widget)
+        self.last_transition_ms = 0.0
+        self.create_game_board()
+        
+        # Status and controls
+        self.controls_layout = BoxLayout(orientation='vertical', size_hint=(1, 0.2))
+        
+        # Status label
+        self.status_label = Label(text=f"Ход игрока: {self.game.current_player}", size_hint=(1, 0.5))
+        self.controls_layout.add_widget(self.status_label)
+        
+        self.add_widget(self.controls_layout)
+    
+    def build_controls(self):
+        # Settings and buttons, deferred until the first frame is on screen
         
         # Game mode selection
-        mode_layout = BoxLayout(size_hint=(1, 0.33))
+        mode_layout = BoxLayout(size_hint=(1, 0.25))
         mode_layout.add_widget(Label(text="Режим игры:"))
-        self.mode_button = Button(text="1 Игрок (против ИИ)")
+        self.mode_button = Button(text=MODES[0])
         self.mode_button.bind(on_release=self.toggle_game_mode)
         mode_layout.add_widget(self.mode_button)
         self.settings_layout.add_widget(mode_layout)
         
         # AI difficulty selection
-        difficulty_layout = BoxLayout(size_hint=(1, 0.33))
+        difficulty_layout = BoxLayout(size_hint=(1, 0.25))
         difficulty_layout.add_widget(Label(text="Сложность ИИ:"))
-        self.difficulty_button = Button(text=self.ai_difficulty)
+        self.difficulty_button = Button(text=self.game.ai_difficulty)
         self.difficulty_button.bind(on_release=self.toggle_difficulty)
         difficulty_layout.add_widget(self.difficulty_button)
         self.settings_layout.add_widget(difficulty_layout)
         
         # Level display
-        level_layout = BoxLayout(size_hint=(1, 0.33))
+        level_layout = BoxLayout(size_hint=(1, 0.25))
         level_layout.add_widget(Label(text="Уровень:"))
-        self.level_label = Label(text=f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})")
+        self.level_label = Label(text=self.level_text())
         level_layout.add_widget(self.level_label)
         self.settings_layout.add_widget(level_layout)
         
-        self.add_widget(self.settings_layout)
-        
-        # Create game board
-        self.game_layout = BoxLayout(orientation='vertical', size_hint=(1, 0.6))
-        self.add_widget(self.game_layout)
-        self.create_game_board()
-        
-        # Status and controls
-        self.controls_layout = BoxLayout(orientation='vertical', size_hint=(1, 0.2))
-        
-        # Status label
-        self.status_label = Label(text=f"Ход игрока: {self.current_player}", size_hint=(1, 0.5))
-        self.controls_layout.add_widget(self.status_label)
+        # Board size selection (level table)
+        board_layout = BoxLayout(size_hint=(1, 0.25))
+        board_layout.add_widget(Label(text="Поле:"))
+        self.board_presets = list(BOARD_PRESETS)
+        self.board_button = Button(text=board_preset(self.game.levels) or self.board_presets[0])
+        self.board_button.bind(on_release=self.toggle_board)
+        board_layout.add_widget(self.board_button)
+        self.settings_layout.add_widget(board_layout)
         
         # Buttons
         buttons_layout = BoxLayout(size_hint=(1, 0.5))
         restart_button = Button(text="Новая игра")
         restart_button.bind(on_release=self.reset_game)
         buttons_layout.add_widget(restart_button)
+        undo_button = Button(text="Отменить")
+        undo_button.bind(on_release=self.undo_move)
+        buttons_layout.add_widget(undo_button)
+        redo_button = Button(text="Повторить")
+        redo_button.bind(on_release=self.redo_move)
+        buttons_layout.add_widget(redo_button)
         
         self.controls_layout.add_widget(buttons_layout)
-        self.add_widget(self.controls_layout)
-        
-        # Initialize board data structure
-        self.board = [[''] * self.grid_size for _ in range(self.grid_size)]
     
     def create_game_board(self):
-        # Clear existing game board
-        self.game_layout.clear_widgets()
-        
-        # Create the grid
-        self.grid = GridLayout(cols=self.grid_size)
-        self.buttons = []
-        
-        for i in range(self.grid_size):
-            row = []
-            for j in range(self.grid_size):
-                btn = Button(text='', font_size=40)
-                btn.bind(on_release=lambda btn=btn, row=i, col=j: self.make_move(btn, row, col))
-                self.grid.add_widget(btn)
-                row.append(btn)
-            self.buttons.append(row)
-        
-        self.game_layout.add_widget(self.grid)
+        # The board widget is reused; only its instructions change
+        start = time.perf_counter()
+        self.board_widget.build(self.game.grid_size)
+        self.last_transition_ms = (time.perf_counter() - start) * 1000
+        if METRICS.enabled:
+            METRICS.add_time('board_build', self.last_transition_ms / 1000)
+    
+    def render_cell(self, row, col):
+        # Redraw one cell from the engine board (X blue, O red)
+        with METRICS.timer('render'):
+            self.board_widget.draw_cell(row, col, self.game.board.get(row, col))
+    
+    def level_text(self):
+        text = f"{self.game.current_level} (сетка {self.game.grid_size}x{self.game.grid_size}"
+        if self.game.win_length != self.game.grid_size:
+            text += f", {self.game.win_length} в ряд"
+        return text + ")"
     
     def toggle_game_mode(self, instance):
-        if self.vs_ai:
-            self.vs_ai = False
-            instance.text = "2 Игрока"
-        else:
-            self.vs_ai = True
-            instance.text = "1 Игрок (против ИИ)"
+        instance.text = MODES[(MODES.index(instance.text) + 1) % len(MODES)]
+        self.close_remote()
+        self.game.vs_ai = instance.text == MODES[0]
         self.reset_level()
+        if instance.text == MODES[2]:
+            self.connect_remote()
     
-    def toggle_difficulty(self, instance):
-        if self.ai_difficulty == "Easy":
-            self.ai_difficulty = "Medium"
-        elif self.ai_difficulty == "Medium":
-            self.ai_difficulty = "Hard"
+    def connect_remote(self):
+        # Two-player games against someone else on the game server
+        from engine.remote import RemotePlayer, default_address
+        remote = RemotePlayer(default_address(), self.on_remote_message,
+                              notify=lambda: Clock.schedule_once(lambda dt: remote.poll()))
+        self.remote = remote
+        remote.connect(self.preset_index())
+        self.status_label.text = "Подключение к серверу..."
+    
+    def close_remote(self):
+        if self.remote is not None:
+            self.remote.close()
+            self.remote = None
+        self.remote_mark = None
+        self.remote_backlog = None
+    
+    def preset_index(self):
+        return self.board_presets.index(self.board_button.text)
+    
+    def on_remote_message(self, kind, fields):
+        # Leave a finished game on screen for a moment before the next one;
+        # whatever arrives meanwhile is handled after it, in order
+        if self.remote_backlog is not None:
+            self.remote_backlog.append((kind, fields))
+        elif kind == START and self.game.game_over:
+            self.remote_backlog = [(kind, fields)]
+            Clock.schedule_once(self.replay_remote_backlog, 1.5)
         else:
-            self.ai_difficulty = "Easy"
+            self.handle_remote_message(kind, fields)
+    
+    def replay_remote_backlog(self, dt):
+        backlog, self.remote_backlog = self.remote_backlog or [], None
+        for kind, fields in backlog:
+            if self.remote is None:
+                break
+            self.handle_remote_message(kind, fields)
+    
+    def handle_remote_message(self, kind, fields):
+        # The server decides; the local game mirrors its moves and levels
+        if kind == WAITING:
+            self.status_label.text = "Ожидание соперника..."
+        elif kind == START:
+            self.start_remote_game(*fields)
+        elif kind == MOVED:
+            row, col = divmod(fields[0], self.game.grid_size)
+            self.game.make_move(row, col)
+            self.render_cell(row, col)
+            self.board_widget.highlight(self.game.winning_line())
+            self.update_status()
+            if self.game.game_over:
+                self.show_popup("Игра окончена", self.status_label.text)
+        elif kind == OPPONENT_LEFT:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
+            self.status_label.text = "Соперник вышел, ищем нового..."
+        elif kind == EVICTED:
+            self.show_popup("Сетевая игра", "Матч закрыт из-за бездействия")
+        elif kind == CLOSED:
+            self.close_remote()
+            self.status_label.text = "Нет связи с сервером"
+    
+    def start_remote_game(self, match_id, level, grid_size, win_length, mark):
+        self.remote_mark = MARKS[mark]
+        # configure_level already restarts a game on that level
+        self.game.configure_level(level, grid_size, win_length)
+        if level != self.game.current_level:
+            self.game.set_level(level)
+        self.level_label.text = self.level_text()
+        self.create_game_board()
+        self.update_status()
+    
+    def toggle_difficulty(self, instance):
+        index = DIFFICULTIES.index(self.game.ai_difficulty)
+        self.game.ai_difficulty = DIFFICULTIES[(index + 1) % len(DIFFICULTIES)]
         
-        instance.text = self.ai_difficulty
+        instance.text = self.game.ai_difficulty
+        self.save_progress()
         self.reset_game(None)
     
-    def make_move(self, button, row, col):
-        # Check if the game is over or the cell is not empty
-        if self.game_over or self.board[row][col] != '':
+    def on_cell_click(self, row, col):
+        # In network mode moves go to the server and are drawn when it
+        # confirms them
+        if self.remote is not None:
+            if (self.game.current_player == self.remote_mark and not self.game.game_over
+                    and self.game.board.is_empty(row, col)):
+                self.remote.send_move(row * self.game.grid_size + col)
+            return
+        # Ignore taps while the AI is thinking
+        if self.game.is_ai_turn():
+            return
+        self.make_move(row, col)
+    
+    def toggle_board(self, instance):
+        # Cycle through the level tables and start from the first level
+        index = self.board_presets.index(instance.text)
+        instance.text = self.board_presets[(index + 1) % len(self.board_presets)]
+        self.ai_worker.cancel()
+        self.game.set_levels(BOARD_PRESETS[instance.text])
+        self.level_label.text = self.level_text()
+        self.create_game_board()
+        self.status_label.text = f"Ход игрока: {self.game.current_player}"
+        self.save_progress()
+        if self.remote is not None:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
+    
+    def make_move(self, row, col):
+        # The engine rejects moves after game over or on occupied cells
+        if not self.game.make_move(row, col):
             return
-            
-        # Update board data structure
-        self.board[row][col] = self.current_player
         
-        # Update button text
-        button.text = self.current_player
+        # Redraw only the touched cell
+        self.render_cell(row, col)
         
-        # Apply different colors for X and O
-        if self.current_player == 'X':
-            button.color = (0, 0, 1, 1)  # Blue
-        else:
-            button.color = (1, 0, 0, 1)  # Red
+        if self.end_game():
+            return
         
-        # Check for winner
-        winner = self.check_winner()
+        # Update status label
+        self.status_label.text = f"Ход игрока: {self.game.current_player}"
+        
+        # If playing against AI and it's AI's turn (O), make AI move
+        if self.game.is_ai_turn():
+            Clock.schedule_once(self.make_ai_move, 0.5)  # Slight delay for better UX
+    
+    def end_game(self):
+        # Announce a win or draw; False while the game goes on
+        winner = self.game.winner
         if winner:
-            self.game_over = True
+            self.board_widget.highlight(self.game.winning_line())
             if winner == 'X':  # Player wins
                 self.status_label.text = f"Игрок {winner} победил!"
                 self.show_popup("Уровень пройден!", "Поздравляем! Вы переходите на следующий уровень.")
@@ -142,189 +401,134 @@ class TicTacToeGame(BoxLayout):
             else:  # AI wins
                 self.status_label.text = f"Игрок {winner} победил!"
                 self.show_popup("Игра окончена", f"Игрок {winner} победил!")
-            return
+            return True
         
         # Check for draw
-        if self.is_board_full():
-            self.game_over = True
+        if self.game.is_draw:
             self.status_label.text = "Ничья!"
             self.show_popup("Игра окончена", "Ничья!")
-            return
-        
-        # Switch player
-        self.current_player = 'O' if self.current_player == 'X' else 'X'
-        
-        # Update status label
-        self.status_label.text = f"Ход игрока: {self.current_player}"
-        
-        # If playing against AI and it's AI's turn (O), make AI move
-        if self.vs_ai and self.current_player == 'O' and not self.game_over:
-            Clock.schedule_once(self.make_ai_move, 0.5)  # Slight delay for better UX
+            return True
+        return False
     
     def make_ai_move(self, dt):
-        if self.game_over:
+        # The game may have been reset since this call was scheduled
+        if not self.game.is_ai_turn():
             return
             
-        # Choose move based on difficulty
-        if self.ai_difficulty == "Easy":
-            row, col = self.get_easy_ai_move()
-        elif self.ai_difficulty == "Medium":
-            row, col = self.get_medium_ai_move()
-        else:  # Hard
-            row, col = self.get_hard_ai_move()
-            
+        # Choose move based on difficulty on a worker thread
+        self.ai_worker.request(self.game, self.apply_ai_move)
+    
+    def poll_ai_move(self, dt):
+        self.ai_worker.poll()
+    
+    def apply_ai_move(self, row, col):
         # Make the move
-        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
-            self.make_move(self.buttons[row][col], row, col)
-    
-    def get_easy_ai_move(self):
-        # Random move
-        empty_cells = []
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    empty_cells.append((i, j))
-        
-        return random.choice(empty_cells) if empty_cells else (0, 0)
+        if 0 <= row < self.game.grid_size and 0 <= col < self.game.grid_size:
+            self.make_move(row, col)
     
-    def get_medium_ai_move(self):
-        # 50% chance for smart move, 50% for random
-        if random.random() < 0.5:
-            return self.get_easy_ai_move()
-        else:
-            return self.get_hard_ai_move()
-    
-    def get_hard_ai_move(self):
-        # First, check if AI can win in the next move
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    self.board[i][j] = 'O'  # Try placing O
-                    if self.check_winner() == 'O':
-                        self.board[i][j] = ''  # Undo move
-                        return (i, j)
-                    self.board[i][j] = ''  # Undo move
-        
-        # Second, check if player can win in the next move and block
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    self.board[i][j] = 'X'  # Try placing X
-                    if self.check_winner() == 'X':
-                        self.board[i][j] = ''  # Undo move
-                        return (i, j)
-                    self.board[i][j] = ''  # Undo move
-        
-        # Take center if available
-        center = self.grid_size // 2
-        if self.board[center][center] == '':
-            return (center, center)
-        
-        # Take corners if available
-        corners = [(0, 0), (0, self.grid_size-1), 
-                  (self.grid_size-1, 0), (self.grid_size-1, self.grid_size-1)]
-        empty_corners = [corner for corner in corners if self.board[corner[0]][corner[1]] == '']
-        if empty_corners:
-            return random.choice(empty_corners)
-        
-        # Take any empty cell
-        return self.get_easy_ai_move()
+    def undo_move(self, instance):
+        # Take back the last move (against the AI, back to the player's
+        # turn) and clear just the cells it occupied; not in network games
+        if self.remote is not None:
+            return
+        self.ai_worker.cancel()
+        Clock.unschedule(self.advance_level)
+        self.board_widget.highlight([])
+        while True:
+            move = self.game.undo()
+            if move is None:
+                break
+            self.render_cell(*move)
+            if not self.game.is_ai_turn():
+                break
+        self.update_status()
     
-    def check_winner(self):
-        win_length = self.win_length
-        
-        # Check rows
-        for i in range(self.grid_size):
-            for j in range(self.grid_size - win_length + 1):
-                if self.board[i][j] != '' and all(self.board[i][j+k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check columns
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(self.grid_size):
-                if self.board[i][j] != '' and all(self.board[i+k][j] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check diagonals (top-left to bottom-right)
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(self.grid_size - win_length + 1):
-                if self.board[i][j] != '' and all(self.board[i+k][j+k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check diagonals (top-right to bottom-left)
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(win_length - 1, self.grid_size):
-                if self.board[i][j] != '' and all(self.board[i+k][j-k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        return None
+    def redo_move(self, instance):
+        # Replay undone moves up to the player's next turn
+        if self.remote is not None:
+            return
+        self.ai_worker.cancel()
+        redone = False
+        while True:
+            move = self.game.redo()
+            if move is None:
+                break
+            redone = True
+            self.render_cell(*move)
+            if self.game.game_over or not self.game.is_ai_turn():
+                break
+        # A redone last move ends the game as it did when first played
+        if redone and self.end_game():
+            return
+        self.update_status()
+        if self.game.is_ai_turn():
+            Clock.schedule_once(self.make_ai_move, 0.5)
     
-    def is_board_full(self):
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    return False
-        return True
+    def update_status(self):
+        if self.game.winner:
+            self.status_label.text = f"Игрок {self.game.winner} победил!"
+        elif self.game.is_draw:
+            self.status_label.text = "Ничья!"
+        elif self.remote_mark is not None:
+            whose = "вы" if self.game.current_player == self.remote_mark else "соперник"
+            self.status_label.text = f"Ход игрока: {self.game.current_player} ({whose})"
+        else:
+            self.status_label.text = f"Ход игрока: {self.game.current_player}"
     
     def advance_level(self, dt):
-        self.current_level += 1
+        self.ai_worker.cancel()
         
-        # Define level progression
-        if self.current_level == 2:
-            self.grid_size = 4  # Level 2: 4x4 grid
-            self.win_length = 4  # Need 4 in a row to win
-            self.ai_difficulty = "Medium" if self.ai_difficulty == "Easy" else "Hard"
-        elif self.current_level == 3:
-            self.grid_size = 5  # Level 3: 5x5 grid
-            self.win_length = 5  # Need 5 in a row to win
-            self.ai_difficulty = "Hard"  # Force hard difficulty
-        else:
-            # Max level reached, restart at level 1 but keep difficulty at hard
-            self.current_level = 1
-            self.grid_size = 3
-            self.win_length = 3
+        # Grid size, win length and difficulty progression live in the engine
+        self.game.advance_level()
         
         # Update level display
-        self.level_label.text = f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})"
+        self.level_label.text = self.level_text()
         
         # Update AI difficulty display
-        self.difficulty_button.text = self.ai_difficulty
-        
-        # Reset the game with new grid size
-        self.board = [[''] * self.grid_size for _ in range(self.grid_size)]
-        self.game_over = False
-        self.current_player = 'X'
+        self.difficulty_button.text = self.game.ai_difficulty
         
         # Recreate the game board with new size
         self.create_game_board()
         
         # Reset status label
-        self.status_label.text = f"Ход игрока: {self.current_player}"
+        self.status_label.text = f"Ход игрока: {self.game.current_player}"
+        self.save_progress()
     
     def reset_level(self, *args):
         # Reset to level 1
-        self.current_level = 1
-        self.grid_size = 3
-        self.win_length = 3
-        self.level_label.text = f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})"
-        self.reset_game(None)
+        self.ai_worker.cancel()
+        self.game.reset_level()
+        self.level_label.text = self.level_text()
+        self.create_game_board()
+        self.status_label.text = f"Ход игрока: {self.game.current_player}"
+        self.save_progress()
+    
+    def save_progress(self):
+        # Queued for the store's writer thread; never waits for the disk
+        if self.store is not None:
+            self.store.save_progress(game_progress(self.game))
     
     def reset_game(self, instance):
-        # Reset game state variables
-        self.game_over = False
-        self.current_player = 'X'
-        self.board = [[''] * self.grid_size for _ in range(self.grid_size)]
+        # Reset game state variables (and drop any AI move in progress)
+        self.ai_worker.cancel()
+        self.game.reset()
         
-        # Reset UI
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                self.buttons[i][j].text = ''
-                self.buttons[i][j].color = (1, 1, 1, 1)  # Reset to default color
+        # Reset UI: only the played cells need clearing
+        start = time.perf_counter()
+        self.board_widget.clear()
+        self.last_transition_ms = (time.perf_counter() - start) * 1000
         
         # Reset status label
-        self.status_label.text = f"Ход игрока: {self.current_player}"
+        self.status_label.text = f"Ход игрока: {self.game.current_player}"
+        
+        # In network mode a new game means a new opponent
+        if self.remote is not None:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
     
     def show_popup(self, title, message):
+        # Popup is imported on the first message rather than at startup
+        from kivy.uix.popup import Popup
         popup = Popup(title=title, content=Label(text=message), 
                      size_hint=(0.7, 0.3))
         popup.open()
@@ -332,7 +536,36 @@ class TicTacToeGame(BoxLayout):
 
 class TicTacToeApp(App):
     def build(self):
-        return TicTacToeGame()
+        self.first_frame_ms = None
+        METRICS.configure_from_env()
+        # Progress and learned AI moves, like finished and abandoned games,
+        # go to the app's private storage
+        root = TicTacToeGame(store=Store(self.user_data_dir))
+        root.game.recorder = GameLog(default_log_path(self.user_data_dir))
+        return root
+    
+    def on_start(self):
+        # A timeout of 0 runs after the next frame, i.e. the first one
+        Clock.schedule_once(self.on_first_frame)
+    
+    def on_first_frame(self, dt):
+        # Time from the start of the imports to the first frame
+        self.first_frame_ms = (time.perf_counter() - STARTED) * 1000
+        if METRICS.enabled:
+            METRICS.add_time('startup_imports', IMPORTED - STARTED)
+            METRICS.add_time('first_frame', self.first_frame_ms / 1000)
+        if platform == 'android':
+            # Only caps the table; the AI modules load and allocate it on
+            # the first Hard move
+            set_shared_memory(ANDROID_TT_MEMORY_MB)
+        self.root.build_controls()
+    
+    def on_stop(self):
+        # Write the metrics summary (when enabled) to the app's storage
+        self.root.close_remote()
+        self.root.game.save_record()
+        METRICS.dump(self.user_data_dir)
+        self.root.store.close()
 
 if __name__ == '__main__':
     TicTacToeApp().run() 
\ No newline at end of file
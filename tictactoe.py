@@ -1,14 +1,203 @@
+import time
+# Start of the app's imports, for the startup timers
+STARTED = time.perf_counter()
 import tkinter as tk
-from tkinter import messagebox, ttk
+import os
 import sys
-import random
-import time
+from engine import BOARD_PRESETS, DIFFICULTIES, Game
+from engine.metrics import METRICS
+from engine.protocol import CLOSED, EVICTED, MARKS, MOVED, OPPONENT_LEFT, START, WAITING
+from engine.records import GameLog, default_log_path
+from engine.store import Store, board_preset, game_progress, restore_progress
+from engine.worker import AIWorker
+IMPORTED = time.perf_counter()
+
+# How often the Tk mainloop checks for a finished AI move
+AI_POLL_MS = 20
+
+# Boards larger than this use light clickable labels instead of buttons
+LARGE_BOARD = 7
+
+# Board renderers offered by the settings menu
+RENDERERS = ["Кнопки", "Холст"]
+
+# Game mode played against another player through engine.server
+NETWORK_MODE = "По сети"
+
+# Largest side of the canvas board and the cell size limits, in pixels
+CANVAS_SIZE = 570
+CANVAS_CELL = (24, 120)
+
+# Background of the winning cells and colour of the winning line
+HIGHLIGHT_COLOR = '#ffd54f'
+WIN_LINE_COLOR = '#43a047'
+
+class ButtonBoard:
+    # One pooled tk.Button (or tk.Label on large boards) per cell
+    def __init__(self, parent, on_click):
+        self.frame = tk.Frame(parent)
+        self.on_click = on_click
+        self.buttons = []
+        # Cells are created once per position and style and reused across
+        # levels; played cells are tracked so a reset only touches those
+        self.cell_pools = {'button': {}, 'label': {}}
+        self.visible_cells = set()
+        self.board_shape = None
+        self.dirty_cells = set()
+        self.highlighted = []
+    
+    def build(self, grid_size):
+        # Resize the pooled board in place: cells are only shown or hidden
+        # as the size changes
+        style = 'label' if grid_size > LARGE_BOARD else 'button'
+        if (grid_size, style) != self.board_shape:
+            pool = self.cell_pools[style]
+            visible = set()
+            self.buttons = []
+            for i in range(grid_size):
+                row = []
+                for j in range(grid_size):
+                    button = pool.get((i, j))
+                    if button is None:
+                        button = self.create_cell(style, i, j)
+                        pool[(i, j)] = button
+                    if button not in self.visible_cells:
+                        if style == 'label':
+                            button.grid(row=i, column=j)
+                        else:
+                            button.grid(row=i, column=j, padx=5, pady=5)
+                    visible.add(button)
+                    row.append(button)
+                self.buttons.append(row)
+            
+            # Hide the cells the new board does not use
+            for button in self.visible_cells - visible:
+                button.grid_remove()
+            self.visible_cells = visible
+            self.board_shape = (grid_size, style)
+        
+        # The board starts empty; only clear the cells that were played
+        self.clear()
+    
+    def create_cell(self, style, i, j):
+        if style == 'label':
+            # A plain label per cell keeps 15x15 and 19x19 boards light
+            button = tk.Label(self.frame, text='', font=('Arial', 11, 'bold'), 
+                              width=2, relief='ridge', bd=1)
+            button.bind("<Button-1>", lambda event, row=i, col=j: self.on_click(row, col))
+        else:
+            button = tk.Button(self.frame, text='', font=('Arial', 24, 'bold'), 
+                               width=5, height=2,
+                               command=lambda row=i, col=j: self.on_click(row, col))
+        return button
+    
+    def draw_cell(self, row, col, player):
+        # X blue, O red
+        button = self.buttons[row][col]
+        if player:
+            button.config(text=player, fg='blue' if player == 'X' else 'red')
+            self.dirty_cells.add(button)
+        else:
+            button.config(text='', fg='black')
+    
+    def highlight(self, cells):
+        # Drop an earlier highlight first, or its colour would be saved as
+        # the cells' own background
+        self.clear_highlight()
+        for row, col in cells:
+            button = self.buttons[row][col]
+            self.highlighted.append((button, button.cget('bg')))
+            button.config(bg=HIGHLIGHT_COLOR)
+    
+    def clear_highlight(self):
+        for button, background in self.highlighted:
+            button.config(bg=background)
+        self.highlighted = []
+    
+    def clear(self):
+        for button in self.dirty_cells:
+            button.config(text='', fg='black')
+        self.dirty_cells.clear()
+        self.clear_highlight()
+
+class CanvasBoard:
+    # The whole board on a single tk.Canvas: clicks map to cells by
+    # arithmetic and a move only adds the items of its own cell
+    def __init__(self, parent, on_click):
+        self.frame = tk.Canvas(parent, highlightthickness=0, bg='white')
+        self.frame.bind("<Button-1>", self.on_press)
+        self.on_click = on_click
+        self.grid_size = 0
+        self.cell = CANVAS_CELL[1]
+        # (row, col) -> ids of the canvas items drawing that cell's mark
+        self.marks = {}
+    
+    def build(self, grid_size):
+        canvas = self.frame
+        size = CANVAS_SIZE // grid_size
+        self.cell = max(CANVAS_CELL[0], min(CANVAS_CELL[1], size))
+        side = self.cell * grid_size
+        if grid_size != self.grid_size:
+            # Only the grid lines depend on the size; redraw them once
+            self.grid_size = grid_size
+            canvas.delete('all')
+            canvas.config(width=side + 1, height=side + 1)
+            for k in range(grid_size + 1):
+                offset = k * self.cell
+                canvas.create_line(offset, 0, offset, side, fill='gray')
+                canvas.create_line(0, offset, side, offset, fill='gray')
+            self.marks = {}
+        else:
+            self.clear()
+    
+    def on_press(self, event):
+        row, col = event.y // self.cell, event.x // self.cell
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            self.on_click(row, col)
+    
+    def draw_cell(self, row, col, player):
+        canvas = self.frame
+        for item in self.marks.pop((row, col), ()):
+            canvas.delete(item)
+        if not player:
+            return
+        inset = max(4, self.cell // 5)
+        x0, y0 = col * self.cell + inset, row * self.cell + inset
+        x1, y1 = (col + 1) * self.cell - inset, (row + 1) * self.cell - inset
+        width = max(2, self.cell // 12)
+        if player == 'X':
+            items = (canvas.create_line(x0, y0, x1, y1, fill='blue', width=width, tags='mark'),
+                     canvas.create_line(x0, y1, x1, y0, fill='blue', width=width, tags='mark'))
+        else:
+            items = (canvas.create_oval(x0, y0, x1, y1, outline='red', width=width, tags='mark'),)
+        self.marks[(row, col)] = items
+    
+    def highlight(self, cells):
+        # A line through the centres of the first and last winning cells
+        self.clear_highlight()
+        if not cells:
+            return
+        (r0, c0), (r1, c1) = cells[0], cells[-1]
+        half = self.cell // 2
+        self.frame.create_line(c0 * self.cell + half, r0 * self.cell + half,
+                               c1 * self.cell + half, r1 * self.cell + half,
+                               fill=WIN_LINE_COLOR, width=max(3, self.cell // 8),
+                               capstyle='round', tags='highlight')
+    
+    def clear_highlight(self):
+        self.frame.delete('highlight')
+    
+    def clear(self):
+        self.frame.delete('mark')
+        self.clear_highlight()
+        self.marks = {}
 
 class TicTacToe:
-    def __init__(self, root):
+    def __init__(self, root, data_dir=None):
         self.root = root
         self.root.title("Крестики-Нолики")
         self.root.resizable(False, False)
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
         
         # Set window icon (optional)
         try:
@@ -16,29 +205,79 @@ class TicTacToe:
         except:
             pass  # Icon file not found, continue without icon
             
-        # Game state variables
-        self.current_player = 'X'
-        self.board = [['', '', ''], ['', '', ''], ['', '', '']]
-        self.game_over = False
-        self.vs_ai = True  # Default mode is vs AI
-        self.ai_difficulty = "Medium"  # Default difficulty
-        self.current_level = 1
-        self.grid_size = 3  # Initial grid size
+        # Game state lives in the headless engine (vs AI, Medium, level 1)
+        self.game = Game(vs_ai=True, ai_difficulty="Medium")
+        # Finished and abandoned games are appended to games.log in data_dir
+        # (default ~/.tictactoe)
+        self.data_dir = os.path.dirname(default_log_path(data_dir))
+        self.game.recorder = GameLog(default_log_path(self.data_dir))
+        # The last level table, level and difficulty, and the AI's learned
+        # moves, are kept next to it
+        self.store = Store(self.data_dir)
+        restore_progress(self.game, self.store.load_progress())
+        self.game.store = self.store
+        self.ai_worker = AIWorker()
+        # Pending advance_level() after a win, cancelled by undo
+        self.advance_job = None
+        # Connection to the game server in network mode, and our mark
+        self.remote = None
+        self.remote_mark = None
         
         # Create main frame
         self.main_frame = tk.Frame(root, padx=10, pady=10)
         self.main_frame.pack()
         
-        # Create settings frame
+        # Create settings frame; it is filled in by build_controls() once
+        # the board and the status are on screen
         self.settings_frame = tk.Frame(self.main_frame, padx=5, pady=5)
         self.settings_frame.pack(fill='x', pady=5)
         
+        # Create game board frame
+        self.game_frame = tk.Frame(self.main_frame, padx=10, pady=10)
+        self.game_frame.pack()
+        
+        # Create the game board with the selected renderer
+        self.board_views = {}
+        self.board_view = None
+        self.renderer_var = tk.StringVar(value=RENDERERS[0])
+        self.last_transition_ms = 0.0
+        self.select_renderer(self.renderer_var.get())
+        self.create_game_board()
+        
+        # Create control frame
+        self.control_frame = tk.Frame(self.main_frame, padx=10, pady=5)
+        self.control_frame.pack(fill='x')
+        
+        # Create status label
+        self.status_label = tk.Label(self.control_frame, text=f"Ход игрока: {self.game.current_player}", 
+                                     font=('Arial', 12), pady=10)
+        self.status_label.pack()
+        
+        # The rest of the window is built after the first frame
+        self.first_frame_ms = None
+        self.root.bind('<Map>', self.on_first_frame, add='+')
+    
+    def on_first_frame(self, event):
+        # <Map> reaches the root's binding for every widget; only the
+        # window itself appearing counts
+        if event.widget is not self.root or self.first_frame_ms is not None:
+            return
+        self.first_frame_ms = (time.perf_counter() - STARTED) * 1000
+        if METRICS.enabled:
+            METRICS.add_time('startup_imports', IMPORTED - STARTED)
+            METRICS.add_time('first_frame', self.first_frame_ms / 1000)
+        self.root.after_idle(self.build_controls)
+    
+    def build_controls(self):
+        # Settings and buttons, deferred until the first frame is on screen
+        from tkinter import ttk
+        
         # Game mode selection
         self.mode_label = tk.Label(self.settings_frame, text="Режим игры:", font=('Arial', 10))
         self.mode_label.grid(row=0, column=0, padx=5, pady=5, sticky='w')
         
         self.mode_var = tk.StringVar(value="1 Игрок (против ИИ)")
-        self.mode_options = ["1 Игрок (против ИИ)", "2 Игрока"]
+        self.mode_options = ["1 Игрок (против ИИ)", "2 Игрока", NETWORK_MODE]
         self.mode_menu = ttk.Combobox(self.settings_frame, textvariable=self.mode_var, 
                                      values=self.mode_options, width=18, state="readonly")
         self.mode_menu.grid(row=0, column=1, padx=5, pady=5, sticky='w')
@@ -48,8 +287,8 @@ class TicTacToe:
         self.difficulty_label = tk.Label(self.settings_frame, text="Сложность ИИ:", font=('Arial', 10))
         self.difficulty_label.grid(row=1, column=0, padx=5, pady=5, sticky='w')
         
-        self.difficulty_var = tk.StringVar(value="Medium")
-        self.difficulty_options = ["Easy", "Medium", "Hard"]
+        self.difficulty_var = tk.StringVar(value=self.game.ai_difficulty)
+        self.difficulty_options = list(DIFFICULTIES)
         self.difficulty_menu = ttk.Combobox(self.settings_frame, textvariable=self.difficulty_var, 
                                            values=self.difficulty_options, width=18, state="readonly")
         self.difficulty_menu.grid(row=1, column=1, padx=5, pady=5, sticky='w')
@@ -59,26 +298,29 @@ class TicTacToe:
         self.level_label = tk.Label(self.settings_frame, text="Уровень:", font=('Arial', 10))
         self.level_label.grid(row=2, column=0, padx=5, pady=5, sticky='w')
         
-        self.level_display = tk.Label(self.settings_frame, text=f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})", 
+        self.level_display = tk.Label(self.settings_frame, text=self.level_text(), 
                                      font=('Arial', 10, 'bold'))
         self.level_display.grid(row=2, column=1, padx=5, pady=5, sticky='w')
         
-        # Create game board frame
-        self.game_frame = tk.Frame(self.main_frame, padx=10, pady=10)
-        self.game_frame.pack()
+        # Board size selection (level table)
+        self.board_label = tk.Label(self.settings_frame, text="Поле:", font=('Arial', 10))
+        self.board_label.grid(row=3, column=0, padx=5, pady=5, sticky='w')
         
-        # Create the buttons for the game board
-        self.buttons = []
-        self.create_game_board()
+        self.board_options = list(BOARD_PRESETS)
+        self.board_var = tk.StringVar(value=board_preset(self.game.levels) or self.board_options[0])
+        self.board_menu = ttk.Combobox(self.settings_frame, textvariable=self.board_var, 
+                                      values=self.board_options, width=18, state="readonly")
+        self.board_menu.grid(row=3, column=1, padx=5, pady=5, sticky='w')
+        self.board_menu.bind("<<ComboboxSelected>>", self.change_board)
         
-        # Create control frame
-        self.control_frame = tk.Frame(self.main_frame, padx=10, pady=5)
-        self.control_frame.pack(fill='x')
+        # Board renderer: a button per cell or a single canvas
+        self.renderer_label = tk.Label(self.settings_frame, text="Отрисовка:", font=('Arial', 10))
+        self.renderer_label.grid(row=4, column=0, padx=5, pady=5, sticky='w')
         
-        # Create status label
-        self.status_label = tk.Label(self.control_frame, text=f"Ход игрока: {self.current_player}", 
-                                     font=('Arial', 12), pady=10)
-        self.status_label.pack()
+        self.renderer_menu = ttk.Combobox(self.settings_frame, textvariable=self.renderer_var, 
+                                         values=RENDERERS, width=18, state="readonly")
+        self.renderer_menu.grid(row=4, column=1, padx=5, pady=5, sticky='w')
+        self.renderer_menu.bind("<<ComboboxSelected>>", self.change_renderer)
         
         # Create buttons frame
         self.button_frame = tk.Frame(self.control_frame)
@@ -89,35 +331,60 @@ class TicTacToe:
                                   command=self.reset_game, padx=10, pady=5)
         restart_button.pack(side=tk.LEFT, padx=5)
         
+        # Create undo and redo buttons
+        self.undo_button = tk.Button(self.button_frame, text="Отменить", 
+                                     command=self.undo_move, padx=10, pady=5)
+        self.undo_button.pack(side=tk.LEFT, padx=5)
+        self.redo_button = tk.Button(self.button_frame, text="Повторить", 
+                                     command=self.redo_move, padx=10, pady=5)
+        self.redo_button.pack(side=tk.LEFT, padx=5)
+        
         # Create exit button
         exit_button = tk.Button(self.button_frame, text="Выход", 
-                               command=self.root.destroy, padx=10, pady=5)
+                               command=self.quit, padx=10, pady=5)
         exit_button.pack(side=tk.LEFT, padx=5)
     
     def create_game_board(self):
-        # Clear existing buttons if any
-        for widget in self.game_frame.winfo_children():
-            widget.destroy()
-        
-        # Reset buttons list
-        self.buttons = []
-        
-        # Create new board based on current grid size
-        for i in range(self.grid_size):
-            row = []
-            for j in range(self.grid_size):
-                button = tk.Button(self.game_frame, text='', font=('Arial', 24, 'bold'), 
-                                  width=5, height=2,
-                                  command=lambda row=i, col=j: self.make_move(row, col))
-                button.grid(row=i, column=j, padx=5, pady=5)
-                row.append(button)
-            self.buttons.append(row)
+        # Resize the selected board view in place for the current level
+        start = time.perf_counter()
+        self.board_view.build(self.game.grid_size)
+        self.last_transition_ms = (time.perf_counter() - start) * 1000
+        if METRICS.enabled:
+            METRICS.add_time('board_build', self.last_transition_ms / 1000)
+    
+    def select_renderer(self, name):
+        # Board views are created on first use and kept for later switches
+        view = self.board_views.get(name)
+        if view is None:
+            if name == "Холст":
+                view = CanvasBoard(self.game_frame, self.on_cell_click)
+            else:
+                view = ButtonBoard(self.game_frame, self.on_cell_click)
+            self.board_views[name] = view
+        if self.board_view is not None:
+            self.board_view.frame.pack_forget()
+        view.frame.pack()
+        self.board_view = view
+    
+    def change_renderer(self, event=None):
+        # Switch the board view and redraw the position in progress
+        self.select_renderer(self.renderer_var.get())
+        self.create_game_board()
+        for cell in self.game.tracker.history:
+            self.render_cell(*divmod(cell, self.game.grid_size))
+        self.board_view.highlight(self.game.winning_line())
+    
+    def render_cell(self, row, col):
+        # Redraw one cell from the engine board
+        with METRICS.timer('render'):
+            self.board_view.draw_cell(row, col, self.game.board.get(row, col))
     
     def change_game_mode(self, event=None):
         mode = self.mode_var.get()
-        self.vs_ai = mode == "1 Игрок (против ИИ)"
+        self.close_remote()
+        self.game.vs_ai = mode == "1 Игрок (против ИИ)"
         # Update difficulty selection visibility
-        if self.vs_ai:
+        if self.game.vs_ai:
             self.difficulty_label.grid(row=1, column=0)
             self.difficulty_menu.grid(row=1, column=1)
         else:
@@ -125,217 +392,279 @@ class TicTacToe:
             self.difficulty_menu.grid_remove()
         # Reset the game with new settings
         self.reset_level()
+        if mode == NETWORK_MODE:
+            self.connect_remote()
+    
+    def connect_remote(self):
+        # Two-player games against someone else on the game server
+        from tkinter import simpledialog
+        from engine.remote import RemotePlayer, default_address
+        address = simpledialog.askstring("Сетевая игра", "Адрес сервера:",
+                                         initialvalue=default_address(), parent=self.root)
+        if not address:
+            self.mode_var.set(self.mode_options[1])
+            return
+        self.remote = RemotePlayer(address, self.on_remote_message)
+        self.remote.connect(self.preset_index())
+        self.status_label.config(text="Подключение к серверу...")
+        self.root.after(AI_POLL_MS, self.poll_remote, self.remote)
+    
+    def poll_remote(self, remote):
+        # Stops once this connection is closed or replaced
+        if remote is self.remote:
+            remote.poll()
+            self.root.after(AI_POLL_MS, self.poll_remote, remote)
+    
+    def close_remote(self):
+        if self.remote is not None:
+            self.remote.close()
+            self.remote = None
+        self.remote_mark = None
+    
+    def preset_index(self):
+        return self.board_options.index(self.board_var.get())
+    
+    def on_remote_message(self, kind, fields):
+        # The server decides; the local game mirrors its moves and levels
+        if kind == WAITING:
+            self.status_label.config(text="Ожидание соперника...")
+        elif kind == START:
+            _, level, grid_size, win_length, mark = fields
+            self.remote_mark = MARKS[mark]
+            # configure_level already restarts a game on that level
+            self.game.configure_level(level, grid_size, win_length)
+            if level != self.game.current_level:
+                self.game.set_level(level)
+            self.level_display.config(text=self.level_text())
+            self.create_game_board()
+            self.update_status()
+        elif kind == MOVED:
+            row, col = divmod(fields[0], self.game.grid_size)
+            self.game.make_move(row, col)
+            self.render_cell(row, col)
+            self.board_view.highlight(self.game.winning_line())
+            self.update_status()
+            if self.game.game_over:
+                # The server's next game is drawn once this is closed
+                self.show_message("Игра окончена", self.status_label.cget('text'))
+        elif kind == OPPONENT_LEFT:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
+            self.status_label.config(text="Соперник вышел, ищем нового...")
+        elif kind == EVICTED:
+            self.show_message("Сетевая игра", "Матч закрыт из-за бездействия")
+        elif kind == CLOSED:
+            self.close_remote()
+            self.status_label.config(text="Нет связи с сервером")
+    
+    def change_board(self, event=None):
+        # Switch to another level table and start again from its first level
+        self.ai_worker.cancel()
+        self.game.set_levels(BOARD_PRESETS[self.board_var.get()])
+        self.level_display.config(text=self.level_text())
+        self.create_game_board()
+        self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
+        self.save_progress()
+        if self.remote is not None:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
     
     def change_difficulty(self, event=None):
-        self.ai_difficulty = self.difficulty_var.get()
+        self.game.ai_difficulty = self.difficulty_var.get()
+        self.save_progress()
         # Reset the game with new difficulty
         self.reset_game()
     
+    def level_text(self):
+        text = f"{self.game.current_level} (сетка {self.game.grid_size}x{self.game.grid_size}"
+        if self.game.win_length != self.game.grid_size:
+            text += f", {self.game.win_length} в ряд"
+        return text + ")"
+    
+    def on_cell_click(self, row, col):
+        # In network mode moves go to the server and are drawn when it
+        # confirms them
+        if self.remote is not None:
+            if (self.game.current_player == self.remote_mark and not self.game.game_over
+                    and self.game.board.is_empty(row, col)):
+                self.remote.send_move(row * self.game.grid_size + col)
+            return
+        # Ignore clicks while the AI is thinking
+        if self.game.is_ai_turn():
+            return
+        self.make_move(row, col)
+    
     def make_move(self, row, col):
-        # Check if the game is over or the cell is not empty
-        if self.game_over or self.board[row][col] != '':
+        # The engine rejects moves after game over or on occupied cells
+        if not self.game.make_move(row, col):
             return
-            
-        # Update board data structure
-        self.board[row][col] = self.current_player
         
-        # Update button text
-        self.buttons[row][col].config(text=self.current_player)
+        # Redraw only the touched cell
+        self.render_cell(row, col)
         
-        # Apply different colors for X and O
-        if self.current_player == 'X':
-            self.buttons[row][col].config(fg='blue')
-        else:
-            self.buttons[row][col].config(fg='red')
+        if self.end_game():
+            return
         
-        # Check for winner
-        winner = self.check_winner()
+        # Update status label
+        self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
+        
+        # If playing against AI and it's AI's turn (O), make AI move
+        if self.game.is_ai_turn():
+            self.root.after(500, self.make_ai_move)  # Slight delay for better UX
+    
+    def end_game(self):
+        # Announce a win or draw; False while the game goes on
+        winner = self.game.winner
         if winner:
-            self.game_over = True
+            self.board_view.highlight(self.game.winning_line())
             if winner == 'X':  # Player wins
                 self.status_label.config(text=f"Игрок {winner} победил!")
-                messagebox.showinfo("Уровень пройден!", f"Поздравляем! Вы переходите на следующий уровень.")
-                self.root.after(1000, self.advance_level)  # Advance to next level after delay
+                self.show_message("Уровень пройден!", f"Поздравляем! Вы переходите на следующий уровень.")
+                self.advance_job = self.root.after(1000, self.advance_level)  # Advance to next level after delay
             else:  # AI wins
                 self.status_label.config(text=f"Игрок {winner} победил!")
-                messagebox.showinfo("Игра окончена", f"Игрок {winner} победил!")
-            return
+                self.show_message("Игра окончена", f"Игрок {winner} победил!")
+            return True
         
         # Check for draw
-        if self.is_board_full():
-            self.game_over = True
+        if self.game.is_draw:
             self.status_label.config(text="Ничья!")
-            messagebox.showinfo("Игра окончена", "Ничья!")
+            self.show_message("Игра окончена", "Ничья!")
+            return True
+        return False
+    
+    def undo_move(self):
+        # Take back the last move (against the AI, back to the player's
+        # turn) and clear just the cells it occupied; not in network games
+        if self.remote is not None:
             return
-        
-        # Switch player
-        self.current_player = 'O' if self.current_player == 'X' else 'X'
-        
-        # Update status label
-        self.status_label.config(text=f"Ход игрока: {self.current_player}")
-        
-        # If playing against AI and it's AI's turn (O), make AI move
-        if self.vs_ai and self.current_player == 'O' and not self.game_over:
-            self.root.after(500, self.make_ai_move)  # Slight delay for better UX
+        self.ai_worker.cancel()
+        if self.advance_job is not None:
+            self.root.after_cancel(self.advance_job)
+            self.advance_job = None
+        self.board_view.clear_highlight()
+        while True:
+            move = self.game.undo()
+            if move is None:
+                break
+            self.render_cell(*move)
+            if not self.game.is_ai_turn():
+                break
+        self.update_status()
+    
+    def redo_move(self):
+        # Replay undone moves up to the player's next turn
+        if self.remote is not None:
+            return
+        self.ai_worker.cancel()
+        redone = False
+        while True:
+            move = self.game.redo()
+            if move is None:
+                break
+            redone = True
+            self.render_cell(*move)
+            if self.game.game_over or not self.game.is_ai_turn():
+                break
+        # A redone last move ends the game as it did when first played
+        if redone and self.end_game():
+            return
+        self.update_status()
+        if self.game.is_ai_turn():
+            self.root.after(500, self.make_ai_move)
+    
+    def update_status(self):
+        if self.game.winner:
+            self.status_label.config(text=f"Игрок {self.game.winner} победил!")
+        elif self.game.is_draw:
+            self.status_label.config(text="Ничья!")
+        elif self.remote_mark is not None:
+            whose = "вы" if self.game.current_player == self.remote_mark else "соперник"
+            self.status_label.config(text=f"Ход игрока: {self.game.current_player} ({whose})")
+        else:
+            self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
     
     def advance_level(self):
-        self.current_level += 1
+        self.advance_job = None
+        self.ai_worker.cancel()
         
-        # Define level progression
-        if self.current_level == 2:
-            self.grid_size = 4  # Level 2: 4x4 grid
-            self.ai_difficulty = "Medium" if self.ai_difficulty == "Easy" else "Hard"
-        elif self.current_level == 3:
-            self.grid_size = 5  # Level 3: 5x5 grid
-            self.ai_difficulty = "Hard"  # Force hard difficulty
+        # Grid size, win length and difficulty progression live in the engine
+        self.game.advance_level()
         
         # Update level display
-        self.level_display.config(text=f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})")
+        self.level_display.config(text=self.level_text())
         
         # Update AI difficulty display
-        self.difficulty_var.set(self.ai_difficulty)
-        
-        # Reset the game with new grid size
-        self.board = [[''] * self.grid_size for _ in range(self.grid_size)]
-        self.game_over = False
-        self.current_player = 'X'
+        self.difficulty_var.set(self.game.ai_difficulty)
         
         # Recreate the game board with new size
         self.create_game_board()
         
         # Reset status label
-        self.status_label.config(text=f"Ход игрока: {self.current_player}")
+        self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
+        self.save_progress()
     
     def reset_level(self):
         # Reset to level 1
-        self.current_level = 1
-        self.grid_size = 3
-        self.level_display.config(text=f"{self.current_level} (сетка {self.grid_size}x{self.grid_size})")
-        self.reset_game()
+        self.ai_worker.cancel()
+        self.game.reset_level()
+        self.level_display.config(text=self.level_text())
+        self.create_game_board()
+        self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
+        self.save_progress()
+    
+    def save_progress(self):
+        # Queued for the store's writer thread; never waits for the disk
+        self.store.save_progress(game_progress(self.game))
     
     def make_ai_move(self):
-        if self.game_over:
+        # The game may have been reset since this call was scheduled
+        if not self.game.is_ai_turn():
             return
             
-        # Choose move based on difficulty
-        if self.ai_difficulty == "Easy":
-            row, col = self.get_easy_ai_move()
-        elif self.ai_difficulty == "Medium":
-            row, col = self.get_medium_ai_move()
-        else:  # Hard
-            row, col = self.get_hard_ai_move()
-            
-        # Make the move
-        self.make_move(row, col)
-    
-    def get_easy_ai_move(self):
-        # Random move
-        empty_cells = []
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    empty_cells.append((i, j))
-        
-        return random.choice(empty_cells) if empty_cells else (0, 0)
+        # Choose move based on difficulty on a worker thread; the move is
+        # applied on the mainloop once poll_ai_move picks it up
+        self.ai_worker.request(self.game, self.make_move)
+        self.root.after(AI_POLL_MS, self.poll_ai_move)
     
-    def get_medium_ai_move(self):
-        # 50% chance for smart move, 50% for random
-        if random.random() < 0.5:
-            return self.get_easy_ai_move()
-        else:
-            return self.get_hard_ai_move()
-    
-    def get_hard_ai_move(self):
-        # First, check if AI can win in the next move
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    self.board[i][j] = 'O'  # Try placing O
-                    if self.check_winner() == 'O':
-                        self.board[i][j] = ''  # Undo move
-                        return (i, j)
-                    self.board[i][j] = ''  # Undo move
-        
-        # Second, check if player can win in the next move and block
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    self.board[i][j] = 'X'  # Try placing X
-                    if self.check_winner() == 'X':
-                        self.board[i][j] = ''  # Undo move
-                        return (i, j)
-                    self.board[i][j] = ''  # Undo move
-        
-        # Take center if available
-        center = self.grid_size // 2
-        if self.board[center][center] == '':
-            return (center, center)
-        
-        # Take corners if available
-        corners = [(0, 0), (0, self.grid_size-1), 
-                  (self.grid_size-1, 0), (self.grid_size-1, self.grid_size-1)]
-        empty_corners = [corner for corner in corners if self.board[corner[0]][corner[1]] == '']
-        if empty_corners:
-            return random.choice(empty_corners)
-        
-        # Take any empty cell
-        return self.get_easy_ai_move()
-    
-    def check_winner(self):
-        win_length = 3  # Number needed in a row to win
-        
-        # If grid size is larger, adjust win condition
-        if self.grid_size > 3:
-            win_length = 4 if self.grid_size == 4 else 5
-        
-        # Check rows
-        for i in range(self.grid_size):
-            for j in range(self.grid_size - win_length + 1):
-                if self.board[i][j] != '' and all(self.board[i][j+k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check columns
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(self.grid_size):
-                if self.board[i][j] != '' and all(self.board[i+k][j] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check diagonals (top-left to bottom-right)
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(self.grid_size - win_length + 1):
-                if self.board[i][j] != '' and all(self.board[i+k][j+k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        # Check diagonals (top-right to bottom-left)
-        for i in range(self.grid_size - win_length + 1):
-            for j in range(win_length - 1, self.grid_size):
-                if self.board[i][j] != '' and all(self.board[i+k][j-k] == self.board[i][j] for k in range(win_length)):
-                    return self.board[i][j]
-        
-        return None
-    
-    def is_board_full(self):
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == '':
-                    return False
-        return True
+    def poll_ai_move(self):
+        self.ai_worker.poll()
+        if self.ai_worker.busy:
+            self.root.after(AI_POLL_MS, self.poll_ai_move)
     
     def reset_game(self):
-        # Reset game state variables
-        self.game_over = False
-        self.current_player = 'X'
-        self.board = [[''] * self.grid_size for _ in range(self.grid_size)]
+        # Reset game state variables (and drop any AI move in progress)
+        self.ai_worker.cancel()
+        self.game.reset()
         
-        # Reset UI
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                self.buttons[i][j].config(text='', fg='black')
+        # Reset UI: only the played cells need clearing
+        start = time.perf_counter()
+        self.board_view.clear()
+        self.last_transition_ms = (time.perf_counter() - start) * 1000
         
         # Reset status label
-        self.status_label.config(text=f"Ход игрока: {self.current_player}")
+        self.status_label.config(text=f"Ход игрока: {self.game.current_player}")
+        
+        # In network mode a new game means a new opponent
+        if self.remote is not None:
+            self.remote_mark = None
+            self.remote.join(self.preset_index())
+
+    def show_message(self, title, message):
+        # messagebox is imported on the first message rather than at startup
+        from tkinter import messagebox
+        messagebox.showinfo(title, message)
+    
+    def quit(self):
+        # Write the metrics summary (when enabled) next to the game log
+        self.close_remote()
+        self.game.save_record()
+        METRICS.dump(self.data_dir)
+        self.store.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    METRICS.configure_from_env()
     root = tk.Tk()
     app = TicTacToe(root)
     root.mainloop() 
\ No newline at end of file